@@ -0,0 +1,201 @@
+import asyncio
+import json
+import math
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+# Weight of the newest sample in the moving averages below
+EWMA_ALPHA = 0.2
+
+
+@dataclass
+class RouteClass:
+    name: str
+    # Waiting requests of lower values are admitted first
+    priority: int
+    limit: int
+    queue_size: int
+    max_wait: float
+
+
+@dataclass
+class RouteClassStats:
+    active: int = 0
+    admitted: int = 0
+    shed: dict[str, int] = field(default_factory=dict)
+    # Moving averages in seconds
+    service_time: float = 0.05
+    queue_time: float = 0.0
+
+
+class AdmissionController:
+    """Limits concurrent requests per route class, sharing one overall capacity.
+
+    Requests over a limit wait in a bounded per-class queue. When a slot frees
+    up it goes to the waiting class with the best priority. A request is shed
+    up front when its queue is full or its expected wait exceeds the class's
+    ``max_wait``, and after waiting ``max_wait`` without getting a slot.
+    """
+
+    def __init__(self, capacity: int, route_classes: list[RouteClass]):
+        self.capacity = capacity
+        self.route_classes = {
+            route_class.name: route_class
+            for route_class in sorted(route_classes, key=lambda rc: rc.priority)
+        }
+        self.stats = {name: RouteClassStats() for name in self.route_classes}
+        self._waiters = {name: deque() for name in self.route_classes}
+        self._active = 0
+
+    async def acquire(self, name: str) -> str | None:
+        """Take a slot for a request of class ``name``, or return why it was shed"""
+        route_class = self.route_classes[name]
+        stats = self.stats[name]
+        waiters = self._waiters[name]
+
+        if not waiters and self._has_slot(route_class):
+            self._admit(name)
+            return None
+        if len(waiters) >= route_class.queue_size:
+            return self._shed(name, "queue_full")
+        if self.expected_wait(name) > route_class.max_wait:
+            return self._shed(name, "deadline")
+
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        queued_at = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), route_class.max_wait)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiters.remove(waiter)
+                return self._shed(name, "timeout")
+        except asyncio.CancelledError:
+            if waiter.done():
+                self._free(name)
+            else:
+                waiters.remove(waiter)
+            raise
+
+        stats.queue_time += EWMA_ALPHA * (
+            time.monotonic() - queued_at - stats.queue_time
+        )
+        return None
+
+    def release(self, name: str, service_time: float) -> None:
+        stats = self.stats[name]
+        stats.service_time += EWMA_ALPHA * (service_time - stats.service_time)
+        self._free(name)
+
+    def expected_wait(self, name: str) -> float:
+        route_class = self.route_classes[name]
+        queued = len(self._waiters[name]) + 1
+        return queued * self.stats[name].service_time / route_class.limit
+
+    def snapshot(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "active": self._active,
+            "classes": {
+                name: {
+                    "limit": route_class.limit,
+                    "active": self.stats[name].active,
+                    "queued": len(self._waiters[name]),
+                    "admitted": self.stats[name].admitted,
+                    "shed": dict(self.stats[name].shed),
+                    "avg_service_seconds": round(self.stats[name].service_time, 4),
+                    "avg_queue_seconds": round(self.stats[name].queue_time, 4),
+                }
+                for name, route_class in self.route_classes.items()
+            },
+        }
+
+    def _has_slot(self, route_class: RouteClass) -> bool:
+        return (
+            self._active < self.capacity
+            and self.stats[route_class.name].active < route_class.limit
+        )
+
+    def _admit(self, name: str) -> None:
+        self._active += 1
+        self.stats[name].active += 1
+        self.stats[name].admitted += 1
+
+    def _free(self, name: str) -> None:
+        self._active -= 1
+        self.stats[name].active -= 1
+        self._wake()
+
+    def _shed(self, name: str, reason: str) -> str:
+        shed = self.stats[name].shed
+        shed[reason] = shed.get(reason, 0) + 1
+        return reason
+
+    def _wake(self) -> None:
+        for name, route_class in self.route_classes.items():
+            waiters = self._waiters[name]
+            while waiters and self._has_slot(route_class):
+                waiter = waiters.popleft()
+                if waiter.done():
+                    continue
+                self._admit(name)
+                waiter.set_result(None)
+
+
+class AdmissionMiddleware:
+    """Runs every classified request under the admission controller.
+
+    Shed requests get an immediate ``503`` with a ``Retry-After`` header
+    instead of waiting for a database connection until they time out.
+    """
+
+    def __init__(self, app, controller: AdmissionController, rules):
+        self.app = app
+        self.controller = controller
+        # (method, compiled path pattern, route class name), first match wins
+        self.rules = [
+            (method, re.compile(pattern), name) for method, pattern, name in rules
+        ]
+
+    async def __call__(self, scope, receive, send):
+        name = self.classify(scope) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await self.controller.acquire(name)
+        if reason is not None:
+            await self._reject(send, name, reason)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(name, time.monotonic() - started)
+
+    def classify(self, scope) -> str | None:
+        for method, pattern, name in self.rules:
+            if method in (None, scope["method"]) and pattern.fullmatch(scope["path"]):
+                return name
+        return None
+
+    async def _reject(self, send, name: str, reason: str) -> None:
+        retry_after = max(1, math.ceil(self.controller.expected_wait(name)))
+        body = json.dumps(
+            {"detail": "Server is overloaded, retry later", "reason": reason}
+        ).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(retry_after).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
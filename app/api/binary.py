@@ -0,0 +1,179 @@
+"""MessagePack and Arrow IPC encodings of receipt lists.
+
+Both are built straight from the loaded receipts, without pydantic models.
+Amounts and quantities are scaled integers (``AMOUNT_SCALE`` decimal places,
+so 12.50 is 1250) and timestamps are UTC.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Iterable
+
+from app.db.models.receipt import Receipt
+
+try:
+    import msgpack
+except ImportError:  # msgpack is an optional dependency
+    msgpack = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pyarrow is an optional dependency
+    pa = None
+
+MSGPACK = "application/msgpack"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+AMOUNT_SCALE = 2
+
+# OpenAPI description of the routes that can answer in either format
+BINARY_RESPONSES = {
+    200: {
+        "content": {
+            MSGPACK: {"schema": {"type": "string", "format": "binary"}},
+            ARROW_STREAM: {"schema": {"type": "string", "format": "binary"}},
+        }
+    }
+}
+
+
+def negotiate_format(accept: str | None) -> str | None:
+    """Pick a binary media type from an Accept header, or None for JSON.
+
+    Types whose library is not installed are ignored, as are wildcards:
+    only clients that ask for a binary format by name get one.
+    """
+    available = {MSGPACK: msgpack is not None, ARROW_STREAM: pa is not None}
+    best, best_quality = None, 0.0
+    for item in (accept or "").lower().split(","):
+        media_type, _, params = item.strip().partition(";")
+        media_type = media_type.strip()
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        # On equal quality the type listed first wins
+        if media_type == "application/json" and quality > best_quality:
+            best, best_quality = None, quality
+        elif available.get(media_type) and quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def encode_receipts(
+    media_type: str,
+    receipts: Iterable[Receipt],
+    fields: frozenset[str] | None = None,
+    metadata: dict[str, list[int]] | None = None,
+) -> bytes:
+    """Encode receipts as ``media_type``; ``fields`` as in ``ReceiptFieldSet``.
+
+    MessagePack bodies are a map with ``receipts`` and the ``metadata`` keys.
+    Arrow streams carry ``metadata`` as JSON in the schema metadata.
+    """
+    if media_type == MSGPACK:
+        return _encode_msgpack(receipts, fields, metadata or {})
+    return _encode_arrow(receipts, fields, metadata or {})
+
+
+def _scaled(value) -> int:
+    return int(value.scaleb(AMOUNT_SCALE))
+
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _selected(fields: frozenset[str] | None, name: str) -> bool:
+    return fields is None or name in fields
+
+
+def _encode_msgpack(receipts, fields, metadata) -> bytes:
+    rows = []
+    for receipt in receipts:
+        row = {"id": receipt.id}
+        if _selected(fields, "payment"):
+            row["payment"] = {
+                "type": receipt.payment_type.value,
+                "amount": _scaled(receipt.payment_amount),
+            }
+        if _selected(fields, "total"):
+            row["total"] = _scaled(receipt.total)
+        if _selected(fields, "rest"):
+            row["rest"] = _scaled(receipt.rest)
+        if _selected(fields, "created_at"):
+            row["created_at"] = _utc(receipt.created_at)
+        if _selected(fields, "products"):
+            row["products"] = [
+                {
+                    "name": product.name,
+                    "price": _scaled(product.price),
+                    "quantity": _scaled(product.quantity),
+                    "total": _scaled(product.total),
+                }
+                for product in receipt.products
+            ]
+        rows.append(row)
+
+    return msgpack.packb(
+        {"scale": AMOUNT_SCALE, "receipts": rows, **metadata}, datetime=True
+    )
+
+
+def _encode_arrow(receipts, fields, metadata) -> bytes:
+    receipts = list(receipts)
+    columns = {"id": pa.array([receipt.id for receipt in receipts], pa.int64())}
+    if _selected(fields, "payment"):
+        columns["payment_type"] = pa.array(
+            [receipt.payment_type.value for receipt in receipts], pa.string()
+        ).dictionary_encode()
+        columns["payment_amount"] = pa.array(
+            [_scaled(receipt.payment_amount) for receipt in receipts], pa.int64()
+        )
+    for name in ("total", "rest"):
+        if _selected(fields, name):
+            columns[name] = pa.array(
+                [_scaled(getattr(receipt, name)) for receipt in receipts], pa.int64()
+            )
+    if _selected(fields, "created_at"):
+        columns["created_at"] = pa.array(
+            [_utc(receipt.created_at) for receipt in receipts],
+            pa.timestamp("us", tz="UTC"),
+        )
+    if _selected(fields, "products"):
+        # One list per receipt over flat child columns, built from offsets
+        offsets, names, prices, quantities, totals = [0], [], [], [], []
+        for receipt in receipts:
+            for product in receipt.products:
+                names.append(product.name)
+                prices.append(_scaled(product.price))
+                quantities.append(_scaled(product.quantity))
+                totals.append(_scaled(product.total))
+            offsets.append(len(names))
+        products = pa.StructArray.from_arrays(
+            [
+                pa.array(names, pa.string()),
+                pa.array(prices, pa.int64()),
+                pa.array(quantities, pa.int64()),
+                pa.array(totals, pa.int64()),
+            ],
+            names=["name", "price", "quantity", "total"],
+        )
+        columns["products"] = pa.ListArray.from_arrays(
+            pa.array(offsets, pa.int32()), products
+        )
+
+    batch = pa.RecordBatch.from_pydict(columns).replace_schema_metadata(
+        {
+            "scale": str(AMOUNT_SCALE),
+            **{key: json.dumps(value) for key, value in metadata.items()},
+        }
+    )
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
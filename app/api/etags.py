@@ -0,0 +1,54 @@
+import hashlib
+from datetime import datetime
+from typing import Iterable
+
+from app.db.models.receipt import Receipt
+
+
+def make_etag(*parts: object) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def _variant(
+    fields: frozenset[str] | None, media_type: str | None = None
+) -> tuple[str, ...]:
+    # Sparse and binary representations get their own tags; full JSON ones
+    # keep the old tags
+    variant = () if fields is None else ("fields", ",".join(sorted(fields)))
+    return variant if media_type is None else (*variant, "type", media_type)
+
+
+def receipt_etag(
+    receipt_id: int, updated_at: datetime, fields: frozenset[str] | None = None
+) -> str:
+    return make_etag("receipt", receipt_id, updated_at.isoformat(), *_variant(fields))
+
+
+def receipts_etag(
+    receipts: Iterable[Receipt],
+    fields: frozenset[str] | None = None,
+    media_type: str | None = None,
+) -> str:
+    return make_etag(
+        "receipts",
+        *(f"{receipt.id}:{receipt.updated_at.isoformat()}" for receipt in receipts),
+        *_variant(fields, media_type),
+    )
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison as required for If-None-Match (RFC 9110, 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque_tag = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque_tag
+        for candidate in if_none_match.split(",")
+    )
@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def profile_signature(secret: str, path: str) -> str:
+    """Value of ``X-Profile`` (or ``?profile=``) that requests a profile of ``path``"""
+    return hmac.new(secret.encode(), path.encode(), hashlib.sha256).hexdigest()
+
+
+class StackSampler:
+    """Records the stack of one thread every ``interval`` seconds from a helper thread.
+
+    Samples are counted per stack in the collapsed format read by
+    flamegraph.pl, speedscope and similar tools: frames from the outermost
+    in, separated by semicolons, then the number of samples. As they are
+    taken on the clock, time spent waiting (for the database, say) shows up
+    under the event loop's ``select``.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if frames:
+                self.stacks[";".join(reversed(frames))] += 1
+
+
+class ProfilingMiddleware:
+    """Profiles single requests and writes them to ``output_dir``.
+
+    A request is profiled when it carries ``profile_signature(secret, path)``
+    in the ``X-Profile`` header or the ``profile`` query parameter, or else
+    with probability ``sample_rate``. Only one request is profiled at a time,
+    and the profile also holds whatever other requests ran on the event
+    loop meanwhile. The file name is returned in ``X-Profile-Id``, and only
+    the newest ``keep`` files are kept.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        output_dir: str,
+        secret: str | None = None,
+        sample_rate: float = 0,
+        interval: float = 0.005,
+        keep: int = 50,
+    ) -> None:
+        self.app = app
+        self.output_dir = Path(output_dir)
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.keep = keep
+        self._active = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self._active or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self._active = True
+        name = self._profile_name(scope)
+        sampler = StackSampler(threading.get_ident(), self.interval)
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile-Id"] = name
+            await send(message)
+
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            self._active = False
+            duration_ms = (time.perf_counter() - started) * 1000
+            await asyncio.to_thread(self._write, name, sampler.collapsed())
+            logger.info("Profiled %s in %.1f ms", name, duration_ms)
+
+    def should_profile(self, scope: Scope) -> bool:
+        if self.secret:
+            signature = Headers(scope=scope).get("x-profile")
+            if signature is None:
+                query = parse_qs(scope.get("query_string", b"").decode())
+                signature = query.get("profile", [None])[0]
+            if signature is not None and hmac.compare_digest(
+                signature, profile_signature(self.secret, scope["path"])
+            ):
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _profile_name(self, scope: Scope) -> str:
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        path = UNSAFE_FILENAME_CHARS.sub("_", scope["path"]).strip("_")
+        return f"{timestamp}-{scope['method']}-{path}.collapsed"
+
+    def _write(self, name: str, collapsed: str) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        (self.output_dir / name).write_text(collapsed)
+
+        profiles = sorted(self.output_dir.glob("*.collapsed"))
+        for old in profiles[: max(0, len(profiles) - self.keep)]:
+            old.unlink(missing_ok=True)
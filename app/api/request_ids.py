@@ -0,0 +1,65 @@
+import logging
+import re
+import time
+import uuid
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.settings.logs import request_id
+
+logger = logging.getLogger("app.requests")
+
+VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+
+class RequestIdMiddleware:
+    """Gives every request an id for its log records and its response.
+
+    The id is taken from a valid ``X-Request-ID`` header, as set by a proxy,
+    or generated. It is set in ``app.settings.logs.request_id`` for the
+    records logged while the request is handled and returned in
+    ``X-Request-ID``. One ``app.requests`` record per request has the
+    method, path, status and duration.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        current = Headers(scope=scope).get("x-request-id")
+        if current is None or not VALID_REQUEST_ID.fullmatch(current):
+            current = uuid.uuid4().hex
+        token = request_id.set(current)
+        status = 500
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = current
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            logger.info(
+                "%s %s %s in %.1f ms",
+                scope["method"],
+                scope["path"],
+                status,
+                duration_ms,
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": round(duration_ms, 1),
+                },
+            )
+            request_id.reset(token)
@@ -2,12 +2,18 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 from app.api.schemas.common import PaymentType
 from app.api.schemas.payment import PaymentCreate, PaymentResponse
 from app.api.schemas.product import ProductCreate, ProductResponse
 
+# Receipts fetched at most by one POST /api/v1/receipts/lookup
+MAX_LOOKUP_IDS = 500
+
+# Fields that can be picked with ?fields=; products can also be added with ?include=
+RECEIPT_FIELDS = ("id", "payment", "total", "rest", "created_at", "products")
+
 
 class ReceiptCreate(BaseModel):
     products: list[ProductCreate]
@@ -38,6 +44,85 @@ class ReceiptResponse(BaseModel):
         )
 
 
+class ReceiptSummaryResponse(BaseModel):
+    """Sparse receipt with only the fields picked by ``ReceiptFieldSet``"""
+
+    id: int
+    products: Optional[list[ProductResponse]] = None
+    payment: Optional[PaymentResponse] = None
+    total: Optional[Decimal] = None
+    rest: Optional[Decimal] = None
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_orm(cls, db_receipt, fields: frozenset[str]):
+        values = {"id": db_receipt.id}
+        if "products" in fields:
+            values["products"] = [
+                ProductResponse.model_validate(p) for p in db_receipt.products
+            ]
+        if "payment" in fields:
+            values["payment"] = PaymentResponse(
+                type=db_receipt.payment_type, amount=db_receipt.payment_amount
+            )
+        for name in ("total", "rest", "created_at"):
+            if name in fields:
+                values[name] = getattr(db_receipt, name)
+        return cls(**values)
+
+
+class ReceiptFieldSet(BaseModel):
+    fields: Optional[str] = Field(
+        None, description=f"Comma-separated subset of: {', '.join(RECEIPT_FIELDS)}"
+    )
+    include: Optional[str] = Field(
+        None, description="Comma-separated relations to add: products"
+    )
+
+    def selected(self) -> frozenset[str] | None:
+        """Requested fields, or None when the full receipt was asked for"""
+        if self.fields is None and self.include is None:
+            return None
+
+        fields = (
+            self._split(self.fields)
+            if self.fields is not None
+            else {name for name in RECEIPT_FIELDS if name != "products"}
+        )
+        include = self._split(self.include) if self.include is not None else set()
+
+        unknown = (fields - set(RECEIPT_FIELDS)) | (include - {"products"})
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        selected = frozenset(fields | include | {"id"})
+        return None if selected == frozenset(RECEIPT_FIELDS) else selected
+
+    @staticmethod
+    def _split(value: str) -> set[str]:
+        return {name.strip() for name in value.split(",") if name.strip()}
+
+
+class ReceiptLookupRequest(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=MAX_LOOKUP_IDS)
+
+
+class ReceiptLookupResponse(BaseModel):
+    """Found receipts in request order, and the ids that were not found"""
+
+    receipts: list[ReceiptResponse | ReceiptSummaryResponse]
+    missing: list[int]
+
+
+class ReceiptChangesResponse(BaseModel):
+    """Receipts changed and ids of receipts deleted since the previous sync"""
+
+    receipts: list[ReceiptResponse]
+    deleted: list[int]
+    # Passed as ``since`` to fetch the next page or to sync again later
+    watermark: str
+    has_more: bool
+
+
 class ReceiptFilter(BaseModel):
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
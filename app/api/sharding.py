@@ -0,0 +1,51 @@
+"""Route dependencies choosing the shard that ``get_db`` opens a session on.
+
+They only set ``request.state.shard``; authentication and validation still
+happen in the endpoints, so an unroutable request simply goes to shard 0.
+"""
+from fastapi import Request
+from jose import JWTError
+
+from app.db.main import shards
+from app.services.auth_utils import decode_token
+
+
+async def route_by_token(request: Request) -> None:
+    """Route to the shard of the user in the bearer token"""
+    if not shards.is_sharded:
+        return
+
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return
+    try:
+        user_id = int(decode_token(token)["sub"])
+    except (JWTError, KeyError, ValueError):
+        return
+    request.state.shard = shards.shard_map.shard_for_id(user_id)
+
+
+async def route_by_receipt_id(request: Request) -> None:
+    """Route to the shard encoded in the ``receipt_id`` path parameter"""
+    if not shards.is_sharded:
+        return
+
+    try:
+        receipt_id = int(request.path_params["receipt_id"])
+    except (KeyError, ValueError):
+        return
+    request.state.shard = shards.shard_map.shard_for_id(receipt_id)
+
+
+async def route_by_username(request: Request) -> None:
+    """Route to the shard a username is placed on, from a JSON or form body"""
+    if not shards.is_sharded:
+        return
+
+    if request.headers.get("Content-Type", "").startswith("application/json"):
+        body = await request.json()
+    else:
+        body = await request.form()
+    username = body.get("username") if hasattr(body, "get") else None
+    if isinstance(username, str):
+        request.state.shard = shards.shard_map.shard_for_username(username)
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, Query, Request, status
+
+from app.db.main import slow_queries
+from app.services.auth_dependencies import require_admin
+from app.services.receipt_filter import receipt_id_filter
+from app.services.receipts import receipt_list_cache
+
+router = APIRouter(prefix="/api/v1/admin", dependencies=[Depends(require_admin)])
+
+
+@router.get("/admission")
+async def get_admission_stats(request: Request) -> dict:
+    """Active, queued, admitted and shed requests per route class"""
+    return request.app.state.admission.snapshot()
+
+
+@router.get("/logging")
+async def get_logging_stats(request: Request) -> dict:
+    """Records waiting to be written, dropped on a full queue and sampled out"""
+    pipeline = request.app.state.log_pipeline
+    return pipeline.stats() if pipeline else {}
+
+
+@router.get("/receipt-cache")
+async def get_receipt_cache_stats() -> dict:
+    """Size, hits, misses and evictions of the receipt list cache"""
+    return receipt_list_cache.stats()
+
+
+@router.get("/receipt-id-filter")
+async def get_receipt_id_filter_stats() -> dict:
+    """Memory use, false positive rates and outcomes of the receipt id filter"""
+    return receipt_id_filter.stats()
+
+
+@router.get("/slow-queries")
+async def get_slow_queries(limit: int = Query(50, ge=1, le=1000)) -> dict:
+    """Most recent statements over the slow query threshold, newest first"""
+    return slow_queries.snapshot(limit)
+
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_slow_queries() -> None:
+    slow_queries.clear()
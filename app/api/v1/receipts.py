@@ -1,13 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.responses import PlainTextResponse
+import asyncio
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.exc import SQLAlchemyError
 
-from app.api.schemas.receipt import ReceiptCreate, ReceiptFilter, ReceiptResponse
+from app.api.binary import BINARY_RESPONSES, encode_receipts, negotiate_format
+from app.api.etags import etag_matches, receipt_etag, receipts_etag
+from app.api.schemas.receipt import (
+    ReceiptChangesResponse,
+    ReceiptCreate,
+    ReceiptFieldSet,
+    ReceiptFilter,
+    ReceiptLookupRequest,
+    ReceiptLookupResponse,
+    ReceiptResponse,
+    ReceiptSummaryResponse,
+)
+from app.api.sharding import route_by_receipt_id, route_by_token
+from app.db.main import ReleaseSessionRoute, use_autocommit
 from app.db.models.user import User
 from app.services.auth_dependencies import get_current_user
-from app.services.receipts import ReceiptService, get_receipt_service
+from app.services.receipt_events import Subscription, receipt_events
+from app.services.receipts import ReceiptService, SyncWatermark, get_receipt_service
+from app.settings.config import get_config
+
+config = get_config()
 
-router = APIRouter(prefix="/api/v1/receipts")
+router = APIRouter(
+    prefix="/api/v1/receipts",
+    dependencies=[Depends(route_by_token)],
+    route_class=ReleaseSessionRoute,
+)
 
 
 @router.post("", response_model=ReceiptResponse)
@@ -35,21 +58,158 @@ async def create_receipt(
         )
 
 
-@router.get("/{receipt_id}", response_model=ReceiptResponse)
+async def receipt_event_stream(
+    subscription: Subscription, backlog: list[tuple[int, str]]
+):
+    """Format replayed and live receipts as server-sent events"""
+    try:
+        yield "retry: 3000\n\n"
+        for receipt_id, data in backlog:
+            yield f"id: {receipt_id}\nevent: receipt\ndata: {data}\n\n"
+
+        replayed = {receipt_id for receipt_id, _ in backlog}
+        # A lagging subscription gets what it has queued, then the stream ends
+        # and the client resumes from the last event id it saw
+        while not (subscription.lagging and subscription.queue.empty()):
+            try:
+                receipt_id, data = await asyncio.wait_for(
+                    subscription.queue.get(), config.RECEIPT_STREAM_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if receipt_id not in replayed:
+                yield f"id: {receipt_id}\nevent: receipt\ndata: {data}\n\n"
+    finally:
+        receipt_events.unsubscribe(subscription)
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_receipts(
+    last_event_id: int | None = Header(None),
+    current_user: User = Depends(get_current_user),
+    receipt_service: ReceiptService = Depends(get_receipt_service),
+):
+    """Push the user's new receipts as server-sent events.
+
+    Reconnecting clients send ``Last-Event-ID`` and first get the receipts
+    created since then. The database session is only used for that replay,
+    so open streams do not hold database connections.
+    """
+    # Subscribe before the replay query so no receipt falls in between
+    subscription = await receipt_events.subscribe(current_user.id)
+    try:
+        backlog = []
+        if last_event_id is not None:
+            receipts = await receipt_service.get_receipts_after(
+                current_user.id, last_event_id
+            )
+            backlog = [
+                (receipt.id, receipt_service.receipt_event_data(receipt))
+                for receipt in receipts
+            ]
+    except SQLAlchemyError:
+        receipt_events.unsubscribe(subscription)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Database error occurred",
+        )
+
+    return StreamingResponse(
+        receipt_event_stream(subscription, backlog),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/changes", response_model=ReceiptChangesResponse)
+async def get_receipt_changes(
+    since: str
+    | None = Query(
+        None, description="Watermark of the previous sync; leave out for a full sync"
+    ),
+    limit: int = Query(100, ge=1, le=500),
+    current_user: User = Depends(get_current_user),
+    receipt_service: ReceiptService = Depends(get_receipt_service),
+):
+    """Receipts created or changed, and ids of receipts deleted, since ``since``.
+
+    Keep requesting with the returned ``watermark`` while ``has_more`` is
+    true, then store it for the next sync. 410 means the watermark is too old
+    to catch up from and the receipts have to be downloaded again.
+    """
+    try:
+        changes = await receipt_service.get_changes(
+            current_user.id,
+            SyncWatermark.decode(since) if since else None,
+            limit,
+        )
+
+        if changes is None:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Watermark expired, sync from scratch",
+            )
+
+        return ReceiptChangesResponse(
+            receipts=[
+                ReceiptResponse.from_orm(receipt) for receipt in changes.receipts
+            ],
+            deleted=changes.deleted,
+            watermark=changes.watermark.encode(),
+            has_more=changes.has_more,
+        )
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except SQLAlchemyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Database error occurred",
+        )
+
+
+@router.get(
+    "/{receipt_id}",
+    response_model=ReceiptResponse | ReceiptSummaryResponse,
+    response_model_exclude_unset=True,
+)
 async def get_receipt(
     receipt_id: int,
+    response: Response,
+    field_set: ReceiptFieldSet = Depends(),
+    if_none_match: str | None = Header(None),
     current_user: User = Depends(get_current_user),
     receipt_service: ReceiptService = Depends(get_receipt_service),
 ):
     try:
-        receipt = await receipt_service.get_receipt(receipt_id, current_user.id)
+        fields = field_set.selected()
+
+        if if_none_match:
+            # Check the cached version before loading products
+            updated_at = await receipt_service.get_receipt_version(
+                receipt_id, current_user.id
+            )
+            if updated_at is not None:
+                etag = receipt_etag(receipt_id, updated_at, fields)
+                if etag_matches(if_none_match, etag):
+                    return Response(
+                        status_code=status.HTTP_304_NOT_MODIFIED,
+                        headers={"ETag": etag},
+                    )
+
+        receipt = await receipt_service.get_receipt(receipt_id, current_user.id, fields)
 
         if not receipt:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Receipt not found"
             )
 
+        response.headers["ETag"] = receipt_etag(receipt.id, receipt.updated_at, fields)
+        if fields is not None:
+            return ReceiptSummaryResponse.from_orm(receipt, fields)
         return ReceiptResponse.from_orm(receipt)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
     except SQLAlchemyError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -57,18 +217,64 @@ async def get_receipt(
         )
 
 
-@router.get("", response_model=list[ReceiptResponse])
+@router.get(
+    "",
+    response_model=list[ReceiptResponse | ReceiptSummaryResponse],
+    response_model_exclude_unset=True,
+    responses=BINARY_RESPONSES,
+)
 async def get_user_receipts(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=0, le=100),
+    include_total: bool = Query(
+        False,
+        description="Report the number of matching receipts in the X-Total-Count header",
+    ),
     filters: ReceiptFilter = Depends(),
+    field_set: ReceiptFieldSet = Depends(),
+    if_none_match: str | None = Header(None),
+    accept: str | None = Header(None),
     current_user: User = Depends(get_current_user),
     receipt_service: ReceiptService = Depends(get_receipt_service),
 ):
     try:
+        fields = field_set.selected()
+        media_type = negotiate_format(accept)
         receipts = await receipt_service.get_user_receipts(
-            user_id=current_user.id, skip=skip, limit=limit, filters=filters
+            user_id=current_user.id,
+            skip=skip,
+            limit=limit,
+            filters=filters,
+            fields=fields,
         )
+
+        if include_total:
+            total, mode = await receipt_service.count_user_receipts(
+                user_id=current_user.id, filters=filters
+            )
+            response.headers["X-Total-Count"] = str(total)
+            response.headers["X-Total-Count-Mode"] = mode
+
+        response.headers["ETag"] = receipts_etag(receipts, fields, media_type)
+        response.headers["Vary"] = "Accept"
+        if etag_matches(if_none_match, response.headers["ETag"]):
+            # Same result set as the client's copy, skip serialization entirely
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers=response.headers
+            )
+
+        if media_type is not None:
+            return Response(
+                content=encode_receipts(media_type, receipts, fields),
+                media_type=media_type,
+                headers=response.headers,
+            )
+
+        if fields is not None:
+            return [
+                ReceiptSummaryResponse.from_orm(receipt, fields) for receipt in receipts
+            ]
         return [ReceiptResponse.from_orm(receipt) for receipt in receipts]
     except ValueError as ve:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
@@ -79,7 +285,60 @@ async def get_user_receipts(
         )
 
 
-@router.get("/{receipt_id}/view", response_class=PlainTextResponse)
+@router.post(
+    "/lookup",
+    response_model=ReceiptLookupResponse,
+    response_model_exclude_unset=True,
+    responses=BINARY_RESPONSES,
+    dependencies=[Depends(use_autocommit)],
+)
+async def lookup_receipts(
+    lookup: ReceiptLookupRequest,
+    response: Response,
+    field_set: ReceiptFieldSet = Depends(),
+    accept: str | None = Header(None),
+    current_user: User = Depends(get_current_user),
+    receipt_service: ReceiptService = Depends(get_receipt_service),
+):
+    """Fetch up to 500 of the user's receipts by id in one request"""
+    try:
+        fields = field_set.selected()
+        media_type = negotiate_format(accept)
+        receipts, missing = await receipt_service.get_receipts(
+            lookup.ids, current_user.id, fields
+        )
+
+        response.headers["Vary"] = "Accept"
+        if media_type is not None:
+            return Response(
+                content=encode_receipts(
+                    media_type, receipts, fields, metadata={"missing": missing}
+                ),
+                media_type=media_type,
+                headers=response.headers,
+            )
+
+        if fields is not None:
+            found = [
+                ReceiptSummaryResponse.from_orm(receipt, fields) for receipt in receipts
+            ]
+        else:
+            found = [ReceiptResponse.from_orm(receipt) for receipt in receipts]
+        return ReceiptLookupResponse(receipts=found, missing=missing)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except SQLAlchemyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Database error occurred",
+        )
+
+
+@router.get(
+    "/{receipt_id}/view",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(route_by_receipt_id)],
+)
 async def get_receipt_view(
     receipt_id: int,
     line_length: int = Query(32, gt=10, lt=100),
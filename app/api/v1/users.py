@@ -3,12 +3,17 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 from app.api.schemas.user import TokenPair, UserCreate, UserResponse
+from app.api.sharding import route_by_username
 from app.services.users import UserService, get_user_service
 
 router = APIRouter(prefix="/api/v1")
 
 
-@router.post("/register", response_model=UserResponse)
+@router.post(
+    "/register",
+    response_model=UserResponse,
+    dependencies=[Depends(route_by_username)],
+)
 async def register_user(
     user: UserCreate, user_service: UserService = Depends(get_user_service)
 ) -> UserResponse:
@@ -34,7 +39,9 @@ async def register_user(
         )
 
 
-@router.post("/login", response_model=TokenPair)
+@router.post(
+    "/login", response_model=TokenPair, dependencies=[Depends(route_by_username)]
+)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     user_service: UserService = Depends(get_user_service),
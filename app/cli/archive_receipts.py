@@ -0,0 +1,42 @@
+"""Move old receipts from the hot receipts/products tables into receipt_archive.
+
+    python -m app.cli.archive_receipts --older-than-days 90 --batch-size 500
+"""
+import argparse
+import asyncio
+import logging
+from datetime import timedelta
+
+from app.db.main import shards
+from app.services.archive import ReceiptArchiveService
+from app.settings.config import get_config
+
+config = get_config()
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with shards.get_session(args.shard) as session:
+        archived = await ReceiptArchiveService(session).archive_older_than(
+            max_age=timedelta(days=args.older_than_days),
+            batch_size=args.batch_size,
+            pause=args.pause,
+            max_batches=args.max_batches,
+        )
+    print(f"Archived {archived} receipts")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--older-than-days", type=int, default=config.RECEIPT_ARCHIVE_AFTER_DAYS
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument(
+        "--pause", type=float, default=0.1, help="seconds to sleep between batches"
+    )
+    parser.add_argument("--max-batches", type=int, default=None)
+    parser.add_argument(
+        "--shard", type=int, default=0, help="database shard to work on"
+    )
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,93 @@
+"""Move the inline names of existing products into the product catalog.
+
+    python -m app.cli.backfill_catalog --batch-size 10000
+
+Run it once per shard after turning on PRODUCT_CATALOG_ENABLED; new
+receipts use the catalog from then on. Products are handled in id ranges
+of --batch-size, each committed on its own with a checkpoint, so an
+interrupted run continues where it stopped when started again. Products
+created meanwhile by workers without the catalog keep their inline name.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from functools import partial
+
+from app.db.alembic.online import run_batches
+from app.db.main import shards
+from app.settings.config import get_config
+
+config = get_config()
+
+INSERT_NAMES = """
+    INSERT INTO product_catalog (user_id, name)
+    SELECT DISTINCT receipts.user_id, products.name
+    FROM products
+    JOIN receipts ON receipts.id = products.receipt_id
+    WHERE products.id > :last_key AND products.id <= :upper
+      AND products.catalog_id IS NULL AND products.name IS NOT NULL
+    ON CONFLICT (user_id, name) DO NOTHING
+"""
+
+SET_CATALOG_IDS = """
+    UPDATE products
+    SET catalog_id = (
+        SELECT product_catalog.id
+        FROM product_catalog
+        JOIN receipts ON receipts.user_id = product_catalog.user_id
+        WHERE receipts.id = products.receipt_id
+          AND product_catalog.name = products.name
+    )
+    WHERE id > :last_key AND id <= :upper
+      AND catalog_id IS NULL AND name IS NOT NULL
+"""
+
+# Only once every product of the range points at the catalog
+CLEAR_NAMES = """
+    UPDATE products SET name = NULL
+    WHERE id > :last_key AND id <= :upper
+      AND catalog_id IS NOT NULL AND name IS NOT NULL
+"""
+
+STEPS = [
+    ("product_catalog.names", INSERT_NAMES),
+    ("products.catalog_id", SET_CATALOG_IDS),
+    ("products.name", CLEAR_NAMES),
+]
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with shards.get_session(args.shard) as session:
+        connection = await session.connection(
+            execution_options={"isolation_level": "AUTOCOMMIT"}
+        )
+        for name, statement in STEPS:
+            rows = await connection.run_sync(
+                partial(
+                    run_batches,
+                    table="products",
+                    statement=statement,
+                    name=name,
+                    batch_size=args.batch_size,
+                    pause=args.pause,
+                )
+            )
+            print(f"{name}: {rows} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument(
+        "--pause", type=float, default=0.1, help="seconds to sleep between batches"
+    )
+    parser.add_argument(
+        "--shard", type=int, default=0, help="database shard to work on"
+    )
+    args = parser.parse_args()
+    if not config.PRODUCT_CATALOG_ENABLED:
+        # Workers without the catalog must keep finding names inline
+        sys.exit("PRODUCT_CATALOG_ENABLED is off; turn it on before moving names")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args))
@@ -0,0 +1,93 @@
+"""Measure API latency per endpoint under mixed traffic.
+
+    python -m app.cli.benchmark --iterations 500 --users 10
+
+Sends the traffic of app.cli.soak_test in-process, without its memory
+tracing, to the configured database, so it registers users and creates
+receipts there. The app runs with its lifespan, as under a server. Run it
+once with SQLITE_PATH set and once against PostgreSQL to compare the two
+modes.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+
+import httpx
+
+from app.cli.soak_test import EndpointStats, SoakClient
+from app.main import create_app
+
+
+def percentile(durations: list[float], fraction: float) -> float:
+    if len(durations) < 2:
+        return durations[0]
+    return statistics.quantiles(durations, n=100, method="inclusive")[
+        round(fraction * 100) - 1
+    ]
+
+
+def print_report(stats: dict[str, EndpointStats], seconds: float) -> None:
+    print(
+        f"{'endpoint':<32}{'requests':>9}{'errors':>8}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+    )
+    for endpoint, endpoint_stats in sorted(stats.items()):
+        durations = endpoint_stats.durations
+        print(
+            f"{endpoint:<32}{endpoint_stats.requests:>9}{endpoint_stats.errors:>8}"
+            + "".join(
+                f"{percentile(durations, fraction) * 1000:>9.1f}"
+                for fraction in (0.5, 0.95, 0.99)
+            )
+            + f"{max(durations) * 1000:>9.1f}"
+        )
+
+    requests = sum(endpoint_stats.requests for endpoint_stats in stats.values())
+    print(f"\n{requests} requests in {seconds:.1f} s, {requests / seconds:.1f}/s")
+
+
+async def main(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    stats: dict[str, EndpointStats] = {}
+    app = create_app()
+    transport = httpx.ASGITransport(app=app)
+
+    # The client's own request log is not part of the app under test
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    # ASGITransport sends no lifespan events; run the startup a server would
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        users = [SoakClient(client, rng, stats) for _ in range(args.users)]
+        for user in users:
+            await user.login()
+
+        for _ in range(args.warmup):
+            await asyncio.gather(*(user.step() for user in users))
+        stats.clear()
+
+        started = time.perf_counter()
+        for _ in range(args.iterations):
+            await asyncio.gather(*(user.step() for user in users))
+        seconds = time.perf_counter() - started
+
+    print_report(stats, seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--iterations", type=int, default=500, help="rounds measured after warm-up"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=50, help="rounds run before measuring"
+    )
+    parser.add_argument(
+        "--users", type=int, default=10, help="concurrent users, one request per round"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+
+    asyncio.run(main(parser.parse_args()))
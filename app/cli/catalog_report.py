@@ -0,0 +1,122 @@
+"""Report products/product_catalog storage size and receipt read speed.
+
+Run it before and after migrating to the product catalog and compare:
+
+    python -m app.cli.catalog_report --output before.json
+    alembic upgrade head
+    python -m app.cli.catalog_report --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import time
+from statistics import median
+
+from sqlalchemy import select, text
+
+from app.db.main import shards
+from app.db.models.receipt import UserReceiptCounter
+from app.repository.receipts import ReceiptRepository
+
+TABLES = ("products", "product_catalog")
+
+SIZE_QUERY = text(
+    """
+    SELECT pg_relation_size(CAST(:table AS regclass)) AS table_bytes,
+           pg_indexes_size(CAST(:table AS regclass)) AS index_bytes,
+           pg_total_relation_size(CAST(:table AS regclass)) AS total_bytes
+    """
+)
+
+
+async def collect_sizes(session) -> dict:
+    if session.get_bind().dialect.name != "postgresql":
+        return {}
+
+    sizes = {}
+    for table in TABLES:
+        exists = await session.scalar(
+            text("SELECT to_regclass(:table) IS NOT NULL"), {"table": table}
+        )
+        if not exists:
+            continue
+        row = (await session.execute(SIZE_QUERY, {"table": table})).mappings().one()
+        sizes[table] = dict(row)
+    return sizes
+
+
+async def measure_reads(session, users: int, iterations: int, limit: int) -> dict:
+    query = (
+        select(UserReceiptCounter.user_id)
+        .order_by(UserReceiptCounter.receipt_count.desc())
+        .limit(users)
+    )
+    user_ids = (await session.scalars(query)).all()
+    repository = ReceiptRepository(session)
+
+    timings = []
+    for _ in range(iterations):
+        for user_id in user_ids:
+            started = time.perf_counter()
+            await repository.get_user_receipts(user_id=user_id, limit=limit)
+            timings.append(time.perf_counter() - started)
+            session.expunge_all()
+
+    if not timings:
+        return {}
+    return {
+        "samples": len(timings),
+        "median_ms": round(median(timings) * 1000, 3),
+        "max_ms": round(max(timings) * 1000, 3),
+    }
+
+
+def print_report(report: dict, baseline: dict | None) -> None:
+    def delta(current, before):
+        if before in (None, 0) or current is None:
+            return ""
+        return f" ({(current - before) / before:+.1%})"
+
+    for table, sizes in report["sizes"].items():
+        before_sizes = (baseline or {}).get("sizes", {}).get(table, {})
+        for key, value in sizes.items():
+            print(f"{table}.{key}: {value}{delta(value, before_sizes.get(key))}")
+
+    reads = report["reads"]
+    before_reads = (baseline or {}).get("reads", {})
+    for key, value in reads.items():
+        print(f"reads.{key}: {value}{delta(value, before_reads.get(key))}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with shards.get_session(args.shard) as session:
+        report = {
+            "sizes": await collect_sizes(session),
+            "reads": await measure_reads(
+                session, args.users, args.iterations, args.limit
+            ),
+        }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    parser.add_argument("--compare", help="JSON report to compare against")
+    parser.add_argument(
+        "--shard", type=int, default=0, help="database shard to work on"
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,56 @@
+"""Export receipts and products as Parquet or Arrow files partitioned by day.
+
+    python -m app.cli.export_receipts /data/receipts --format parquet
+
+Every run continues from the watermark left in the output directory by the
+previous run for the same --shard, so all shards can share one directory.
+Reads go to POSTGRES_READ_ONLY_HOST when it is configured.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import timedelta
+from pathlib import Path
+
+from app.db.main import shards
+from app.services.export import EXPORT_FORMATS, ReceiptExportService
+
+
+async def main(args: argparse.Namespace) -> None:
+    args.output.mkdir(parents=True, exist_ok=True)
+    database = shards.get(args.shard)
+    if database.has_read_only:
+        get_session = database.get_read_only_session
+    else:
+        get_session = database.get_session
+
+    async with get_session() as session:
+        result = await ReceiptExportService(session).export(
+            args.output,
+            file_format=args.format,
+            batch_size=args.batch_size,
+            settle=timedelta(seconds=args.settle_seconds),
+            shard=args.shard,
+        )
+    print(
+        f"Exported {result.receipts} receipts and {result.products} products "
+        f"into {result.files} files, watermark at receipt {result.last_receipt_id}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="parquet")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument(
+        "--settle-seconds",
+        type=int,
+        default=300,
+        help="leave receipts younger than this for the next run",
+    )
+    parser.add_argument(
+        "--shard", type=int, default=0, help="database shard to work on"
+    )
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args()))
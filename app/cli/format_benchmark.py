@@ -0,0 +1,163 @@
+"""Compare JSON, MessagePack and Arrow receipt list bodies.
+
+    python -m app.cli.format_benchmark --receipts 100 --products 10 --repeat 20
+
+Creates --receipts receipts of --products lines for a new user in-process,
+then reports for each format the body size, the time to encode the loaded
+receipts, the time a client takes to decode the body, and the best and
+median time of a whole list request. JSON is encoded the way FastAPI
+encodes a route's return value. It writes to the configured database, so
+point it at a disposable one, with RECEIPT_LIST_CACHE_SIZE=0 to keep the
+request times free of cache hits.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from typing import Callable
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from jose import jwt
+
+from app.api.binary import ARROW_STREAM, MSGPACK, encode_receipts
+from app.api.schemas.receipt import ReceiptResponse
+from app.cli.receipt_benchmark import receipt_body
+from app.cli.soak_test import SoakClient
+from app.db.main import shards
+from app.main import create_app
+from app.services.receipts import ReceiptService
+
+try:
+    import msgpack
+except ImportError:  # msgpack is an optional dependency
+    msgpack = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pyarrow is an optional dependency
+    pa = None
+
+JSON = "application/json"
+
+
+def encode_json(receipts) -> bytes:
+    models = [ReceiptResponse.from_orm(receipt) for receipt in receipts]
+    return JSONResponse(jsonable_encoder(models)).body
+
+
+def decode_arrow(body: bytes):
+    return ipc.open_stream(body).read_all()
+
+
+def formats() -> list[tuple[str, Callable, Callable]]:
+    """(media type, encoder, client decoder) of the installed formats"""
+    available = [(JSON, encode_json, json.loads)]
+    if msgpack is not None:
+        available.append(
+            (
+                MSGPACK,
+                lambda receipts: encode_receipts(MSGPACK, receipts),
+                lambda body: msgpack.unpackb(body, timestamp=3),
+            )
+        )
+    if pa is not None:
+        available.append(
+            (
+                ARROW_STREAM,
+                lambda receipts: encode_receipts(ARROW_STREAM, receipts),
+                decode_arrow,
+            )
+        )
+    return available
+
+
+def best_of(function: Callable, argument, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(argument)
+        durations.append(time.perf_counter() - started)
+    return min(durations)
+
+
+async def request_times(
+    client: httpx.AsyncClient, user: SoakClient, media_type: str, args
+) -> tuple[bytes, list[float]]:
+    headers = {**user.headers, "Accept": media_type}
+    durations = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        response = await client.get(
+            "/api/v1/receipts", params={"limit": args.receipts}, headers=headers
+        )
+        durations.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return response.content, durations
+
+
+async def main(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=create_app())
+    results = []
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        user = SoakClient(client, rng, {})
+        await user.login()
+        for _ in range(args.receipts):
+            response = await client.post(
+                "/api/v1/receipts",
+                json=receipt_body(rng, args.products),
+                headers=user.headers,
+            )
+            response.raise_for_status()
+
+        token = user.headers["Authorization"].removeprefix("Bearer ")
+        user_id = int(jwt.get_unverified_claims(token)["sub"])
+        async with shards.get_session(0, autocommit=True) as session:
+            receipts = await ReceiptService(session).get_user_receipts(
+                user_id, limit=args.receipts
+            )
+
+        for media_type, encode, decode in formats():
+            body, durations = await request_times(client, user, media_type, args)
+            results.append(
+                (
+                    media_type,
+                    len(body),
+                    best_of(encode, receipts, args.repeat),
+                    best_of(decode, body, args.repeat),
+                    durations,
+                )
+            )
+
+    print(
+        f"{'format':<38}{'bytes':>9}{'encode ms':>11}{'decode ms':>11}"
+        f"{'best ms':>9}{'median ms':>11}"
+    )
+    for media_type, size, encoding, decoding, durations in results:
+        print(
+            f"{media_type:<38}{size:>9}{encoding * 1000:>11.2f}"
+            f"{decoding * 1000:>11.2f}{min(durations) * 1000:>9.1f}"
+            f"{statistics.median(durations) * 1000:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--receipts", type=int, default=100, help="receipts in the list, up to 100"
+    )
+    parser.add_argument("--products", type=int, default=10, help="lines per receipt")
+    parser.add_argument(
+        "--repeat", type=int, default=20, help="runs per measurement, best is kept"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+
+    asyncio.run(main(parser.parse_args()))
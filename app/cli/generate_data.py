@@ -0,0 +1,92 @@
+"""Bulk load synthetic users, receipts and products for performance testing.
+
+    python -m app.cli.generate_data --users 100000 --receipts-per-user 50 \\
+        --skew 1.5 --items 1-12 --cash-share 0.3 --days 365 --seed 42
+
+Rows are written with COPY on PostgreSQL and batched inserts elsewhere. The
+same arguments and seed always produce the same data. Every user gets the
+password given by --password. The receipts are loaded without receipt
+events, so afterwards running workers are told to rebuild their receipt id
+filters.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from app.db.main import shards
+from app.services.receipt_events import receipt_events
+from app.services.synthetic_data import SyntheticDataService, SyntheticDataSpec
+
+
+def item_range(value: str) -> tuple[int, int]:
+    low, _, high = value.partition("-")
+    low, high = int(low), int(high or low)
+    if not 1 <= low <= high:
+        raise argparse.ArgumentTypeError("expected MIN-MAX with 1 <= MIN <= MAX")
+    return low, high
+
+
+async def main(args: argparse.Namespace) -> None:
+    spec = SyntheticDataSpec(
+        users=args.users,
+        receipts_per_user=args.receipts_per_user,
+        skew=args.skew,
+        min_items=args.items[0],
+        max_items=args.items[1],
+        cash_share=args.cash_share,
+        days=args.days,
+        until=datetime.fromisoformat(args.until),
+        product_names=args.product_names,
+        seed=args.seed,
+        password=args.password,
+        username_prefix=args.username_prefix,
+    )
+
+    async with shards.get_session(args.shard) as session:
+        result = await SyntheticDataService(
+            session, args.shard, shards.shard_map
+        ).generate(spec, batch_size=args.batch_size)
+    await receipt_events.announce_gap()
+    print(
+        f"Loaded {result.users} users, {result.receipts} receipts "
+        f"and {result.products} products"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument(
+        "--receipts-per-user", type=float, default=20, help="mean receipts per user"
+    )
+    parser.add_argument(
+        "--skew",
+        type=float,
+        default=0,
+        help="Pareto shape (> 1) for receipts per user; uniform otherwise",
+    )
+    parser.add_argument(
+        "--items", type=item_range, default=(1, 10), help="products per receipt"
+    )
+    parser.add_argument(
+        "--cash-share", type=float, default=0.3, help="fraction of cash payments"
+    )
+    parser.add_argument(
+        "--days", type=int, default=365, help="spread receipts over this many days"
+    )
+    parser.add_argument(
+        "--until",
+        default=datetime.now().date().isoformat(),
+        help="date of the newest receipts (default: today)",
+    )
+    parser.add_argument("--product-names", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--username-prefix", default="synthetic")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument(
+        "--shard", type=int, default=0, help="database shard to work on"
+    )
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,156 @@
+"""Measure the time logging adds to a request.
+
+    python -m app.cli.log_benchmark --requests 2000 --output /tmp/bench.log
+
+Sends receipt detail, list and view requests in-process to the configured
+database under each logging setup in turn and compares the mean time per
+request with logging off:
+
+    off      only warnings, through the pipeline of app.settings.logs
+    echo     every SQL statement written to the output on the event loop,
+             as SQLAlchemy's echo=True used to
+    queue    every SQL statement and request as JSON through the pipeline
+    sampled  as queue, with SQL statements of one request in twenty
+
+It registers a user and creates a receipt, so point it at a disposable
+database. Records go to --output (by default discarded); --write-delay-ms
+makes every write to it that much slower, as a full pipe or a slow log
+collector would.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import time
+
+import httpx
+
+from app.cli.soak_test import SoakClient
+from app.main import create_app
+from app.settings.logs import configure_logging
+
+API = "/api/v1"
+
+MODES = ["off", "echo", "queue", "sampled"]
+
+
+class CountingStream:
+    """File wrapper counting the lines written to it, optionally slow"""
+
+    def __init__(self, file, write_delay: float = 0):
+        self.file = file
+        self.write_delay = write_delay
+        self.lines = 0
+
+    def write(self, text: str) -> None:
+        if self.write_delay:
+            time.sleep(self.write_delay)
+        self.lines += text.count("\n")
+        self.file.write(text)
+
+    def flush(self) -> None:
+        self.file.flush()
+
+
+def start_logging(mode: str, stream: CountingStream):
+    """Set up ``mode``; returns the pipeline, if any, and the echo handler"""
+    if mode == "echo":
+        pipeline = configure_logging(level="WARNING", stream=stream)
+        # What SQLAlchemy's echo=True sets up, without a pipeline to propagate to
+        echo = logging.StreamHandler(stream)
+        echo.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+        )
+        engine_logger = logging.getLogger("sqlalchemy.engine")
+        engine_logger.setLevel(logging.INFO)
+        engine_logger.propagate = False
+        engine_logger.addHandler(echo)
+        return pipeline, echo
+
+    levels = {"off": "WARNING", "queue": "INFO", "sampled": "INFO"}[mode]
+    pipeline = configure_logging(
+        level=levels,
+        levels="sqlalchemy.engine=INFO" if mode != "off" else None,
+        sample_rates="sqlalchemy.engine=0.05" if mode == "sampled" else None,
+        stream=stream,
+    )
+    return pipeline, None
+
+
+def stop_logging(pipeline, echo) -> None:
+    pipeline.stop()
+    if echo is not None:
+        engine_logger = logging.getLogger("sqlalchemy.engine")
+        engine_logger.removeHandler(echo)
+        engine_logger.propagate = True
+
+
+async def run_requests(
+    client: httpx.AsyncClient, user: SoakClient, receipt_id: int, requests: int
+) -> list[float]:
+    paths = [
+        f"{API}/receipts/{receipt_id}",
+        f"{API}/receipts?limit=10",
+        f"{API}/receipts/{receipt_id}/view",
+    ]
+    durations = []
+    for i in range(requests):
+        started = time.perf_counter()
+        response = await client.get(paths[i % len(paths)], headers=user.headers)
+        durations.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return durations
+
+
+async def main(args: argparse.Namespace) -> None:
+    transport = httpx.ASGITransport(app=create_app())
+    results = {}
+
+    with open(args.output, "a") as output:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            user = SoakClient(client, random.Random(args.seed), {})
+            await user.login()
+            await user.create_receipt()
+            receipt_id = user.receipt_ids[0]
+            await run_requests(client, user, receipt_id, args.warmup)
+
+            for mode in MODES:
+                stream = CountingStream(output, args.write_delay_ms / 1000)
+                pipeline, echo = start_logging(mode, stream)
+                durations = await run_requests(client, user, receipt_id, args.requests)
+                stats = pipeline.stats()
+                stop_logging(pipeline, echo)
+                results[mode] = (durations, stream.lines, stats["dropped"])
+
+    baseline = statistics.mean(results["off"][0])
+    print(
+        f"{'mode':<10}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'+us/req':>9}{'lines':>9}{'dropped':>9}"
+    )
+    for mode, (durations, lines, dropped) in results.items():
+        mean = statistics.mean(durations)
+        quantiles = statistics.quantiles(durations, n=20)
+        print(
+            f"{mode:<10}{mean * 1000:>9.2f}{quantiles[9] * 1000:>9.2f}"
+            f"{quantiles[18] * 1000:>9.2f}{(mean - baseline) * 1e6:>+9.0f}"
+            f"{lines:>9}{dropped:>9}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--requests", type=int, default=2000, help="requests per logging mode"
+    )
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--output", default=os.devnull, help="file records go to")
+    parser.add_argument(
+        "--write-delay-ms", type=float, default=0, help="added to every write"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,88 @@
+"""Delete a user's data, or receipts past the retention period, in small chunks.
+
+    python -m app.cli.purge user 42
+    python -m app.cli.purge retention --older-than-days 365
+    python -m app.cli.purge resume 7
+    python -m app.cli.purge status
+"""
+import argparse
+import asyncio
+import logging
+from datetime import timedelta
+
+from app.db.main import shards
+from app.services.purge import PurgeService
+from app.settings.config import get_config
+
+config = get_config()
+
+
+def print_job(job) -> None:
+    print(
+        f"job {job.id}: {job.kind.value} {job.status.value} "
+        f"user_id={job.user_id} cutoff={job.cutoff} "
+        f"receipts={job.deleted_receipts} products={job.deleted_products} "
+        f"archived={job.deleted_archived}"
+        + (f" error={job.error}" if job.error else "")
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    shard = args.shard
+    if args.command == "user":
+        # A user's data lives on the shard encoded in their id
+        shard = shards.shard_map.shard_for_id(args.user_id)
+
+    async with shards.get_session(shard) as session:
+        service = PurgeService(session)
+
+        if args.command == "status":
+            for job in await service.get_jobs(unfinished_only=not args.all):
+                print_job(job)
+            return
+
+        if args.command == "user":
+            job_id = (await service.start_user_purge(args.user_id)).id
+        elif args.command == "retention":
+            if args.older_than_days is None:
+                raise SystemExit("Set --older-than-days or PURGE_RETENTION_DAYS")
+            max_age = timedelta(days=args.older_than_days)
+            job_id = (await service.start_retention_purge(max_age)).id
+        else:
+            job_id = args.job_id
+
+        print_job(
+            await service.run(job_id, chunk_size=args.chunk_size, pause=args.pause)
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=config.PURGE_CHUNK_SIZE)
+    parser.add_argument(
+        "--pause",
+        type=float,
+        default=config.PURGE_PAUSE_SECONDS,
+        help="seconds to sleep between chunks",
+    )
+    parser.add_argument(
+        "--shard", type=int, default=0, help="database shard to work on"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    user = commands.add_parser("user", help="delete a user with all their receipts")
+    user.add_argument("user_id", type=int)
+
+    retention = commands.add_parser("retention", help="delete old receipts")
+    retention.add_argument(
+        "--older-than-days", type=int, default=config.PURGE_RETENTION_DAYS
+    )
+
+    resume = commands.add_parser("resume", help="continue an interrupted job")
+    resume.add_argument("job_id", type=int)
+
+    status = commands.add_parser("status", help="show unfinished jobs")
+    status.add_argument("--all", action="store_true", help="include finished jobs")
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args()))
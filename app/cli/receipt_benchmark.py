@@ -0,0 +1,106 @@
+"""Measure the time to create large receipts on the ORM and bulk paths.
+
+    python -m app.cli.receipt_benchmark --lines 1000 10000 --repeat 3
+
+Posts receipts of each --lines size in-process to the configured database,
+once through the ORM path and once through the bulk insert path that
+receipts of LARGE_RECEIPT_THRESHOLD lines or more take, and reports the
+best and median time of --repeat runs. It registers a user and creates
+receipts, so point it at a disposable database.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from decimal import Decimal
+
+import httpx
+
+import app.services.receipts
+from app.cli.soak_test import SoakClient
+from app.main import create_app
+
+PATHS = ["orm", "bulk"]
+
+
+def receipt_body(rng: random.Random, lines: int) -> dict:
+    products = [
+        {
+            "name": f"Product {rng.randint(0, 5000)}",
+            # Quarters keep price * quantity exact in SQLite floating point
+            "price": Decimal(rng.randint(1, 400)) / 4,
+            "quantity": rng.randint(1, 5),
+        }
+        for _ in range(lines)
+    ]
+    total = sum(product["price"] * product["quantity"] for product in products)
+    return {
+        "products": [
+            {**product, "price": str(product["price"])} for product in products
+        ],
+        "payment": {"type": "cashless", "amount": str(total)},
+    }
+
+
+async def time_receipts(
+    client: httpx.AsyncClient, user: SoakClient, body: dict, repeat: int
+) -> list[float]:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.post(
+            "/api/v1/receipts", json=body, headers=user.headers
+        )
+        durations.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return durations
+
+
+async def main(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=create_app())
+    service_config = app.services.receipts.config
+    results = []
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        user = SoakClient(client, rng, {})
+        await user.login()
+
+        for lines in args.lines:
+            body = receipt_body(rng, lines)
+            for path in PATHS:
+                # The path is picked by size; move the threshold to force it
+                service_config.LARGE_RECEIPT_THRESHOLD = (
+                    lines + 1 if path == "orm" else 1
+                )
+                durations = await time_receipts(client, user, body, args.repeat)
+                results.append((lines, path, durations))
+
+    print(f"{'lines':>8}  {'path':<6}{'best ms':>10}{'median ms':>11}{'us/line':>9}")
+    for lines, path, durations in results:
+        best = min(durations)
+        print(
+            f"{lines:>8}  {path:<6}{best * 1000:>10.1f}"
+            f"{statistics.median(durations) * 1000:>11.1f}"
+            f"{best * 1e6 / lines:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--lines",
+        type=int,
+        nargs="+",
+        default=[1000, 10000],
+        help="receipt sizes to measure",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="receipts created per size and path"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+
+    asyncio.run(main(parser.parse_args()))
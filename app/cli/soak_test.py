@@ -0,0 +1,301 @@
+"""Run mixed API traffic in-process and report memory growth.
+
+    python -m app.cli.soak_test --iterations 2000 --users 5 \\
+        --max-growth-kb 2048 --max-object-growth 5000
+
+Talks to the configured database: it registers users and creates receipts,
+so point it at a disposable one. The app runs with its lifespan, as under a
+server. After --warmup iterations it takes a tracemalloc snapshot and counts
+live objects by type, and compares both with the end of the run. Peak
+allocations per endpoint come from --peak-rounds more rounds that send one
+request at a time. Exits with status 1 when the growth crosses a
+threshold. Bounded caches fill up during a run and show up as growth; set
+RECEIPT_LIST_CACHE_SIZE=0 to keep them out of the numbers.
+"""
+import argparse
+import asyncio
+import gc
+import logging
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import httpx
+
+from app.main import create_app
+
+API = "/api/v1"
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    errors: int = 0
+    seconds: float = 0
+    peak_bytes: int = 0
+    durations: list[float] = field(default_factory=list)
+
+
+class SoakClient:
+    """One user sending a random mix of requests, with per-endpoint stats"""
+
+    def __init__(self, client: httpx.AsyncClient, rng: random.Random, stats: dict):
+        self.client = client
+        self.rng = rng
+        self.stats = stats
+        self.headers = {}
+        self.receipt_ids: list[int] = []
+        self.watermark: str | None = None
+        # tracemalloc peaks are process-wide, only usable without concurrency
+        self.measure_peaks = False
+
+    async def login(self) -> None:
+        username = f"soak-{uuid.uuid4().hex[:12]}"
+        password = uuid.uuid4().hex
+        await self.client.post(
+            f"{API}/register",
+            json={
+                "username": username,
+                "email": f"{username}@example.com",
+                "password": password,
+            },
+        )
+        response = await self.client.post(
+            f"{API}/login", data={"username": username, "password": password}
+        )
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    async def step(self) -> None:
+        action = self.rng.choices(
+            [
+                self.create_receipt,
+                self.list_receipts,
+                self.get_receipt,
+                self.view_receipt,
+                self.lookup_receipts,
+                self.sync_changes,
+            ],
+            weights=[3, 4, 3, 1, 1, 1],
+        )[0]
+        await action()
+
+    async def create_receipt(self) -> None:
+        # Mostly small receipts, now and then one that takes the bulk path
+        lines = 250 if self.rng.random() < 0.02 else self.rng.randint(1, 12)
+        products = [
+            {
+                "name": f"Product {self.rng.randint(0, 500)}",
+                # Quarters keep price * quantity exact in SQLite floating point
+                "price": Decimal(self.rng.randint(1, 4000)) / 4,
+                "quantity": self.rng.randint(1, 5),
+            }
+            for _ in range(lines)
+        ]
+        total = sum(product["price"] * product["quantity"] for product in products)
+        body = {
+            "products": [
+                {**product, "price": str(product["price"])} for product in products
+            ],
+            "payment": {"type": "cashless", "amount": str(total)},
+        }
+        response = await self.request("POST", "/receipts", json=body)
+        if response.status_code == 200:
+            self.receipt_ids.append(response.json()["id"])
+
+    async def list_receipts(self) -> None:
+        params = {"limit": self.rng.choice([10, 50, 100])}
+        if self.rng.random() < 0.3:
+            params["fields"] = "id,total,created_at"
+        await self.request("GET", "/receipts", params=params)
+
+    async def get_receipt(self) -> None:
+        if self.receipt_ids:
+            receipt_id = self.rng.choice(self.receipt_ids)
+            await self.request("GET", f"/receipts/{receipt_id}", "/receipts/{id}")
+
+    async def view_receipt(self) -> None:
+        if self.receipt_ids:
+            receipt_id = self.rng.choice(self.receipt_ids)
+            await self.request(
+                "GET", f"/receipts/{receipt_id}/view", "/receipts/{id}/view"
+            )
+
+    async def lookup_receipts(self) -> None:
+        if self.receipt_ids:
+            ids = self.rng.sample(self.receipt_ids, min(50, len(self.receipt_ids)))
+            await self.request("POST", "/receipts/lookup", json={"ids": ids})
+
+    async def sync_changes(self) -> None:
+        params = {"limit": 50}
+        if self.watermark:
+            params["since"] = self.watermark
+        response = await self.request("GET", "/receipts/changes", params=params)
+        if response.status_code == 200:
+            self.watermark = response.json()["watermark"]
+
+    async def request(
+        self, method: str, path: str, endpoint: str | None = None, **kwargs
+    ) -> httpx.Response:
+        stats = self.stats.setdefault(f"{method} {endpoint or path}", EndpointStats())
+        if self.measure_peaks:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+
+        response = await self.client.request(
+            method, API + path, headers=self.headers, **kwargs
+        )
+
+        duration = time.perf_counter() - started
+        stats.seconds += duration
+        stats.durations.append(duration)
+        stats.requests += 1
+        stats.errors += response.status_code >= 400
+        if self.measure_peaks:
+            _, peak = tracemalloc.get_traced_memory()
+            stats.peak_bytes = max(stats.peak_bytes, peak - before)
+        return response
+
+
+def count_objects() -> Counter:
+    gc.collect()
+    return Counter(
+        f"{type(obj).__module__}.{type(obj).__qualname__}" for obj in gc.get_objects()
+    )
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    gc.collect()
+    return tracemalloc.take_snapshot().filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ]
+    )
+
+
+def print_report(stats, peak_stats, growth_stats, object_growth, top: int) -> None:
+    print(f"{'endpoint':<32}{'requests':>9}{'errors':>8}{'avg ms':>9}{'peak KiB':>10}")
+    for endpoint, endpoint_stats in sorted(stats.items()):
+        peak = f"{'-':>10}"
+        if endpoint in peak_stats:
+            peak = f"{peak_stats[endpoint].peak_bytes / 1024:>10.1f}"
+        print(
+            f"{endpoint:<32}{endpoint_stats.requests:>9}{endpoint_stats.errors:>8}"
+            f"{endpoint_stats.seconds / endpoint_stats.requests * 1000:>9.1f}{peak}"
+        )
+
+    print("\nTop allocation sites by growth since warm-up:")
+    for stat in growth_stats[:top]:
+        frame = stat.traceback[0]
+        print(
+            f"{stat.size_diff / 1024:>+10.1f} KiB {stat.count_diff:>+8} blocks  "
+            f"{frame.filename}:{frame.lineno}"
+        )
+
+    print("\nTop object types by growth since warm-up:")
+    for name, diff in object_growth.most_common(top):
+        if diff <= 0:
+            break
+        print(f"{diff:>+10}  {name}")
+
+
+async def main(args: argparse.Namespace) -> int:
+    rng = random.Random(args.seed)
+    stats: dict[str, EndpointStats] = {}
+    peak_stats: dict[str, EndpointStats] = {}
+    app = create_app()
+    transport = httpx.ASGITransport(app=app)
+
+    # The client's own request log is not part of the app under test
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    tracemalloc.start(args.frames)
+    # ASGITransport sends no lifespan events; run the startup a server would,
+    # so the logging pipeline and the receipt id filter are part of the soak
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://soak"
+    ) as client:
+        users = [SoakClient(client, rng, stats) for _ in range(args.users)]
+        for user in users:
+            await user.login()
+
+        for _ in range(args.warmup):
+            await asyncio.gather(*(user.step() for user in users))
+        baseline = take_snapshot()
+        baseline_objects = count_objects()
+
+        for _ in range(args.iterations):
+            await asyncio.gather(*(user.step() for user in users))
+        final = take_snapshot()
+        final_objects = count_objects()
+
+        for user in users:
+            user.stats, user.measure_peaks = peak_stats, True
+        for _ in range(args.peak_rounds):
+            for user in users:
+                await user.step()
+    tracemalloc.stop()
+
+    growth_stats = final.compare_to(baseline, "lineno")
+    growth = sum(stat.size_diff for stat in growth_stats)
+    object_growth = final_objects.copy()
+    object_growth.subtract(baseline_objects)
+
+    print_report(stats, peak_stats, growth_stats, object_growth, args.top)
+
+    failures = []
+    if growth > args.max_growth_kb * 1024:
+        failures.append(
+            f"traced memory grew by {growth / 1024:.1f} KiB "
+            f"(limit {args.max_growth_kb} KiB)"
+        )
+    for name, diff in object_growth.items():
+        if diff > args.max_object_growth:
+            failures.append(
+                f"{diff} more {name} objects (limit {args.max_object_growth})"
+            )
+
+    print()
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print(f"OK: traced memory grew by {growth / 1024:.1f} KiB")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--iterations", type=int, default=1000, help="rounds measured after warm-up"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=100, help="rounds run before the baseline"
+    )
+    parser.add_argument(
+        "--users", type=int, default=5, help="concurrent users, one request per round"
+    )
+    parser.add_argument(
+        "--peak-rounds",
+        type=int,
+        default=20,
+        help="rounds after the measurement sending one request at a time, "
+        "for the peak allocation per endpoint",
+    )
+    parser.add_argument("--max-growth-kb", type=float, default=2048)
+    parser.add_argument("--max-object-growth", type=int, default=5000)
+    parser.add_argument(
+        "--frames", type=int, default=1, help="stack depth kept per allocation"
+    )
+    parser.add_argument("--top", type=int, default=15, help="report lines per section")
+    parser.add_argument("--seed", type=int, default=0)
+
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -21,7 +21,10 @@ db_config = DBConfig()
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
-config.set_main_option("sqlalchemy.url", db_config.full_database_url)
+
+# With sharding, migrate one shard at a time: alembic -x shard=1 upgrade head
+shard = int(context.get_x_argument(as_dictionary=True).get("shard", 0))
+config.set_main_option("sqlalchemy.url", db_config.shard_urls[shard])
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
@@ -65,7 +68,16 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    # One transaction per migration, so helpers in app.db.alembic.online can
+    # commit around their autocommit steps without affecting other revisions
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        transaction_per_migration=True,
+        # SQLite alters most things by rebuilding the table, so autogenerate
+        # writes batch operations for it
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
 
     with context.begin_transaction():
         context.run_migrations()
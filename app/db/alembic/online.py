@@ -0,0 +1,266 @@
+"""Helpers for migrations that must not block a large, busy database.
+
+    from app.db.alembic.online import add_column, backfill, create_index, set_not_null
+
+    def upgrade() -> None:
+        add_column("products", sa.Column("total", sa.Numeric(10, 2)))
+        backfill(
+            "products",
+            "total = price * quantity",
+            where="total IS NULL",
+            name="products.total",
+        )
+        set_not_null("products", "total")
+        create_index("ix_products_total", "products", ["total"])
+
+Backfills and concurrent index builds run outside the migration transaction
+and commit as they go, so they must be safe to repeat: an interrupted
+``alembic upgrade`` is simply run again and continues where it stopped.
+Other dialects run the same steps without the PostgreSQL-specific parts.
+"""
+import logging
+import time
+
+import sqlalchemy as sa
+from alembic import op
+
+logger = logging.getLogger("alembic.online")
+
+CHECKPOINTS_TABLE = "alembic_backfill_checkpoints"
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def add_column(table: str, column: sa.Column) -> None:
+    """Add ``column`` as nullable, so the table is not rewritten.
+
+    PostgreSQL 11+ keeps non-volatile server defaults in the catalog instead of
+    writing them to every row; volatile ones such as ``random()`` would still
+    rewrite it, so backfill those instead. Backfill the column and call
+    ``set_not_null`` afterwards if it must be NOT NULL.
+    """
+    column.nullable = True
+    op.add_column(table, column)
+
+
+def set_not_null(table: str, column: str) -> None:
+    """Make ``column`` NOT NULL without holding an exclusive lock while scanning.
+
+    On PostgreSQL a ``NOT VALID`` check constraint is added and committed
+    first. It is validated in a transaction of its own, under a lock that
+    allows writes, and ``SET NOT NULL`` then reuses it (12+) in another short
+    one. A rerun after an interruption keeps the constraint already added.
+    """
+    if not _is_postgresql():
+        if op.get_bind().dialect.name == "sqlite":
+            # pysqlite commits CREATE TABLE at once, so a failed rebuild
+            # leaves its copy of the table behind
+            op.execute(f"DROP TABLE IF EXISTS _alembic_tmp_{table}")
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column(column, nullable=False)
+        return
+
+    constraint = f"{table}_{column}_not_null"[:63]
+    # Every statement in the block commits on its own
+    with op.get_context().autocommit_block():
+        exists = False
+        if not op.get_context().as_sql:
+            exists = op.get_bind().scalar(
+                sa.text(
+                    "SELECT EXISTS (SELECT 1 FROM pg_constraint "
+                    "WHERE conname = :name AND conrelid = CAST(:table AS regclass))"
+                ),
+                {"name": constraint, "table": table},
+            )
+        if not exists:
+            op.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {constraint} "
+                f"CHECK ({column} IS NOT NULL) NOT VALID"
+            )
+        op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {constraint}")
+        op.alter_column(table, column, nullable=False)
+        op.drop_constraint(constraint, table)
+
+
+def create_index(name: str, table: str, columns: list[str], **kwargs) -> None:
+    """Create an index with ``CONCURRENTLY`` on PostgreSQL.
+
+    An invalid index left behind by an interrupted concurrent build is
+    dropped and built again.
+    """
+    if not _is_postgresql():
+        op.create_index(name, table, columns, **kwargs)
+        return
+
+    with op.get_context().autocommit_block():
+        valid = None
+        # Offline (--sql) runs cannot query, they only print the statements
+        if not op.get_context().as_sql:
+            valid = op.get_bind().scalar(
+                sa.text(
+                    "SELECT i.indisvalid FROM pg_index i "
+                    "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+                ),
+                {"name": name},
+            )
+        if valid:
+            return
+        if valid is False:
+            logger.warning("Dropping invalid index %s", name)
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(name, table, columns, postgresql_concurrently=True, **kwargs)
+
+
+def drop_index(name: str, table: str) -> None:
+    if not _is_postgresql():
+        op.drop_index(name, table_name=table)
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            name, table_name=table, postgresql_concurrently=True, if_exists=True
+        )
+
+
+def backfill(
+    table: str,
+    assignments: str,
+    *,
+    name: str,
+    where: str | None = None,
+    key: str = "id",
+    batch_size: int = 10_000,
+    pause: float = 0.1,
+) -> int:
+    """Run ``UPDATE table SET assignments`` in key ranges of ``batch_size`` rows.
+
+    Every batch commits on its own and records the last key it covered under
+    ``name`` in the checkpoints table, so a rerun starts after it. ``where``
+    should exclude rows that are already done, which keeps a batch that ran
+    just before an interruption harmless to repeat. Sleeps ``pause`` seconds
+    between batches to leave room for regular traffic. Returns the number
+    of rows updated by this run.
+    """
+    if op.get_context().as_sql:
+        raise RuntimeError(f"Backfill {name} needs a database connection, not --sql")
+
+    update = (
+        f"UPDATE {table} SET {assignments} "
+        f"WHERE {key} > :last_key AND {key} <= :upper"
+        + (f" AND ({where})" if where else "")
+    )
+    with op.get_context().autocommit_block():
+        return run_batches(
+            op.get_bind(),
+            table,
+            update,
+            name=name,
+            key=key,
+            batch_size=batch_size,
+            pause=pause,
+        )
+
+
+def run_batches(
+    connection: sa.Connection,
+    table: str,
+    statement: str,
+    *,
+    name: str,
+    key: str = "id",
+    batch_size: int = 10_000,
+    pause: float = 0.1,
+) -> int:
+    """Run ``statement`` for consecutive ``key`` ranges of ``table``, as ``backfill``.
+
+    The statement gets the range as ``:last_key`` (excluded) and ``:upper``.
+    ``connection`` must be in autocommit mode, so every batch commits on its
+    own. Usable outside migrations, e.g. from a maintenance command.
+    """
+    updated = 0
+    _ensure_checkpoints(connection)
+
+    last_key, finished = _load_checkpoint(connection, name)
+    if finished:
+        logger.info("Backfill %s already finished", name)
+        return 0
+    if last_key is None:
+        first_key = connection.scalar(sa.text(f"SELECT MIN({key}) FROM {table}"))
+        if first_key is None:
+            _save_checkpoint(connection, name, 0, finished=True)
+            return 0
+        last_key = first_key - 1
+
+    next_bound = sa.text(
+        f"SELECT {key} FROM {table} WHERE {key} > :last_key "
+        f"ORDER BY {key} LIMIT 1 OFFSET :offset"
+    )
+    last_in_table = sa.text(f"SELECT MAX({key}) FROM {table}")
+    batch = sa.text(statement)
+
+    while True:
+        upper = connection.scalar(
+            next_bound, {"last_key": last_key, "offset": batch_size - 1}
+        )
+        if upper is None:
+            # Fewer than batch_size rows left, finish with the rest
+            upper = connection.scalar(last_in_table)
+            if upper is None or upper <= last_key:
+                break
+
+        result = connection.execute(batch, {"last_key": last_key, "upper": upper})
+        updated += result.rowcount
+        last_key = upper
+        _save_checkpoint(connection, name, last_key, finished=False)
+        logger.info("Backfill %s: %s rows, up to %s %s", name, updated, key, upper)
+
+        if pause:
+            time.sleep(pause)
+
+    _save_checkpoint(connection, name, last_key, finished=True)
+    return updated
+
+
+def _ensure_checkpoints(connection) -> None:
+    connection.execute(
+        sa.text(
+            f"CREATE TABLE IF NOT EXISTS {CHECKPOINTS_TABLE} ("
+            "name VARCHAR(255) PRIMARY KEY, "
+            "last_key BIGINT NOT NULL, "
+            "finished BOOLEAN NOT NULL)"
+        )
+    )
+
+
+def _load_checkpoint(connection, name: str) -> tuple[int | None, bool]:
+    row = connection.execute(
+        sa.text(
+            f"SELECT last_key, finished FROM {CHECKPOINTS_TABLE} WHERE name = :name"
+        ),
+        {"name": name},
+    ).first()
+    if row is None:
+        return None, False
+    logger.info("Resuming backfill %s after key %s", name, row.last_key)
+    return row.last_key, bool(row.finished)
+
+
+def _save_checkpoint(connection, name: str, last_key: int, finished: bool) -> None:
+    values = {"name": name, "last_key": last_key, "finished": finished}
+    result = connection.execute(
+        sa.text(
+            f"UPDATE {CHECKPOINTS_TABLE} SET last_key = :last_key, "
+            "finished = :finished WHERE name = :name"
+        ),
+        values,
+    )
+    if result.rowcount == 0:
+        connection.execute(
+            sa.text(
+                f"INSERT INTO {CHECKPOINTS_TABLE} (name, last_key, finished) "
+                "VALUES (:name, :last_key, :finished)"
+            ),
+            values,
+        )
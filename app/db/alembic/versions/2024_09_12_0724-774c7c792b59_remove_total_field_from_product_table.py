@@ -18,20 +18,24 @@ depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_column("products", "total")
-    # ### end Alembic commands ###
+    # Batch mode, so that SQLite rebuilds the table. There the check on the
+    # column is dropped first; PostgreSQL drops it with the column, and keeps
+    # the DDL this migration was first applied with
+    with op.batch_alter_table("products") as batch_op:
+        if op.get_bind().dialect.name != "postgresql":
+            batch_op.drop_constraint("check_total_calculation", type_="check")
+        batch_op.drop_column("total")
 
 
 def downgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.add_column(
-        "products",
-        sa.Column(
-            "total",
-            sa.NUMERIC(precision=10, scale=2),
-            autoincrement=False,
-            nullable=False,
-        ),
-    )
-    # ### end Alembic commands ###
+    # SQLite cannot add a NOT NULL column in place, it rebuilds the table
+    recreate = "always" if op.get_bind().dialect.name == "sqlite" else "auto"
+    with op.batch_alter_table("products", recreate=recreate) as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "total",
+                sa.NUMERIC(precision=10, scale=2),
+                autoincrement=False,
+                nullable=False,
+            )
+        )
@@ -18,15 +18,14 @@ depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.add_column(
-        "products",
-        sa.Column("total", sa.Numeric(precision=10, scale=2), nullable=False),
-    )
-    # ### end Alembic commands ###
+    # SQLite cannot add a NOT NULL column in place, it rebuilds the table
+    recreate = "always" if op.get_bind().dialect.name == "sqlite" else "auto"
+    with op.batch_alter_table("products", recreate=recreate) as batch_op:
+        batch_op.add_column(
+            sa.Column("total", sa.Numeric(precision=10, scale=2), nullable=False)
+        )
 
 
 def downgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_column("products", "total")
-    # ### end Alembic commands ###
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.drop_column("total")
@@ -0,0 +1,40 @@
+"""Add user_receipt_counters table
+
+Revision ID: e6f1236adbc5
+Revises: 278f3047f3f3
+Create Date: 2026-10-19 09:05:12.418306
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e6f1236adbc5"
+down_revision: Union[str, None] = "278f3047f3f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_receipt_counters",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("receipt_count", sa.BigInteger(), server_default="0", nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    # Backfill counters for every existing user, including those without receipts
+    op.execute(
+        """
+        INSERT INTO user_receipt_counters (user_id, receipt_count)
+        SELECT users.id,
+               (SELECT count(*) FROM receipts WHERE receipts.user_id = users.id)
+        FROM users
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_receipt_counters")
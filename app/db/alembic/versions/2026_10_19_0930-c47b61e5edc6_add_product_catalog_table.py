@@ -0,0 +1,71 @@
+"""Add product_catalog table and reference it from products
+
+Revision ID: c47b61e5edc6
+Revises: e6f1236adbc5
+Create Date: 2026-10-19 09:30:41.902217
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c47b61e5edc6"
+down_revision: Union[str, None] = "e6f1236adbc5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "product_catalog",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "name", name="uq_product_catalog_user_id_name"),
+    )
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.add_column(sa.Column("catalog_id", sa.Integer(), nullable=True))
+        batch_op.alter_column(
+            "name", existing_type=sa.String(length=255), nullable=True
+        )
+        batch_op.create_foreign_key(
+            "products_catalog_id_fkey",
+            "product_catalog",
+            ["catalog_id"],
+            ["id"],
+            ondelete="CASCADE",
+        )
+        batch_op.create_index(op.f("ix_products_catalog_id"), ["catalog_id"])
+        batch_op.create_check_constraint(
+            "check_name_or_catalog", "name IS NOT NULL OR catalog_id IS NOT NULL"
+        )
+
+    # Existing products keep their inline names: moving them into the catalog
+    # is left to app.cli.backfill_catalog, once PRODUCT_CATALOG_ENABLED is on
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        UPDATE products
+        SET name = (
+            SELECT product_catalog.name
+            FROM product_catalog
+            WHERE product_catalog.id = products.catalog_id
+        )
+        WHERE name IS NULL
+        """
+    )
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.drop_constraint("check_name_or_catalog", type_="check")
+        batch_op.drop_index(op.f("ix_products_catalog_id"))
+        batch_op.drop_constraint("products_catalog_id_fkey", type_="foreignkey")
+        batch_op.drop_column("catalog_id")
+        batch_op.alter_column(
+            "name", existing_type=sa.String(length=255), nullable=False
+        )
+    op.drop_table("product_catalog")
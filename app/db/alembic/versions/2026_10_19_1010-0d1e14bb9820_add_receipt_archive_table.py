@@ -0,0 +1,52 @@
+"""Add receipt_archive table
+
+Revision ID: 0d1e14bb9820
+Revises: c47b61e5edc6
+Create Date: 2026-10-19 10:10:03.551920
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0d1e14bb9820"
+down_revision: Union[str, None] = "c47b61e5edc6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "receipt_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("total", sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column(
+            "payment_type",
+            # Reuse the paymenttype enum created for receipts
+            sa.Enum("CASH", "CASHLESS", name="paymenttype").with_variant(
+                postgresql.ENUM(
+                    "CASH", "CASHLESS", name="paymenttype", create_type=False
+                ),
+                "postgresql",
+            ),
+            nullable=False,
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+        sa.Column("payload", sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_receipt_archive_user_id_id", "receipt_archive", ["user_id", "id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_receipt_archive_user_id_id", table_name="receipt_archive")
+    op.drop_table("receipt_archive")
@@ -0,0 +1,48 @@
+"""Add purge_jobs table
+
+Revision ID: 5b7e2c9a41d3
+Revises: 0d1e14bb9820
+Create Date: 2026-10-19 10:32:47.118204
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5b7e2c9a41d3"
+down_revision: Union[str, None] = "0d1e14bb9820"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "purge_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column(
+            "kind", sa.Enum("USER", "RETENTION", name="purgekind"), nullable=False
+        ),
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "RUNNING", "DONE", "FAILED", name="purgestatus"),
+            nullable=False,
+        ),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("cutoff", sa.DateTime(), nullable=True),
+        sa.Column("deleted_receipts", sa.BigInteger(), nullable=False),
+        sa.Column("deleted_products", sa.BigInteger(), nullable=False),
+        sa.Column("deleted_archived", sa.BigInteger(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("purge_jobs")
+    sa.Enum(name="purgestatus").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="purgekind").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,48 @@
+"""Add id_blocks table
+
+Revision ID: 9f3a6d2e7b18
+Revises: 5b7e2c9a41d3
+Create Date: 2026-10-19 11:05:12.640387
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9f3a6d2e7b18"
+down_revision: Union[str, None] = "5b7e2c9a41d3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "id_blocks",
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.Column("next_value", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    # Local ids continue after the existing rows; archived receipts keep theirs
+    op.execute(
+        """
+        INSERT INTO id_blocks (name, next_value)
+        SELECT 'users', COALESCE(MAX(id), 0) + 1 FROM users
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO id_blocks (name, next_value)
+        SELECT 'receipts', COALESCE(MAX(id), 0) + 1
+        FROM (
+            SELECT id FROM receipts
+            UNION ALL
+            SELECT id FROM receipt_archive
+        ) AS receipt_ids
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("id_blocks")
@@ -0,0 +1,28 @@
+"""Add version to user_receipt_counters
+
+Revision ID: 3c8d5a1f6e27
+Revises: 9f3a6d2e7b18
+Create Date: 2026-10-19 11:40:27.118204
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3c8d5a1f6e27"
+down_revision: Union[str, None] = "9f3a6d2e7b18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "user_receipt_counters",
+        sa.Column("version", sa.BigInteger(), server_default="0", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("user_receipt_counters", "version")
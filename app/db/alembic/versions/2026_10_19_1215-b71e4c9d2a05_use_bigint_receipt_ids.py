@@ -0,0 +1,156 @@
+"""Use bigint receipt ids
+
+Revision ID: b71e4c9d2a05
+Revises: 3c8d5a1f6e27
+Create Date: 2026-10-19 12:15:43.502817
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.db.alembic.online import add_column, backfill, create_index, set_not_null
+
+# revision identifiers, used by Alembic.
+revision: str = "b71e4c9d2a05"
+down_revision: Union[str, None] = "3c8d5a1f6e27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Columns holding receipt ids, widened for the time-ordered ids of app.db.snowflake,
+# with the indexes to rebuild on the wide column: (name, columns, primary key)
+RECEIPT_ID_COLUMNS = [
+    ("receipts", "id", [("receipts_pkey", ["id"], True)]),
+    ("products", "receipt_id", [("ix_products_receipt_id", ["receipt_id"], False)]),
+    (
+        "receipt_archive",
+        "id",
+        [
+            ("receipt_archive_pkey", ["id"], True),
+            ("ix_receipt_archive_user_id_id", ["user_id", "id"], False),
+        ],
+    ),
+]
+
+
+def upgrade() -> None:
+    # SQLite integers are already 64-bit
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    # ALTER COLUMN TYPE would rewrite these tables under an exclusive lock.
+    # Instead a BIGINT copy of each column is kept in sync by a trigger,
+    # backfilled and indexed online, then swapped in by a short transaction.
+    # Existing ids are kept: they are all far below the first generated id,
+    # so ordering receipts by id still follows their creation
+    columns = [
+        (table, column, indexes)
+        for table, column, indexes in RECEIPT_ID_COLUMNS
+        if not _is_bigint(table, column)
+    ]
+    for table, column, indexes in columns:
+        _add_wide_copy(table, column, indexes)
+    if columns:
+        _swap_wide_copies(columns)
+
+    # Validated after the swap has committed, without blocking writes
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TABLE products VALIDATE CONSTRAINT products_receipt_id_fkey")
+
+
+def _is_bigint(table: str, column: str) -> bool:
+    columns = sa.inspect(op.get_bind()).get_columns(table)
+    return any(
+        info["name"] == column and isinstance(info["type"], sa.BigInteger)
+        for info in columns
+    )
+
+
+def _add_wide_copy(table: str, column: str, indexes: list) -> None:
+    wide = f"{column}_bigint"
+    existing = {info["name"] for info in sa.inspect(op.get_bind()).get_columns(table)}
+    if wide not in existing:
+        add_column(table, sa.Column(wide, sa.BigInteger()))
+    op.execute(
+        f"CREATE OR REPLACE FUNCTION {table}_{wide}_sync() RETURNS trigger AS $$ "
+        f"BEGIN NEW.{wide} := NEW.{column}; RETURN NEW; END $$ LANGUAGE plpgsql"
+    )
+    op.execute(f"DROP TRIGGER IF EXISTS {table}_{wide}_sync ON {table}")
+    op.execute(
+        f"CREATE TRIGGER {table}_{wide}_sync BEFORE INSERT OR UPDATE OF {column} "
+        f"ON {table} FOR EACH ROW EXECUTE FUNCTION {table}_{wide}_sync()"
+    )
+
+    backfill(
+        table,
+        f"{wide} = {column}",
+        where=f"{wide} IS NULL",
+        name=f"{table}.{wide}",
+    )
+    set_not_null(table, wide)
+    for name, index_columns, primary in indexes:
+        create_index(
+            f"{name}_bigint",
+            table,
+            [wide if indexed == column else indexed for indexed in index_columns],
+            unique=primary,
+        )
+
+
+def _swap_wide_copies(columns: list) -> None:
+    # One transaction: the foreign key needs both sides of the same type
+    tables = ", ".join(table for table, _, _ in columns)
+    op.execute("SET LOCAL lock_timeout = '5s'")
+    op.execute(f"LOCK TABLE {tables} IN ACCESS EXCLUSIVE MODE")
+    op.execute(
+        "ALTER TABLE products DROP CONSTRAINT IF EXISTS products_receipt_id_fkey"
+    )
+
+    for table, column, indexes in columns:
+        wide = f"{column}_bigint"
+        op.execute(f"DROP TRIGGER {table}_{wide}_sync ON {table}")
+        op.execute(f"DROP FUNCTION {table}_{wide}_sync()")
+        if table == "receipts":
+            # Or dropping the column would drop its sequence too
+            op.execute("ALTER TABLE receipts ALTER COLUMN id DROP DEFAULT")
+            op.execute("ALTER SEQUENCE receipts_id_seq OWNED BY NONE")
+        for name, _, primary in indexes:
+            if primary:
+                op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+            else:
+                op.execute(f"DROP INDEX {name}")
+
+        # Dropping a column only marks it as gone, nothing is rewritten
+        op.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+        op.execute(f"ALTER TABLE {table} RENAME COLUMN {wide} TO {column}")
+        for name, _, primary in indexes:
+            if primary:
+                op.execute(
+                    f"ALTER TABLE {table} ADD CONSTRAINT {name} "
+                    f"PRIMARY KEY USING INDEX {name}_bigint"
+                )
+            else:
+                op.execute(f"ALTER INDEX {name}_bigint RENAME TO {name}")
+
+    op.execute("ALTER SEQUENCE receipts_id_seq AS BIGINT OWNED BY receipts.id")
+    op.execute(
+        "ALTER TABLE receipts ALTER COLUMN id SET DEFAULT nextval('receipts_id_seq')"
+    )
+    op.execute(
+        "ALTER TABLE products ADD CONSTRAINT products_receipt_id_fkey "
+        "FOREIGN KEY (receipt_id) REFERENCES receipts (id) ON DELETE CASCADE "
+        "NOT VALID"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    # Narrowing rewrites the tables, and fails once ids no longer fit
+    op.execute("ALTER SEQUENCE receipts_id_seq AS INTEGER")
+    for table, column, _ in reversed(RECEIPT_ID_COLUMNS):
+        op.alter_column(
+            table, column, type_=sa.Integer(), existing_type=sa.BigInteger()
+        )
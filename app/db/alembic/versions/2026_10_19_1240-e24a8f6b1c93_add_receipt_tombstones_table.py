@@ -0,0 +1,49 @@
+"""Add receipt_tombstones table
+
+Revision ID: e24a8f6b1c93
+Revises: b71e4c9d2a05
+Create Date: 2026-10-19 12:40:08.631542
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.db.alembic.online import create_index, drop_index
+
+# revision identifiers, used by Alembic.
+revision: str = "e24a8f6b1c93"
+down_revision: Union[str, None] = "b71e4c9d2a05"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "receipt_tombstones",
+        sa.Column("receipt_id", sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("receipt_id"),
+    )
+    op.create_index(
+        "ix_receipt_tombstones_user_id_deleted_at",
+        "receipt_tombstones",
+        ["user_id", "deleted_at", "receipt_id"],
+        unique=False,
+    )
+    create_index(
+        "ix_receipts_user_id_updated_at_id",
+        "receipts",
+        ["user_id", "updated_at", "id"],
+    )
+
+
+def downgrade() -> None:
+    drop_index("ix_receipts_user_id_updated_at_id", "receipts")
+    op.drop_index(
+        "ix_receipt_tombstones_user_id_deleted_at", table_name="receipt_tombstones"
+    )
+    op.drop_table("receipt_tombstones")
@@ -1,18 +1,85 @@
-from pydantic import Field
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings
 
 
 class DBConfig(BaseSettings):
-    POSTGRES_DB: str = Field(..., env="POSTGRES_DB")
-    POSTGRES_USER: str = Field(..., env="POSTGRES_USER")
-    POSTGRES_PASSWORD: str = Field(..., env="POSTGRES_PASSWORD")
-    POSTGRES_HOST: str = Field(..., env="POSTGRES_HOST")
+    # Required unless SQLITE_PATH is set
+    POSTGRES_DB: str | None = Field(None, env="POSTGRES_DB")
+    POSTGRES_USER: str | None = Field(None, env="POSTGRES_USER")
+    POSTGRES_PASSWORD: str | None = Field(None, env="POSTGRES_PASSWORD")
+    POSTGRES_HOST: str | None = Field(None, env="POSTGRES_HOST")
     POSTGRES_PORT: int = Field(5432, env="POSTGRES_PORT")
+    # SQLite database file used instead of PostgreSQL, for single-store installs
+    SQLITE_PATH: str | None = Field(None, env="SQLITE_PATH")
+    # Bytes of the SQLite file read through mmap, and connections kept for reads;
+    # writes always go through a single connection
+    SQLITE_MMAP_SIZE: int = Field(256 * 1024 * 1024, env="SQLITE_MMAP_SIZE")
+    SQLITE_READ_POOL_SIZE: int = Field(4, env="SQLITE_READ_POOL_SIZE")
+    # Replica for read-only work such as analytics exports
+    POSTGRES_READ_ONLY_HOST: str | None = Field(None, env="POSTGRES_READ_ONLY_HOST")
+    # Comma-separated database URLs, one per shard; unset means a single database
+    DATABASE_SHARD_URLS: str | None = Field(None, env="DATABASE_SHARD_URLS")
+    # Ids reserved per round trip to a shard's id_blocks table
+    SHARD_ID_BLOCK_SIZE: int = Field(100, env="SHARD_ID_BLOCK_SIZE")
+    # Worker id (0-63) for time-ordered receipt ids made by the app, unique per
+    # process; unset leaves receipt ids to the database. Required with shards
+    RECEIPT_ID_WORKER_ID: int | None = Field(None, env="RECEIPT_ID_WORKER_ID")
+    # Statements slower than this are logged and listed at /api/v1/admin/slow-queries
+    SLOW_QUERY_THRESHOLD_MS: float = Field(200, env="SLOW_QUERY_THRESHOLD_MS")
+    SLOW_QUERY_LOG_SIZE: int = Field(100, env="SLOW_QUERY_LOG_SIZE")
+    # Share of slow statements that also get an EXPLAIN plan
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = Field(
+        0.1, env="SLOW_QUERY_EXPLAIN_SAMPLE_RATE"
+    )
+
+    @model_validator(mode="after")
+    def check_postgres_settings(self) -> "DBConfig":
+        if self.SQLITE_PATH:
+            return self
+        missing = [
+            name
+            for name in (
+                "POSTGRES_DB",
+                "POSTGRES_USER",
+                "POSTGRES_PASSWORD",
+                "POSTGRES_HOST",
+            )
+            if getattr(self, name) is None
+        ]
+        if missing:
+            raise ValueError(f"{', '.join(missing)} must be set without SQLITE_PATH")
+        return self
+
+    @model_validator(mode="after")
+    def check_sharded_receipt_ids(self) -> "DBConfig":
+        # Shards have no common sequence, and id blocks reserved per process
+        # are not ordered by creation time across processes
+        if len(self.shard_urls) > 1 and self.RECEIPT_ID_WORKER_ID is None:
+            raise ValueError(
+                "RECEIPT_ID_WORKER_ID must be set with DATABASE_SHARD_URLS"
+            )
+        return self
 
     @property
     def full_database_url(self) -> str:
+        if self.SQLITE_PATH:
+            return f"sqlite+aiosqlite:///{self.SQLITE_PATH}"
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    @property
+    def read_only_database_url(self) -> str | None:
+        if self.SQLITE_PATH or not self.POSTGRES_READ_ONLY_HOST:
+            return None
+        return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_READ_ONLY_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+
+    @property
+    def shard_urls(self) -> list[str]:
+        if not self.DATABASE_SHARD_URLS:
+            return [self.full_database_url]
+        return [
+            url.strip() for url in self.DATABASE_SHARD_URLS.split(",") if url.strip()
+        ]
+
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -1,43 +1,106 @@
 from contextlib import asynccontextmanager
 from typing import Any, AsyncGenerator
 
+from sqlalchemy import event
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.db.config import DBConfig
+from app.db.slow_queries import SlowQueryRecorder
 
 
 config = DBConfig()
 
 
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for pragma in (
+        # Readers and the writer no longer block each other
+        "journal_mode = WAL",
+        # Syncs at checkpoints only; a power loss may undo the latest commits
+        # but never corrupts the database
+        "synchronous = NORMAL",
+        f"mmap_size = {config.SQLITE_MMAP_SIZE}",
+        # Off by default in SQLite; the models rely on ON DELETE CASCADE
+        "foreign_keys = ON",
+        # Wait for maintenance commands holding the write lock instead of failing
+        "busy_timeout = 5000",
+    ):
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+
 class Database:
-    def __init__(self, url: str, ro_url: str = None) -> None:
+    def __init__(
+        self,
+        url: str,
+        ro_url: str = None,
+        session_info: dict | None = None,
+        slow_queries: SlowQueryRecorder | None = None,
+        single_writer: bool = False,
+    ) -> None:
+        is_sqlite = url.startswith("sqlite")
+        engine_options = {}
+        if not is_sqlite:
+            # SQLite has no READ COMMITTED level
+            engine_options["isolation_level"] = "READ COMMITTED"
+        elif single_writer:
+            # SQLite takes one writer at a time: waiting for the only write
+            # connection is cheaper than retrying on "database is locked".
+            # Autocommit sessions read through a pool of their own
+            engine_options.update(pool_size=1, max_overflow=0)
         self._async_engine = create_async_engine(
             url=url,
             pool_pre_ping=True,
-            echo=True,
-            isolation_level="READ COMMITTED",
+            **engine_options,
         )
+        read_engine = self._async_engine
+        if is_sqlite and single_writer:
+            read_engine = create_async_engine(
+                url=url,
+                pool_pre_ping=True,
+                pool_size=config.SQLITE_READ_POOL_SIZE,
+                max_overflow=0,
+            )
+        for engine in {self._async_engine, read_engine}:
+            if is_sqlite:
+                event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+            if slow_queries:
+                slow_queries.attach(engine.sync_engine)
         self._async_session = async_sessionmaker(
             bind=self._async_engine,
             expire_on_commit=False,
+            info=session_info,
+        )
+        # Every statement commits on its own: no BEGIN or COMMIT round trips
+        # and no transaction left open while a response is built
+        self._autocommit_async_session = async_sessionmaker(
+            bind=read_engine.execution_options(isolation_level="AUTOCOMMIT"),
+            expire_on_commit=False,
+            info=session_info,
         )
 
         if ro_url:
             self._read_only_async_engine = create_async_engine(
                 url=ro_url,
                 pool_pre_ping=True,
-                echo=True,
                 isolation_level="AUTOCOMMIT",
             )
+            if slow_queries:
+                slow_queries.attach(self._read_only_async_engine.sync_engine)
             self._read_only_async_session = async_sessionmaker(
                 bind=self._read_only_async_engine,
                 expire_on_commit=False,
+                info=session_info,
             )
         else:
             self._read_only_async_engine = None
             self._read_only_async_session = None
 
+    @property
+    def has_read_only(self) -> bool:
+        return self._read_only_async_session is not None
+
     @asynccontextmanager
     async def get_session(self) -> AsyncGenerator[AsyncSession, Any]:
         session: AsyncSession = self._async_session()
@@ -51,6 +114,15 @@ class Database:
             await session.commit()
             await session.close()
 
+    @asynccontextmanager
+    async def get_autocommit_session(self) -> AsyncGenerator[AsyncSession, Any]:
+        """Session for reads on the primary; it must not be used for writes"""
+        session: AsyncSession = self._autocommit_async_session()
+        try:
+            yield session
+        finally:
+            await session.close()
+
     @asynccontextmanager
     async def get_read_only_session(self) -> AsyncGenerator[AsyncSession, Any]:
         if not self._read_only_async_session:
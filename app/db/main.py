@@ -1,11 +1,87 @@
+import functools
+import inspect
+from contextvars import ContextVar
+from typing import Any, Callable
+
+from fastapi import Request
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from app.db.config import DBConfig
-from app.db.database import Database
+from app.db.sharding import ShardedDatabase
+from app.db.slow_queries import SlowQueryRecorder, current_route
 
 config = DBConfig()
 
-database = Database(url=config.full_database_url)
+# Requests with these methods only read, so they get autocommit sessions
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Autocommit session of the running request, released by ReleaseSessionRoute
+autocommit_session: ContextVar[AsyncSession | None] = ContextVar(
+    "autocommit_session", default=None
+)
+
+slow_queries = SlowQueryRecorder(
+    threshold_ms=config.SLOW_QUERY_THRESHOLD_MS,
+    capacity=config.SLOW_QUERY_LOG_SIZE,
+    explain_sample_rate=config.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+)
+shards = ShardedDatabase(
+    config.shard_urls,
+    ro_url=config.read_only_database_url,
+    block_size=config.SHARD_ID_BLOCK_SIZE,
+    slow_queries=slow_queries,
+    receipt_worker_id=config.RECEIPT_ID_WORKER_ID,
+)
+# The only database when sharding is off, shard 0 otherwise
+database = shards.get(0)
+
+
+async def use_autocommit(request: Request) -> None:
+    """Give a route that only reads an autocommit session whatever its method"""
+    request.state.autocommit = True
+
+
+async def get_db(request: Request):
+    route = request.scope.get("route")
+    current_route.set(f"{request.method} {route.path if route else request.url.path}")
+    autocommit = getattr(request.state, "autocommit", request.method in READ_METHODS)
+    # Routes pick their shard with the dependencies in app.api.sharding
+    async with shards.get_session(
+        getattr(request.state, "shard", 0), autocommit=autocommit
+    ) as session:
+        token = autocommit_session.set(session if autocommit else None)
+        try:
+            yield session
+        finally:
+            autocommit_session.reset(token)
+
+
+def release_session_after(endpoint: Callable) -> Callable:
+    @functools.wraps(endpoint)
+    async def release(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            session = autocommit_session.get()
+            if session is not None:
+                # Loaded objects stay readable, the connection goes back to
+                # the pool; get_db closes the session again at the end
+                await session.close()
+
+    return release
+
+
+class ReleaseSessionRoute(APIRoute):
+    """Route handing its autocommit connection back once the endpoint returns.
 
+    FastAPI validates and encodes the returned value before it unwinds the
+    dependencies, so ``get_db`` alone would hold the connection through
+    serialization. Endpoints must not hand unloaded ORM attributes to the
+    response model, which async sessions cannot lazy load anyway.
+    """
 
-async def get_db():
-    async with database.get_session() as session:
-        yield session
+    def __init__(self, path: str, endpoint: Callable, **kwargs: Any) -> None:
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = release_session_after(endpoint)
+        super().__init__(path, endpoint, **kwargs)
@@ -1,3 +1,7 @@
+from .archive import ArchivedReceipt
 from .base import TimedBaseModel
-from .receipt import Product, Receipt
+from .id_block import IdBlock
+from .purge import PurgeJob, PurgeKind, PurgeStatus
+from .receipt import CatalogProduct, Product, Receipt, UserReceiptCounter
+from .tombstone import ReceiptTombstone
 from .user import User
@@ -0,0 +1,32 @@
+from sqlalchemy import BigInteger, Column, DateTime
+from sqlalchemy import Enum as SQLAlchemyEnum
+from sqlalchemy import ForeignKey, Index, Integer, LargeBinary, Numeric, func
+
+from app.db.models.base import Base
+from app.db.models.receipt import PaymentType
+
+
+class ArchivedReceipt(Base):
+    """A receipt moved out of the hot tables by the archiver.
+
+    Columns used for filtering stay queryable; everything else, including the
+    products, is kept in a zlib-compressed JSON ``payload``.
+    """
+
+    __tablename__ = "receipt_archive"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=False)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    total = Column(Numeric(10, 2), nullable=False)
+    payment_type = Column(SQLAlchemyEnum(PaymentType), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, nullable=False, default=func.now())
+    payload = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (Index("ix_receipt_archive_user_id_id", "user_id", "id"),)
+
+    def __repr__(self):
+        return f"<ArchivedReceipt(id={self.id}, user_id={self.user_id}, total={self.total})>"
@@ -1,13 +1,37 @@
 from datetime import datetime
 
-from sqlalchemy import MetaData, func
+from sqlalchemy import DateTime, MetaData, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Mapped, declarative_base, mapped_column
+from sqlalchemy.sql.functions import now
 
 metadata = MetaData()
 
 Base = declarative_base(metadata=metadata)
 
 
+@compiles(now, "sqlite")
+def _sqlite_now(element, compiler, **kwargs) -> str:
+    # CURRENT_TIMESTAMP has no fractions and would compare as smaller than the
+    # same second bound from Python ("... 12:00:00" < "... 12:00:00.000000")
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+async def database_now(session: AsyncSession) -> datetime:
+    """The database clock, naive like the timestamps ``func.now()`` stores.
+
+    Cutoffs compared with stored timestamps must be taken from here rather
+    than from ``datetime.now()``: the application may run in another time
+    zone (SQLite stores UTC) or on a clock that is off.
+    """
+    now = func.now()
+    if session.get_bind().dialect.name == "postgresql":
+        # timestamptz to a timestamp in the session's time zone, as stored
+        now = cast(now, DateTime)
+    return await session.scalar(select(now))
+
+
 class TimedBaseModel(Base):
     """An abstract base model that adds created_at and updated_at timestamp fields to the model"""
 
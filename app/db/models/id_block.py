@@ -0,0 +1,15 @@
+from sqlalchemy import BigInteger, Column, String
+
+from app.db.models.base import Base
+
+
+class IdBlock(Base):
+    """Next unallocated local id per table, used to hand out shard-encoded ids"""
+
+    __tablename__ = "id_blocks"
+
+    name = Column(String(64), primary_key=True)
+    next_value = Column(BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f"<IdBlock(name={self.name}, next_value={self.next_value})>"
@@ -0,0 +1,42 @@
+from enum import Enum
+
+from sqlalchemy import BigInteger, Column, DateTime
+from sqlalchemy import Enum as SQLAlchemyEnum
+from sqlalchemy import Integer, Text
+
+from app.db.models.base import TimedBaseModel
+
+
+class PurgeKind(Enum):
+    USER = "user"
+    RETENTION = "retention"
+
+
+class PurgeStatus(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class PurgeJob(TimedBaseModel):
+    """Progress of a chunked purge, committed together with every chunk"""
+
+    __tablename__ = "purge_jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(SQLAlchemyEnum(PurgeKind), nullable=False)
+    status = Column(
+        SQLAlchemyEnum(PurgeStatus), nullable=False, default=PurgeStatus.PENDING
+    )
+    # No foreign key: the user row is deleted by the job itself
+    user_id = Column(Integer, nullable=True)
+    cutoff = Column(DateTime, nullable=True)
+    deleted_receipts = Column(BigInteger, nullable=False, default=0)
+    deleted_products = Column(BigInteger, nullable=False, default=0)
+    deleted_archived = Column(BigInteger, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<PurgeJob(id={self.id}, kind={self.kind}, status={self.status})>"
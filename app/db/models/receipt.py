@@ -1,11 +1,13 @@
+from decimal import Decimal
 from enum import Enum
+from typing import NamedTuple
 
-from sqlalchemy import CheckConstraint, Column
+from sqlalchemy import BigInteger, CheckConstraint, Column
 from sqlalchemy import Enum as SQLAlchemyEnum
-from sqlalchemy import ForeignKey, Integer, Numeric, String
+from sqlalchemy import ForeignKey, Index, Integer, Numeric, String, UniqueConstraint
 from sqlalchemy.orm import relationship
 
-from app.db.models.base import TimedBaseModel
+from app.db.models.base import Base, TimedBaseModel
 
 
 class PaymentType(Enum):
@@ -16,7 +18,8 @@ class PaymentType(Enum):
 class Receipt(TimedBaseModel):
     __tablename__ = "receipts"
 
-    id = Column(Integer, primary_key=True)
+    # 64-bit for the ids of app.db.snowflake; SQLite only numbers INTEGER keys itself
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
     user_id = Column(
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
     )
@@ -27,12 +30,17 @@ class Receipt(TimedBaseModel):
 
     user = relationship("User", back_populates="receipts")
     products = relationship(
-        "Product", back_populates="receipt", cascade="all, delete-orphan"
+        "Product",
+        back_populates="receipt",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     __table_args__ = (
         CheckConstraint("payment_amount >= total", name="check_payment_amount"),
         CheckConstraint("rest >= 0", name="check_rest_non_negative"),
+        # Keyset order of GET /api/v1/receipts/changes
+        Index("ix_receipts_user_id_updated_at_id", "user_id", "updated_at", "id"),
     )
 
     def __repr__(self):
@@ -44,23 +52,91 @@ class Product(TimedBaseModel):
 
     id = Column(Integer, primary_key=True, index=True)
     receipt_id = Column(
-        Integer,
+        BigInteger,
         ForeignKey("receipts.id", ondelete="CASCADE"),
         nullable=False,
         index=True,
     )
-    name = Column(String(255), nullable=False)
+    catalog_id = Column(
+        Integer,
+        ForeignKey("product_catalog.id", ondelete="CASCADE"),
+        nullable=True,
+        index=True,
+    )
+    # Inline name, left empty when the product references the catalog
+    _name = Column("name", String(255), nullable=True)
     price = Column(Numeric(10, 2), nullable=False)
     quantity = Column(Numeric(10, 2), nullable=False)
     total = Column(Numeric(10, 2), nullable=False)
 
     receipt = relationship("Receipt", back_populates="products")
+    catalog_item = relationship("CatalogProduct", lazy="joined")
 
     __table_args__ = (
         CheckConstraint("price >= 0", name="check_price_non_negative"),
         CheckConstraint("quantity > 0", name="check_quantity_positive"),
         CheckConstraint("total = price * quantity", name="check_total_calculation"),
+        CheckConstraint(
+            "name IS NOT NULL OR catalog_id IS NOT NULL",
+            name="check_name_or_catalog",
+        ),
     )
 
+    @property
+    def name(self) -> str | None:
+        if self._name is not None or self.catalog_item is None:
+            return self._name
+        return self.catalog_item.name
+
+    @name.setter
+    def name(self, value: str | None) -> None:
+        self._name = value
+
     def __repr__(self):
         return f"<Product(id={self.id}, name='{self.name}', price={self.price}, quantity={self.quantity})>"
+
+
+class ProductLine(NamedTuple):
+    """Read-only stand-in for Product on bulk-created and archived receipts"""
+
+    name: str
+    price: Decimal
+    quantity: Decimal
+    total: Decimal
+
+
+class CatalogProduct(Base):
+    """A distinct product name of a user, referenced by products instead of the name"""
+
+    __tablename__ = "product_catalog"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    name = Column(String(255), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "name", name="uq_product_catalog_user_id_name"),
+    )
+
+    def __repr__(self):
+        return f"<CatalogProduct(id={self.id}, user_id={self.user_id}, name='{self.name}')>"
+
+
+class UserReceiptCounter(Base):
+    """Per-user receipt count, maintained in the same transaction as receipt inserts"""
+
+    __tablename__ = "user_receipt_counters"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    receipt_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Bumped whenever the user's receipt list changes; part of the list cache key
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+    user = relationship("User", back_populates="receipt_counter")
+
+    def __repr__(self):
+        return f"<UserReceiptCounter(user_id={self.user_id}, receipt_count={self.receipt_count})>"
@@ -0,0 +1,29 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, func
+
+from app.db.models.base import Base
+
+
+class ReceiptTombstone(Base):
+    """A receipt deleted by the retention purge, reported to syncing clients"""
+
+    __tablename__ = "receipt_tombstones"
+
+    receipt_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    deleted_at = Column(DateTime, nullable=False, default=func.now())
+
+    __table_args__ = (
+        Index(
+            "ix_receipt_tombstones_user_id_deleted_at",
+            "user_id",
+            "deleted_at",
+            "receipt_id",
+        ),
+    )
+
+    def __repr__(self):
+        return (
+            f"<ReceiptTombstone(receipt_id={self.receipt_id}, user_id={self.user_id})>"
+        )
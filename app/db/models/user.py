@@ -12,8 +12,20 @@ class User(TimedBaseModel):
     email = Column(String(128), unique=True, nullable=False, index=True)
     hashed_password = Column(String(255), nullable=False)
 
+    # passive_deletes leaves the cascade to the database (or the purge job)
+    # instead of loading every receipt into the session first
     receipts = relationship(
-        "Receipt", back_populates="user", cascade="all, delete-orphan"
+        "Receipt",
+        back_populates="user",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    receipt_counter = relationship(
+        "UserReceiptCounter",
+        back_populates="user",
+        uselist=False,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
     __table_args__ = (
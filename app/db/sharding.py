@@ -0,0 +1,153 @@
+"""Routing of users and receipts to database shards.
+
+Users are placed on a shard by a stable hash of their username and their
+receipts live on the same shard. Ids of both encode the shard they were
+created on (``id % shard_count``), so any id can be routed without a lookup.
+Receipt ids also grow with creation time across processes, which exports,
+stream replays and archive read-through rely on: sharding therefore needs
+``RECEIPT_ID_WORKER_ID`` and its time-ordered ids.
+"""
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator
+
+from sqlalchemy import event, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.db.database import Database, set_sqlite_pragmas
+from app.db.models.id_block import IdBlock
+from app.db.slow_queries import SlowQueryRecorder
+from app.db.snowflake import SnowflakeGenerator
+
+
+class ShardMap:
+    def __init__(self, shard_count: int):
+        self.shard_count = shard_count
+
+    def shard_for_username(self, username: str) -> int:
+        digest = hashlib.blake2b(username.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.shard_count
+
+    def shard_for_id(self, id: int) -> int:
+        return id % self.shard_count
+
+    def encode_id(self, local_id: int, shard: int) -> int:
+        return local_id * self.shard_count + shard
+
+
+class IdAllocator:
+    """Hands out shard-encoded ids from blocks reserved in ``id_blocks``.
+
+    Reserving a block is a short transaction of its own, so ids are never
+    reused even when the transaction that asked for one rolls back. It runs
+    on a connection of the allocator's own: taking a second connection from
+    the shard's pool while the request holds one could wait forever once
+    the pool is exhausted. Ids from different processes are not ordered by
+    creation time, so receipts use ``app.db.snowflake`` ids instead.
+    """
+
+    def __init__(self, url: str, shard: int, shard_map: ShardMap, block_size: int):
+        self.shard = shard
+        self.shard_map = shard_map
+        self.block_size = block_size
+        # Reservations are serialized by the lock below, so one connection does
+        self._engine = create_async_engine(
+            url, pool_pre_ping=True, pool_size=1, max_overflow=0
+        )
+        if url.startswith("sqlite"):
+            event.listen(self._engine.sync_engine, "connect", set_sqlite_pragmas)
+        self._blocks: dict[str, range] = {}
+        self._lock = asyncio.Lock()
+
+    async def allocate(self, name: str) -> int:
+        async with self._lock:
+            block = self._blocks.get(name)
+            if not block:
+                block = await self._reserve(name)
+            self._blocks[name] = block[1:]
+        return self.shard_map.encode_id(block[0], self.shard)
+
+    async def _reserve(self, name: str) -> range:
+        query = (
+            update(IdBlock)
+            .where(IdBlock.name == name)
+            .values(next_value=IdBlock.next_value + self.block_size)
+            .returning(IdBlock.next_value)
+        )
+        async with self._engine.begin() as connection:
+            end = (await connection.execute(query)).scalar_one()
+        return range(end - self.block_size, end)
+
+
+class ShardedDatabase:
+    def __init__(
+        self,
+        urls: list[str],
+        ro_url: str = None,
+        block_size: int = 100,
+        slow_queries: SlowQueryRecorder | None = None,
+        receipt_worker_id: int | None = None,
+    ):
+        self.shard_map = ShardMap(len(urls))
+        self.shards = []
+        for shard, url in enumerate(urls):
+            session_info = {}
+            if receipt_worker_id is not None:
+                session_info["receipt_ids"] = SnowflakeGenerator(
+                    receipt_worker_id, shard, self.shard_map.shard_count
+                )
+
+            if len(urls) == 1:
+                self.shards.append(
+                    Database(
+                        url=url,
+                        ro_url=ro_url,
+                        session_info=session_info,
+                        slow_queries=slow_queries,
+                        single_writer=True,
+                    )
+                )
+                continue
+
+            session_info["shard"] = shard
+            session_info["id_allocator"] = IdAllocator(
+                url, shard, self.shard_map, block_size
+            )
+            self.shards.append(
+                Database(url=url, session_info=session_info, slow_queries=slow_queries)
+            )
+
+    @property
+    def is_sharded(self) -> bool:
+        return self.shard_map.shard_count > 1
+
+    def get(self, shard: int) -> Database:
+        return self.shards[shard]
+
+    @asynccontextmanager
+    async def get_session(
+        self, shard: int, autocommit: bool = False
+    ) -> AsyncGenerator[AsyncSession, Any]:
+        database = self.shards[shard]
+        get_session = (
+            database.get_autocommit_session if autocommit else database.get_session
+        )
+        async with get_session() as session:
+            yield session
+
+
+def assign_receipt_id(session: AsyncSession) -> int | None:
+    """A time-ordered id for a new receipt, if the session has a generator"""
+    generator = session.info.get("receipt_ids")
+    if generator is None:
+        return None
+    return generator.next_id()
+
+
+async def assign_shard_id(session: AsyncSession, name: str) -> int | None:
+    """Reserve a shard-encoded id for a new ``name`` row, if the session is sharded"""
+    allocator = session.info.get("id_allocator")
+    if allocator is None:
+        return None
+    return await allocator.allocate(name)
@@ -0,0 +1,145 @@
+import logging
+import random
+import re
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# "METHOD /route/{template}" of the request running the statement, set by get_db
+current_route: ContextVar[str | None] = ContextVar("current_route", default=None)
+
+EXPLAIN_PREFIXES = {"postgresql": "EXPLAIN ", "sqlite": "EXPLAIN QUERY PLAN "}
+EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+
+WHITESPACE = re.compile(r"\s+")
+PLACEHOLDER = r"(?:\$\d+(?:::\w+)?|\?|%s)"
+# Placeholder lists such as "IN ($1::INTEGER, $2::INTEGER)" or "VALUES (?, ?)"
+PLACEHOLDER_LIST = re.compile(rf"\(\s*{PLACEHOLDER}(?:\s*,\s*{PLACEHOLDER})*\s*\)")
+
+
+@dataclass
+class SlowQuery:
+    statement: str
+    parameters: list
+    duration_ms: float
+    route: str | None
+    database: str
+    recorded_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    plan: list[str] | None = None
+
+
+class SlowQueryRecorder:
+    """Times every statement on the engines it is attached to.
+
+    Statements slower than ``threshold_ms`` are logged and kept in a ring
+    buffer of the last ``capacity`` entries, with their parameters reduced to
+    type names. A ``explain_sample_rate`` share of them also get the query
+    plan, fetched right away on the same connection.
+    """
+
+    def __init__(
+        self, threshold_ms: float, capacity: int = 100, explain_sample_rate: float = 0
+    ):
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.entries: deque[SlowQuery] = deque(maxlen=capacity)
+        self.statements = 0
+
+    def attach(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def snapshot(self, limit: int | None = None) -> dict:
+        entries = list(reversed(self.entries))[:limit]
+        return {
+            "threshold_ms": self.threshold_ms,
+            "statements": self.statements,
+            "slow_queries": [asdict(entry) for entry in entries],
+        }
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def _before_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ) -> None:
+        # Kept with the statement: a failed one never reaches _after_execute,
+        # and nothing would be left behind on the pooled connection
+        context._query_started = time.perf_counter()
+
+    def _after_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ) -> None:
+        started = context._query_started
+        self.statements += 1
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        entry = SlowQuery(
+            statement=normalize(statement),
+            parameters=redact(parameters, executemany),
+            duration_ms=round(duration_ms, 2),
+            route=current_route.get(),
+            database=conn.engine.url.render_as_string(hide_password=True),
+        )
+        if not executemany and random.random() < self.explain_sample_rate:
+            entry.plan = self._explain(conn, statement, parameters)
+        self.entries.append(entry)
+        logger.warning(
+            "Slow query (%.1f ms) in %s: %s",
+            entry.duration_ms,
+            entry.route or "-",
+            entry.statement,
+        )
+
+    def _explain(self, conn, statement: str, parameters) -> list[str] | None:
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+
+        # A separate DBAPI cursor keeps the original statement's results intact,
+        # and a savepoint keeps a failed EXPLAIN from aborting the transaction
+        dbapi_connection = conn.connection.dbapi_connection
+        savepoint = conn.dialect.name == "postgresql" and not getattr(
+            dbapi_connection, "autocommit", False
+        )
+        cursor = dbapi_connection.cursor()
+        try:
+            if savepoint:
+                cursor.execute("SAVEPOINT explain_slow_query")
+            try:
+                cursor.execute(prefix + statement, parameters)
+                plan = [str(row[-1]) for row in cursor.fetchall()]
+            except Exception:
+                logger.exception("Could not explain slow query")
+                plan = None
+                if savepoint:
+                    cursor.execute("ROLLBACK TO SAVEPOINT explain_slow_query")
+            if savepoint:
+                cursor.execute("RELEASE SAVEPOINT explain_slow_query")
+            return plan
+        finally:
+            cursor.close()
+
+
+def normalize(statement: str) -> str:
+    """Collapse whitespace and placeholder lists so equal queries look equal"""
+    statement = WHITESPACE.sub(" ", statement).strip()
+    return PLACEHOLDER_LIST.sub("(...)", statement)
+
+
+def redact(parameters, executemany: bool) -> list:
+    """Parameter type names only, values may contain personal data"""
+    if executemany:
+        return [f"{len(parameters)} parameter sets"]
+    if isinstance(parameters, dict):
+        parameters = parameters.values()
+    return [type(value).__name__ for value in parameters or ()]
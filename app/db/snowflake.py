@@ -0,0 +1,64 @@
+"""Time-ordered ids generated in the application.
+
+An id is ``ticks since EPOCH | worker id | sequence``, with ticks of
+``TICK_MS`` milliseconds, shard-encoded like every other id
+(``value * shard_count + shard``). Ids from one worker always grow; ids from
+different workers sort by the tick they were made in. With ``n`` shards they
+stay below 2^53, the largest integer JSON clients such as JavaScript read
+exactly, for about 700 / n years after ``EPOCH``.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+EPOCH_MS = int(EPOCH.timestamp() * 1000)
+
+TICK_MS = 10
+WORKER_BITS = 6
+SEQUENCE_BITS = 6
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+class SnowflakeGenerator:
+    """Hands out ids without a database round trip.
+
+    ``worker_id`` must be unique among the processes writing at the same
+    time. Up to 64 ids are made per tick, 6400 a second; past that, and when
+    the clock steps back, the generator keeps counting on from the last tick
+    it used instead of waiting, so ids never repeat or decrease.
+    """
+
+    def __init__(self, worker_id: int, shard: int = 0, shard_count: int = 1):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"Worker id must be between 0 and {MAX_WORKER_ID}")
+        self.worker_id = worker_id
+        self.shard = shard
+        self.shard_count = shard_count
+        self._last_tick = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            tick = (time.time_ns() // 1_000_000 - EPOCH_MS) // TICK_MS
+            if tick > self._last_tick:
+                self._last_tick, self._sequence = tick, 0
+            elif self._sequence < MAX_SEQUENCE:
+                self._sequence += 1
+            else:
+                self._last_tick, self._sequence = self._last_tick + 1, 0
+
+            value = (
+                (self._last_tick << (WORKER_BITS + SEQUENCE_BITS))
+                | (self.worker_id << SEQUENCE_BITS)
+                | self._sequence
+            )
+        return value * self.shard_count + self.shard
+
+
+def created_at(id: int, shard_count: int = 1) -> datetime:
+    """The UTC time a snowflake id was generated at"""
+    tick = id // shard_count >> (WORKER_BITS + SEQUENCE_BITS)
+    return datetime.fromtimestamp((EPOCH_MS + tick * TICK_MS) / 1000, timezone.utc)
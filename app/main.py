@@ -1,15 +1,104 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from app.api.admission import AdmissionController, AdmissionMiddleware, RouteClass
+from app.api.compression import CompressionMiddleware
+from app.api.profiling import ProfilingMiddleware
+from app.api.request_ids import RequestIdMiddleware
+from app.api.v1.admin import router as admin_router
 from app.api.v1.receipts import router as receipt_router
 from app.api.v1.users import router as user_router
+from app.services.receipt_filter import receipt_id_filter
+from app.settings.config import get_config
+from app.settings.logs import configure_logging
+
+# (method, path, route class); unmatched requests and those without a class
+# bypass admission control
+ADMISSION_RULES = [
+    # Streams stay open and mostly idle, they must not hold admission slots
+    ("GET", r"/api/v1/receipts/stream", None),
+    ("GET", r"/api/v1/receipts/\d+(/view)?", "cheap"),
+    ("GET", r"/api/v1/receipts", "expensive"),
+    ("POST", r"/api/v1/receipts/lookup", "expensive"),
+    ("GET", r"/api/v1/receipts/changes", "expensive"),
+    (None, r"/api/v1/(receipts|register|login|refresh)(/.*)?", "default"),
+]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    config = get_config()
+    app.state.log_pipeline = configure_logging(
+        level=config.LOG_LEVEL,
+        levels=config.LOG_LEVELS,
+        sample_rates=config.LOG_SAMPLE_RATES,
+        queue_size=config.LOG_QUEUE_SIZE,
+        flush_interval=config.LOG_FLUSH_INTERVAL_MS / 1000,
+    )
+    await receipt_id_filter.start()
+    yield
+    await receipt_id_filter.stop()
+    app.state.log_pipeline.stop()
 
 
 def create_app() -> FastAPI:
+    config = get_config()
+
     app = FastAPI(
         title="HIRE1 TEST TASK",
         docs_url="/api/docs",
+        lifespan=lifespan,
+    )
+    # Set by the lifespan, which runs under a server only
+    app.state.log_pipeline = None
+    app.state.admission = AdmissionController(
+        capacity=config.ADMISSION_CAPACITY,
+        route_classes=[
+            RouteClass(
+                "cheap",
+                priority=0,
+                limit=config.ADMISSION_CAPACITY,
+                queue_size=config.ADMISSION_QUEUE_SIZE,
+                max_wait=config.ADMISSION_MAX_WAIT_SECONDS,
+            ),
+            RouteClass(
+                "default",
+                priority=1,
+                limit=config.ADMISSION_DEFAULT_LIMIT,
+                queue_size=config.ADMISSION_QUEUE_SIZE,
+                max_wait=config.ADMISSION_MAX_WAIT_SECONDS,
+            ),
+            RouteClass(
+                "expensive",
+                priority=2,
+                limit=config.ADMISSION_EXPENSIVE_LIMIT,
+                queue_size=config.ADMISSION_QUEUE_SIZE,
+                max_wait=config.ADMISSION_MAX_WAIT_SECONDS,
+            ),
+        ],
+    )
+
+    app.add_middleware(
+        CompressionMiddleware, minimum_size=config.COMPRESSION_MINIMUM_SIZE
+    )
+    if config.PROFILER_ENABLED:
+        app.add_middleware(
+            ProfilingMiddleware,
+            output_dir=config.PROFILER_DIR,
+            secret=config.PROFILER_SECRET,
+            sample_rate=config.PROFILER_SAMPLE_RATE,
+            interval=config.PROFILER_INTERVAL_MS / 1000,
+            keep=config.PROFILER_KEEP,
+        )
+    # Runs before the middleware above and sheds load before any other work
+    app.add_middleware(
+        AdmissionMiddleware, controller=app.state.admission, rules=ADMISSION_RULES
     )
+    # Added last so it runs first: shed requests are logged with an id too
+    app.add_middleware(RequestIdMiddleware)
     app.include_router(user_router)
     app.include_router(receipt_router)
+    app.include_router(admin_router)
 
     return app
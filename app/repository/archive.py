@@ -0,0 +1,275 @@
+import json
+import zlib
+from abc import ABC, abstractmethod
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import and_, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.db.models.archive import ArchivedReceipt
+from app.db.models.receipt import (
+    PaymentType,
+    Product,
+    ProductLine,
+    Receipt,
+    UserReceiptCounter,
+)
+
+
+def pack_receipt(receipt: Receipt) -> bytes:
+    """Serialize the non-filterable part of a receipt, products as columns"""
+    payload = {
+        "payment_amount": str(receipt.payment_amount),
+        "rest": str(receipt.rest),
+        "products": {
+            "name": [product.name for product in receipt.products],
+            "price": [str(product.price) for product in receipt.products],
+            "quantity": [str(product.quantity) for product in receipt.products],
+            "total": [str(product.total) for product in receipt.products],
+        },
+    }
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode())
+
+
+def unpack_receipt(archived: ArchivedReceipt) -> Receipt:
+    """Rebuild a detached, read-only Receipt from its archived row"""
+    payload = json.loads(zlib.decompress(archived.payload))
+
+    receipt = Receipt(
+        id=archived.id,
+        user_id=archived.user_id,
+        total=archived.total,
+        payment_type=archived.payment_type,
+        payment_amount=Decimal(payload["payment_amount"]),
+        rest=Decimal(payload["rest"]),
+        created_at=archived.created_at,
+        updated_at=archived.updated_at,
+    )
+
+    columns = payload["products"]
+    set_committed_value(
+        receipt,
+        "products",
+        [
+            ProductLine(name, Decimal(price), Decimal(quantity), Decimal(total))
+            for name, price, quantity, total in zip(
+                columns["name"],
+                columns["price"],
+                columns["quantity"],
+                columns["total"],
+            )
+        ],
+    )
+    return receipt
+
+
+class BaseReceiptArchiveRepository(ABC):
+    @abstractmethod
+    async def archive_batch(self, cutoff: datetime, batch_size: int) -> int:
+        ...
+
+    @abstractmethod
+    async def get_by_id(self, receipt_id: int) -> Receipt | None:
+        ...
+
+    @abstractmethod
+    async def get_by_ids(self, receipt_ids: list[int], user_id: int) -> list[Receipt]:
+        ...
+
+    @abstractmethod
+    async def get_version(self, receipt_id: int) -> tuple[int, datetime] | None:
+        ...
+
+    @abstractmethod
+    async def get_ids_after(self, after_id: int, limit: int) -> list[int]:
+        ...
+
+    @abstractmethod
+    async def get_user_receipts(
+        self,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        min_total: Optional[float] = None,
+        payment_type: Optional[PaymentType] = None,
+    ) -> list[Receipt]:
+        ...
+
+    @abstractmethod
+    async def count_user_receipts(
+        self,
+        user_id: int,
+        limit: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        min_total: Optional[float] = None,
+        payment_type: Optional[PaymentType] = None,
+    ) -> int:
+        ...
+
+
+class ReceiptArchiveRepository(BaseReceiptArchiveRepository):
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def archive_batch(self, cutoff: datetime, batch_size: int) -> int:
+        """Move up to ``batch_size`` of the oldest receipts created before ``cutoff``.
+
+        Copying into the archive and deleting from the hot tables happen in one
+        transaction. Rows locked by concurrent writers are skipped.
+        """
+        query = (
+            select(Receipt)
+            .options(selectinload(Receipt.products))
+            .where(Receipt.created_at < cutoff)
+            .order_by(Receipt.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True, of=Receipt)
+        )
+        receipts = (await self.session.scalars(query)).all()
+        if not receipts:
+            await self.session.commit()
+            return 0
+
+        rows = [
+            {
+                "id": receipt.id,
+                "user_id": receipt.user_id,
+                "total": receipt.total,
+                "payment_type": receipt.payment_type,
+                "created_at": receipt.created_at,
+                "updated_at": receipt.updated_at,
+                "payload": pack_receipt(receipt),
+            }
+            for receipt in receipts
+        ]
+        receipt_ids = [receipt.id for receipt in receipts]
+
+        await self.session.execute(insert(ArchivedReceipt), rows)
+        await self.session.execute(
+            delete(Product)
+            .where(Product.receipt_id.in_(receipt_ids))
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.execute(
+            delete(Receipt)
+            .where(Receipt.id.in_(receipt_ids))
+            .execution_options(synchronize_session=False)
+        )
+        # Archived receipts move to the end of their owners' lists
+        await self.session.execute(
+            update(UserReceiptCounter)
+            .where(
+                UserReceiptCounter.user_id.in_(
+                    {receipt.user_id for receipt in receipts}
+                )
+            )
+            .values(version=UserReceiptCounter.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
+
+        self.session.expunge_all()
+        return len(receipts)
+
+    async def get_by_id(self, receipt_id: int) -> Receipt | None:
+        archived = await self.session.get(ArchivedReceipt, receipt_id)
+        if archived is None:
+            return None
+
+        return unpack_receipt(archived)
+
+    async def get_by_ids(self, receipt_ids: list[int], user_id: int) -> list[Receipt]:
+        query = select(ArchivedReceipt).where(
+            ArchivedReceipt.id.in_(receipt_ids), ArchivedReceipt.user_id == user_id
+        )
+        archived = (await self.session.scalars(query)).all()
+        return [unpack_receipt(row) for row in archived]
+
+    async def get_version(self, receipt_id: int) -> tuple[int, datetime] | None:
+        query = select(ArchivedReceipt.user_id, ArchivedReceipt.updated_at).where(
+            ArchivedReceipt.id == receipt_id
+        )
+        result = await self.session.execute(query)
+        return result.tuples().one_or_none()
+
+    async def get_ids_after(self, after_id: int, limit: int) -> list[int]:
+        query = (
+            select(ArchivedReceipt.id)
+            .where(ArchivedReceipt.id > after_id)
+            .order_by(ArchivedReceipt.id)
+            .limit(limit)
+        )
+        return list(await self.session.scalars(query))
+
+    async def get_user_receipts(
+        self,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        min_total: Optional[float] = None,
+        payment_type: Optional[PaymentType] = None,
+    ) -> list[Receipt]:
+        query = self._user_receipts_query(
+            select(ArchivedReceipt),
+            user_id,
+            start_date,
+            end_date,
+            min_total,
+            payment_type,
+        )
+        query = query.order_by(ArchivedReceipt.id.desc()).offset(skip).limit(limit)
+
+        archived = (await self.session.scalars(query)).all()
+        return [unpack_receipt(row) for row in archived]
+
+    async def count_user_receipts(
+        self,
+        user_id: int,
+        limit: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        min_total: Optional[float] = None,
+        payment_type: Optional[PaymentType] = None,
+    ) -> int:
+        """Count matching archived receipts, stopping at ``limit``"""
+        query = self._user_receipts_query(
+            select(ArchivedReceipt.id),
+            user_id,
+            start_date,
+            end_date,
+            min_total,
+            payment_type,
+        )
+        bounded = query.limit(limit).subquery()
+        return await self.session.scalar(select(func.count()).select_from(bounded))
+
+    @staticmethod
+    def _user_receipts_query(
+        query,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        min_total: Optional[float] = None,
+        payment_type: Optional[PaymentType] = None,
+    ):
+        filters = [ArchivedReceipt.user_id == user_id]
+
+        if start_date:
+            filters.append(ArchivedReceipt.created_at >= start_date)
+        if end_date:
+            filters.append(ArchivedReceipt.created_at <= end_date)
+        if min_total is not None:
+            filters.append(ArchivedReceipt.total >= min_total)
+        if payment_type:
+            filters.append(ArchivedReceipt.payment_type == payment_type)
+
+        return query.where(and_(*filters))
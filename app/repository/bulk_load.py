@@ -0,0 +1,97 @@
+from abc import ABC, abstractmethod
+
+from sqlalchemy import Table, case, func, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.archive import ArchivedReceipt
+from app.db.models.id_block import IdBlock
+from app.db.models.receipt import Receipt
+from app.db.models.user import User
+
+# Tables whose serial sequences must follow explicitly inserted ids
+SERIAL_TABLES = ("users", "receipts", "products")
+
+
+class BaseBulkLoadRepository(ABC):
+    @abstractmethod
+    async def get_max_ids(self) -> dict[str, int]:
+        ...
+
+    @abstractmethod
+    async def write_rows(
+        self, table: Table, columns: list[str], rows: list[tuple]
+    ) -> None:
+        ...
+
+    @abstractmethod
+    async def reserve_ids(self, next_values: dict[str, int]) -> None:
+        ...
+
+
+class BulkLoadRepository(BaseBulkLoadRepository):
+    """Raw inserts that bypass the ORM: COPY on PostgreSQL, executemany elsewhere"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.dialect = session.bind.dialect.name
+
+    async def get_max_ids(self) -> dict[str, int]:
+        """Highest user and receipt ids in use, including the id_blocks reservations"""
+        max_user_id = await self.session.scalar(select(func.max(User.id))) or 0
+        max_receipt_id = max(
+            await self.session.scalar(select(func.max(Receipt.id))) or 0,
+            await self.session.scalar(select(func.max(ArchivedReceipt.id))) or 0,
+        )
+        reserved = dict(
+            (await self.session.execute(select(IdBlock.name, IdBlock.next_value))).all()
+        )
+        return {
+            "users": max_user_id,
+            "receipts": max_receipt_id,
+            "reserved_users": reserved.get("users", 1) - 1,
+            "reserved_receipts": reserved.get("receipts", 1) - 1,
+        }
+
+    async def write_rows(
+        self, table: Table, columns: list[str], rows: list[tuple]
+    ) -> None:
+        if not rows:
+            return
+
+        if self.dialect == "postgresql":
+            connection = await self.session.connection()
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                table.name, records=rows, columns=columns
+            )
+        else:
+            await self.session.execute(
+                insert(table), [dict(zip(columns, row)) for row in rows]
+            )
+
+    async def reserve_ids(self, next_values: dict[str, int]) -> None:
+        """Move id allocation past the loaded rows.
+
+        Raises the id_blocks entries to ``next_values`` (local ids) and, on
+        PostgreSQL, the serial sequences to the highest id in each table.
+        """
+        for name, next_value in next_values.items():
+            await self.session.execute(
+                update(IdBlock)
+                .where(IdBlock.name == name)
+                .values(
+                    next_value=case(
+                        (IdBlock.next_value < next_value, next_value),
+                        else_=IdBlock.next_value,
+                    )
+                )
+            )
+
+        if self.dialect == "postgresql":
+            for table in SERIAL_TABLES:
+                await self.session.execute(
+                    text(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                        f"(SELECT MAX(id) FROM {table}))"
+                    )
+                )
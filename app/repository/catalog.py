@@ -0,0 +1,49 @@
+from abc import ABC, abstractmethod
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.receipt import CatalogProduct
+
+# Keeps every statement well below the bind parameter limits of asyncpg and SQLite
+CHUNK_SIZE = 1000
+
+
+class BaseProductCatalogRepository(ABC):
+    @abstractmethod
+    async def upsert(self, user_id: int, names: list[str]) -> dict[str, int]:
+        ...
+
+
+class ProductCatalogRepository(BaseProductCatalogRepository):
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def upsert(self, user_id: int, names: list[str]) -> dict[str, int]:
+        """Insert the missing names into the user's catalog and return their ids.
+
+        The inserts are part of the caller's transaction and are rolled back
+        with it, so the ids are only valid once that transaction has committed.
+        """
+        dialect = self.session.get_bind().dialect.name
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+
+        catalog_ids = {}
+        for start in range(0, len(names), CHUNK_SIZE):
+            chunk = names[start : start + CHUNK_SIZE]
+
+            stmt = (
+                insert(CatalogProduct)
+                .values([{"user_id": user_id, "name": name} for name in chunk])
+                .on_conflict_do_nothing(index_elements=["user_id", "name"])
+            )
+            await self.session.execute(stmt)
+
+            query = select(CatalogProduct.name, CatalogProduct.id).where(
+                CatalogProduct.user_id == user_id, CatalogProduct.name.in_(chunk)
+            )
+            result = await self.session.execute(query)
+            catalog_ids.update(result.tuples().all())
+
+        return catalog_ids
@@ -0,0 +1,104 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy import Row, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.archive import ArchivedReceipt
+from app.db.models.receipt import CatalogProduct, Product, Receipt
+
+
+class BaseReceiptExportRepository(ABC):
+    @abstractmethod
+    async def get_upper_bound(self, settled_before: datetime) -> int | None:
+        ...
+
+    @abstractmethod
+    def stream_receipt_lines(
+        self, after_id: int, upto_id: int, batch_size: int
+    ) -> AsyncIterator[Sequence[Row]]:
+        ...
+
+    @abstractmethod
+    def stream_archived(
+        self, after_id: int, upto_id: int, batch_size: int
+    ) -> AsyncIterator[Sequence[Row]]:
+        ...
+
+
+class ReceiptExportRepository(BaseReceiptExportRepository):
+    """Read-only streaming queries used by the analytics export"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_upper_bound(self, settled_before: datetime) -> int | None:
+        """Highest receipt id, hot or archived, created before ``settled_before``"""
+        hot = await self.session.scalar(
+            select(func.max(Receipt.id)).where(Receipt.created_at < settled_before)
+        )
+        archived = await self.session.scalar(
+            select(func.max(ArchivedReceipt.id)).where(
+                ArchivedReceipt.created_at < settled_before
+            )
+        )
+        return max(
+            (value for value in (hot, archived) if value is not None), default=None
+        )
+
+    async def stream_receipt_lines(
+        self, after_id: int, upto_id: int, batch_size: int
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Yield receipts joined with their products, ``batch_size`` rows at a time.
+
+        Rows come from a server-side cursor, ordered by receipt and product id,
+        with one row per product (or a single row with empty product columns).
+        """
+        query = (
+            select(
+                Receipt.id,
+                Receipt.user_id,
+                Receipt.payment_type,
+                Receipt.payment_amount,
+                Receipt.total,
+                Receipt.rest,
+                Receipt.created_at,
+                Receipt.updated_at,
+                Product.id.label("product_id"),
+                func.coalesce(Product._name, CatalogProduct.name).label("name"),
+                Product.price,
+                Product.quantity,
+                Product.total.label("product_total"),
+            )
+            .outerjoin(Product, Product.receipt_id == Receipt.id)
+            .outerjoin(CatalogProduct, CatalogProduct.id == Product.catalog_id)
+            .where(Receipt.id > after_id, Receipt.id <= upto_id)
+            .order_by(Receipt.id, Product.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await self.session.stream(query)
+        async for rows in result.partitions():
+            yield rows
+
+    async def stream_archived(
+        self, after_id: int, upto_id: int, batch_size: int
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Yield archived receipt rows accepted by ``unpack_receipt``"""
+        query = (
+            select(
+                ArchivedReceipt.id,
+                ArchivedReceipt.user_id,
+                ArchivedReceipt.total,
+                ArchivedReceipt.payment_type,
+                ArchivedReceipt.created_at,
+                ArchivedReceipt.updated_at,
+                ArchivedReceipt.payload,
+            )
+            .where(ArchivedReceipt.id > after_id, ArchivedReceipt.id <= upto_id)
+            .order_by(ArchivedReceipt.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await self.session.stream(query)
+        async for rows in result.partitions():
+            yield rows
@@ -0,0 +1,249 @@
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.archive import ArchivedReceipt
+from app.db.models.purge import PurgeJob, PurgeKind, PurgeStatus
+from app.db.models.receipt import CatalogProduct, Product, Receipt, UserReceiptCounter
+from app.db.models.tombstone import ReceiptTombstone
+from app.db.models.user import User
+
+
+class BasePurgeRepository(ABC):
+    @abstractmethod
+    async def create_job(
+        self,
+        kind: PurgeKind,
+        user_id: int | None = None,
+        cutoff: datetime | None = None,
+    ) -> PurgeJob:
+        ...
+
+    @abstractmethod
+    async def get_job(self, job_id: int) -> PurgeJob | None:
+        ...
+
+    @abstractmethod
+    async def get_jobs(self, unfinished_only: bool = False) -> list[PurgeJob]:
+        ...
+
+    @abstractmethod
+    async def delete_user_receipts_chunk(
+        self, user_id: int, chunk_size: int
+    ) -> tuple[int, int]:
+        ...
+
+    @abstractmethod
+    async def delete_user_archived_chunk(self, user_id: int, chunk_size: int) -> int:
+        ...
+
+    @abstractmethod
+    async def delete_user_catalog_chunk(self, user_id: int, chunk_size: int) -> int:
+        ...
+
+    @abstractmethod
+    async def delete_user(self, user_id: int) -> None:
+        ...
+
+    @abstractmethod
+    async def delete_old_receipts_chunk(
+        self, cutoff: datetime, chunk_size: int
+    ) -> tuple[int, int]:
+        ...
+
+    @abstractmethod
+    async def delete_old_archived_chunk(self, cutoff: datetime, chunk_size: int) -> int:
+        ...
+
+    @abstractmethod
+    async def delete_old_tombstones_chunk(
+        self, cutoff: datetime, chunk_size: int
+    ) -> int:
+        ...
+
+
+class PurgeRepository(BasePurgeRepository):
+    """Deletes in bounded chunks; callers commit after each chunk"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create_job(
+        self,
+        kind: PurgeKind,
+        user_id: int | None = None,
+        cutoff: datetime | None = None,
+    ) -> PurgeJob:
+        job = PurgeJob(
+            kind=kind,
+            status=PurgeStatus.PENDING,
+            user_id=user_id,
+            cutoff=cutoff,
+            deleted_receipts=0,
+            deleted_products=0,
+            deleted_archived=0,
+        )
+        self.session.add(job)
+        await self.session.commit()
+        await self.session.refresh(job)
+        return job
+
+    async def get_job(self, job_id: int) -> PurgeJob | None:
+        return await self.session.get(PurgeJob, job_id)
+
+    async def get_jobs(self, unfinished_only: bool = False) -> list[PurgeJob]:
+        query = select(PurgeJob).order_by(PurgeJob.id)
+        if unfinished_only:
+            query = query.where(PurgeJob.status != PurgeStatus.DONE)
+        return (await self.session.scalars(query)).all()
+
+    async def delete_user_receipts_chunk(
+        self, user_id: int, chunk_size: int
+    ) -> tuple[int, int]:
+        query = (
+            select(Receipt.id)
+            .where(Receipt.user_id == user_id)
+            .order_by(Receipt.id)
+            .limit(chunk_size)
+            .with_for_update(skip_locked=True)
+        )
+        receipt_ids = (await self.session.scalars(query)).all()
+        return await self._delete_receipts(receipt_ids)
+
+    async def delete_user_archived_chunk(self, user_id: int, chunk_size: int) -> int:
+        query = (
+            select(ArchivedReceipt.id)
+            .where(ArchivedReceipt.user_id == user_id)
+            .order_by(ArchivedReceipt.id)
+            .limit(chunk_size)
+        )
+        archived_ids = (await self.session.scalars(query)).all()
+        return await self._delete_archived(archived_ids)
+
+    async def delete_user_catalog_chunk(self, user_id: int, chunk_size: int) -> int:
+        query = (
+            select(CatalogProduct.id)
+            .where(CatalogProduct.user_id == user_id)
+            .limit(chunk_size)
+        )
+        catalog_ids = (await self.session.scalars(query)).all()
+        if not catalog_ids:
+            return 0
+
+        await self.session.execute(
+            delete(CatalogProduct)
+            .where(CatalogProduct.id.in_(catalog_ids))
+            .execution_options(synchronize_session=False)
+        )
+        return len(catalog_ids)
+
+    async def delete_user(self, user_id: int) -> None:
+        """Delete the user row once its receipts are gone, so the cascade is cheap"""
+        await self.session.execute(
+            delete(User)
+            .where(User.id == user_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def delete_old_receipts_chunk(
+        self, cutoff: datetime, chunk_size: int
+    ) -> tuple[int, int]:
+        query = (
+            select(Receipt.id, Receipt.user_id)
+            .where(Receipt.created_at < cutoff)
+            .order_by(Receipt.id)
+            .limit(chunk_size)
+            .with_for_update(skip_locked=True)
+        )
+        rows = (await self.session.execute(query)).all()
+
+        await self._decrement_counters(Counter(user_id for _, user_id in rows))
+        await self._write_tombstones(rows)
+        return await self._delete_receipts([receipt_id for receipt_id, _ in rows])
+
+    async def delete_old_archived_chunk(self, cutoff: datetime, chunk_size: int) -> int:
+        query = (
+            select(ArchivedReceipt.id, ArchivedReceipt.user_id)
+            .where(ArchivedReceipt.created_at < cutoff)
+            .order_by(ArchivedReceipt.id)
+            .limit(chunk_size)
+        )
+        rows = (await self.session.execute(query)).all()
+
+        await self._decrement_counters(Counter(user_id for _, user_id in rows))
+        await self._write_tombstones(rows)
+        return await self._delete_archived([archived_id for archived_id, _ in rows])
+
+    async def delete_old_tombstones_chunk(
+        self, cutoff: datetime, chunk_size: int
+    ) -> int:
+        query = (
+            select(ReceiptTombstone.receipt_id)
+            .where(ReceiptTombstone.deleted_at < cutoff)
+            .limit(chunk_size)
+        )
+        receipt_ids = (await self.session.scalars(query)).all()
+        if not receipt_ids:
+            return 0
+
+        await self.session.execute(
+            delete(ReceiptTombstone)
+            .where(ReceiptTombstone.receipt_id.in_(receipt_ids))
+            .execution_options(synchronize_session=False)
+        )
+        return len(receipt_ids)
+
+    async def _delete_receipts(self, receipt_ids: list[int]) -> tuple[int, int]:
+        if not receipt_ids:
+            return 0, 0
+
+        products = await self.session.execute(
+            delete(Product)
+            .where(Product.receipt_id.in_(receipt_ids))
+            .execution_options(synchronize_session=False)
+        )
+        receipts = await self.session.execute(
+            delete(Receipt)
+            .where(Receipt.id.in_(receipt_ids))
+            .execution_options(synchronize_session=False)
+        )
+        return receipts.rowcount, products.rowcount
+
+    async def _delete_archived(self, archived_ids: list[int]) -> int:
+        if not archived_ids:
+            return 0
+
+        result = await self.session.execute(
+            delete(ArchivedReceipt)
+            .where(ArchivedReceipt.id.in_(archived_ids))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    async def _write_tombstones(self, rows: list[tuple[int, int]]) -> None:
+        """Record deleted ``(receipt_id, user_id)`` pairs for delta syncs"""
+        if not rows:
+            return
+
+        await self.session.execute(
+            insert(ReceiptTombstone),
+            [
+                {"receipt_id": receipt_id, "user_id": user_id}
+                for receipt_id, user_id in rows
+            ],
+        )
+
+    async def _decrement_counters(self, deleted_per_user: Counter) -> None:
+        for user_id, deleted in deleted_per_user.items():
+            await self.session.execute(
+                update(UserReceiptCounter)
+                .where(UserReceiptCounter.user_id == user_id)
+                .values(
+                    receipt_count=UserReceiptCounter.receipt_count - deleted,
+                    version=UserReceiptCounter.version + 1,
+                )
+                .execution_options(synchronize_session=False)
+            )
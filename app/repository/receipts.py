@@ -1,23 +1,81 @@
+import json
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Sequence
 
 from fastapi import HTTPException, status
-from sqlalchemy import and_, select
+from sqlalchemy import (
+    BigInteger,
+    Select,
+    and_,
+    any_,
+    bindparam,
+    func,
+    insert,
+    inspect,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import load_only, raiseload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app.db.models.receipt import PaymentType, Receipt
+from app.db.models.receipt import (
+    PaymentType,
+    Product,
+    ProductLine,
+    Receipt,
+    UserReceiptCounter,
+)
+from app.db.models.tombstone import ReceiptTombstone
+from app.db.sharding import assign_receipt_id
+from app.repository.archive import ReceiptArchiveRepository
+from app.settings.config import get_config
+
+config = get_config()
 
 
 class BaseReceiptRepository(ABC):
+    @abstractmethod
+    async def next_id(self) -> int | None:
+        ...
+
     @abstractmethod
     async def create(self, receipt: Receipt) -> Receipt:
         ...
 
     @abstractmethod
-    async def get_by_id(self, receipt_id: int) -> Receipt | None:
+    async def create_bulk(self, receipt: Receipt, products: list[dict]) -> Receipt:
+        ...
+
+    @abstractmethod
+    async def get_by_id(
+        self,
+        receipt_id: int,
+        columns: Optional[Sequence[str]] = None,
+        load_products: bool = True,
+    ) -> Receipt | None:
+        ...
+
+    @abstractmethod
+    async def get_by_ids(
+        self,
+        receipt_ids: list[int],
+        user_id: int,
+        columns: Optional[Sequence[str]] = None,
+        load_products: bool = True,
+    ) -> list[Receipt]:
+        ...
+
+    @abstractmethod
+    async def get_version(self, receipt_id: int) -> tuple[int, datetime] | None:
+        ...
+
+    @abstractmethod
+    async def get_ids_after(self, after_id: int, limit: int) -> list[int]:
         ...
 
     @abstractmethod
@@ -30,13 +88,74 @@ class BaseReceiptRepository(ABC):
         end_date: Optional[datetime] = None,
         min_total: Optional[float] = None,
         payment_type: Optional[PaymentType] = None,
+        columns: Optional[Sequence[str]] = None,
+        load_products: bool = True,
     ) -> list[Receipt]:
         ...
 
+    @abstractmethod
+    async def get_user_receipts_after(
+        self,
+        user_id: int,
+        after_id: int,
+        limit: int,
+        columns: Optional[Sequence[str]] = None,
+    ) -> list[Receipt]:
+        ...
+
+    @abstractmethod
+    async def get_user_changes(
+        self,
+        user_id: int,
+        after: tuple[datetime, int] | None,
+        until: datetime,
+        limit: int,
+    ) -> list[Receipt]:
+        ...
+
+    @abstractmethod
+    async def get_user_tombstones(
+        self,
+        user_id: int,
+        after: tuple[datetime, int],
+        until: datetime,
+        limit: int,
+    ) -> list[ReceiptTombstone]:
+        ...
+
+    @abstractmethod
+    async def increment_user_receipt_count(self, user_id: int) -> None:
+        ...
+
+    @abstractmethod
+    async def get_user_receipt_count(self, user_id: int) -> int:
+        ...
+
+    @abstractmethod
+    async def get_user_receipts_version(self, user_id: int) -> int:
+        ...
+
+    @abstractmethod
+    async def count_user_receipts(
+        self,
+        user_id: int,
+        threshold: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        min_total: Optional[float] = None,
+        payment_type: Optional[PaymentType] = None,
+    ) -> tuple[int, bool]:
+        ...
+
 
 class ReceiptRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
+        self.archive = ReceiptArchiveRepository(session)
+
+    async def next_id(self) -> int | None:
+        """Time-ordered id for a new receipt, or None to let the database pick one"""
+        return assign_receipt_id(self.session)
 
     async def create(self, receipt: Receipt) -> Receipt:
         try:
@@ -53,20 +172,135 @@ class ReceiptRepository:
             return result.scalar_one()
         except IntegrityError as e:
             await self.session.rollback()
-            if "check_payment_amount" in str(e):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Invalid payment amount. Please check the total and payment amount values.",
+            self._raise_for_integrity_error(e)
+            raise
+
+    async def create_bulk(self, receipt: Receipt, products: list[dict]) -> Receipt:
+        """Insert a receipt and its products without building ORM products.
+
+        Products are plain dicts with name, catalog_id, price, quantity and total.
+        They are written with a single executemany and are not reloaded; the
+        returned receipt carries them as ``ProductLine`` tuples instead.
+        """
+        try:
+            self.session.add(receipt)
+            await self.session.flush()
+
+            rows = [
+                {
+                    "receipt_id": receipt.id,
+                    "name": None if product["catalog_id"] else product["name"],
+                    "catalog_id": product["catalog_id"],
+                    "price": product["price"],
+                    "quantity": product["quantity"],
+                    "total": product["total"],
+                }
+                for product in products
+            ]
+            await self.session.execute(insert(Product.__table__), rows)
+            await self.session.commit()
+        except IntegrityError as e:
+            await self.session.rollback()
+            self._raise_for_integrity_error(e)
+            raise
+
+        if "created_at" in inspect(receipt).unloaded:
+            await self.session.refresh(receipt, ["created_at"])
+
+        # Detach so the session never tries to flush the stand-in products
+        self.session.expunge(receipt)
+        set_committed_value(
+            receipt,
+            "products",
+            [
+                ProductLine(
+                    product["name"],
+                    product["price"],
+                    product["quantity"],
+                    product["total"],
                 )
+                for product in products
+            ],
+        )
+        return receipt
 
-    async def get_by_id(self, receipt_id: int) -> Receipt | None:
+    async def get_by_id(
+        self,
+        receipt_id: int,
+        columns: Optional[Sequence[str]] = None,
+        load_products: bool = True,
+    ) -> Receipt | None:
         query = (
             select(Receipt)
-            .options(selectinload(Receipt.products))
+            .options(*self._load_options(columns, load_products))
             .where(Receipt.id == receipt_id)
         )
         result = await self.session.execute(query)
-        return result.scalar_one_or_none()
+        receipt = result.scalar_one_or_none()
+
+        if receipt is None and config.RECEIPT_ARCHIVE_READ_THROUGH:
+            return await self.archive.get_by_id(receipt_id)
+
+        return receipt
+
+    async def get_by_ids(
+        self,
+        receipt_ids: list[int],
+        user_id: int,
+        columns: Optional[Sequence[str]] = None,
+        load_products: bool = True,
+    ) -> list[Receipt]:
+        """Return the user's receipts among ``receipt_ids``, in no particular order.
+
+        One receipts query and at most one products query, whatever the number
+        of ids. Ids missing from the hot tables are looked up in the archive.
+        """
+        if self.session.get_bind().dialect.name == "postgresql":
+            # A single array parameter instead of one placeholder per id
+            id_filter = Receipt.id == any_(
+                bindparam(
+                    "receipt_ids", receipt_ids, type_=postgresql.ARRAY(BigInteger)
+                )
+            )
+        else:
+            id_filter = Receipt.id.in_(receipt_ids)
+
+        query = (
+            select(Receipt)
+            .options(*self._load_options(columns, load_products))
+            .where(id_filter, Receipt.user_id == user_id)
+        )
+        result = await self.session.execute(query)
+        receipts = list(result.scalars().all())
+
+        missing = set(receipt_ids) - {receipt.id for receipt in receipts}
+        if missing and config.RECEIPT_ARCHIVE_READ_THROUGH:
+            receipts += await self.archive.get_by_ids(list(missing), user_id)
+
+        return receipts
+
+    async def get_version(self, receipt_id: int) -> tuple[int, datetime] | None:
+        """Return the owner and last update time of a receipt without loading it"""
+        query = select(Receipt.user_id, Receipt.updated_at).where(
+            Receipt.id == receipt_id
+        )
+        result = await self.session.execute(query)
+        version = result.tuples().one_or_none()
+
+        if version is None and config.RECEIPT_ARCHIVE_READ_THROUGH:
+            return await self.archive.get_version(receipt_id)
+
+        return version
+
+    async def get_ids_after(self, after_id: int, limit: int) -> list[int]:
+        """Ids of hot receipts above ``after_id`` in order, for scans in batches"""
+        query = (
+            select(Receipt.id)
+            .where(Receipt.id > after_id)
+            .order_by(Receipt.id)
+            .limit(limit)
+        )
+        return list(await self.session.scalars(query))
 
     async def get_user_receipts(
         self,
@@ -77,14 +311,250 @@ class ReceiptRepository:
         end_date: Optional[datetime] = None,
         min_total: Optional[float] = None,
         payment_type: Optional[PaymentType] = None,
+        columns: Optional[Sequence[str]] = None,
+        load_products: bool = True,
     ) -> list[Receipt]:
+        """Return a page of the user's receipts, newest first.
+
+        ``columns`` limits the receipt columns loaded (all by default) and
+        ``load_products=False`` skips the products query altogether.
+        """
         query = (
             select(Receipt)
-            .options(selectinload(Receipt.products))
+            .options(*self._load_options(columns, load_products))
             .where(Receipt.user_id == user_id)
         )
 
-        # Create a list to hold all filter conditions
+        filters = self._build_filters(start_date, end_date, min_total, payment_type)
+
+        # Apply all filters at once
+        if filters:
+            query = query.where(and_(*filters))
+
+        # Apply pagination, newest first
+        query = query.order_by(Receipt.id.desc()).offset(skip).limit(limit)
+
+        result = await self.session.execute(query)
+        receipts = list(result.scalars().all())
+
+        if len(receipts) == limit or not config.RECEIPT_ARCHIVE_READ_THROUGH:
+            return receipts
+
+        # Archived receipts are older than every hot one, so they continue the
+        # page. Past the end of the hot receipts the archive offset depends on
+        # how many hot receipts match.
+        if receipts:
+            archive_skip = 0
+        else:
+            hot_count = await self.session.scalar(
+                select(func.count())
+                .select_from(Receipt)
+                .where(Receipt.user_id == user_id, *filters)
+            )
+            archive_skip = skip - hot_count
+
+        archived = await self.archive.get_user_receipts(
+            user_id=user_id,
+            skip=archive_skip,
+            limit=limit - len(receipts),
+            start_date=start_date,
+            end_date=end_date,
+            min_total=min_total,
+            payment_type=payment_type,
+        )
+        return receipts + archived
+
+    async def get_user_receipts_after(
+        self,
+        user_id: int,
+        after_id: int,
+        limit: int,
+        columns: Optional[Sequence[str]] = None,
+    ) -> list[Receipt]:
+        """Return up to ``limit`` of the user's receipts with ids above ``after_id``,
+        oldest first and without products"""
+        query = (
+            select(Receipt)
+            .options(*self._load_options(columns, load_products=False))
+            .where(Receipt.user_id == user_id, Receipt.id > after_id)
+            .order_by(Receipt.id)
+            .limit(limit)
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def get_user_changes(
+        self,
+        user_id: int,
+        after: tuple[datetime, int] | None,
+        until: datetime,
+        limit: int,
+    ) -> list[Receipt]:
+        """Return up to ``limit`` of the user's receipts updated before ``until``
+        and, when given, after the ``(updated_at, id)`` position ``after``,
+        in that order and with products"""
+        query = (
+            select(Receipt)
+            .options(*self._load_options(None, load_products=True))
+            .where(Receipt.user_id == user_id, Receipt.updated_at < until)
+            .order_by(Receipt.updated_at, Receipt.id)
+            .limit(limit)
+        )
+        if after is not None:
+            query = query.where(tuple_(Receipt.updated_at, Receipt.id) > tuple_(*after))
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def get_user_tombstones(
+        self,
+        user_id: int,
+        after: tuple[datetime, int],
+        until: datetime,
+        limit: int,
+    ) -> list[ReceiptTombstone]:
+        """Same as ``get_user_changes`` for purged receipts, by ``deleted_at``"""
+        query = (
+            select(ReceiptTombstone)
+            .where(
+                ReceiptTombstone.user_id == user_id,
+                ReceiptTombstone.deleted_at < until,
+                tuple_(ReceiptTombstone.deleted_at, ReceiptTombstone.receipt_id)
+                > tuple_(*after),
+            )
+            .order_by(ReceiptTombstone.deleted_at, ReceiptTombstone.receipt_id)
+            .limit(limit)
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    async def increment_user_receipt_count(self, user_id: int) -> None:
+        """Bump the user's receipt counter and list version without committing.
+
+        Must be called in the same transaction as the receipt insert so the
+        counter never drifts from the receipts table.
+        """
+        query = (
+            update(UserReceiptCounter)
+            .where(UserReceiptCounter.user_id == user_id)
+            .values(
+                receipt_count=UserReceiptCounter.receipt_count + 1,
+                version=UserReceiptCounter.version + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.session.execute(query)
+
+        if result.rowcount == 0:
+            self.session.add(
+                UserReceiptCounter(user_id=user_id, receipt_count=1, version=1)
+            )
+
+    async def get_user_receipt_count(self, user_id: int) -> int:
+        query = select(UserReceiptCounter.receipt_count).where(
+            UserReceiptCounter.user_id == user_id
+        )
+        count = await self.session.scalar(query)
+
+        return count or 0
+
+    async def get_user_receipts_version(self, user_id: int) -> int:
+        query = select(UserReceiptCounter.version).where(
+            UserReceiptCounter.user_id == user_id
+        )
+        version = await self.session.scalar(query)
+
+        return version or 0
+
+    async def count_user_receipts(
+        self,
+        user_id: int,
+        threshold: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        min_total: Optional[float] = None,
+        payment_type: Optional[PaymentType] = None,
+    ) -> tuple[int, bool]:
+        """Count the user's receipts matching the filters.
+
+        The count is exact up to ``threshold`` rows, so the database never scans
+        more than ``threshold + 1`` index entries. Above that the planner's row
+        estimate is used instead. Returns the count and whether it is exact.
+        """
+        query = select(Receipt.id).where(Receipt.user_id == user_id)
+
+        filters = self._build_filters(start_date, end_date, min_total, payment_type)
+        if filters:
+            query = query.where(and_(*filters))
+
+        bounded = query.limit(threshold + 1).subquery()
+        count = await self.session.scalar(select(func.count()).select_from(bounded))
+
+        if count <= threshold and config.RECEIPT_ARCHIVE_READ_THROUGH:
+            count += await self.archive.count_user_receipts(
+                user_id=user_id,
+                limit=threshold + 1 - count,
+                start_date=start_date,
+                end_date=end_date,
+                min_total=min_total,
+                payment_type=payment_type,
+            )
+
+        if count <= threshold:
+            return count, True
+
+        estimate = await self._estimate_row_count(query)
+        if estimate is None:
+            # No planner estimate available, the user's total is an upper bound
+            estimate = await self.get_user_receipt_count(user_id)
+
+        return max(estimate, threshold + 1), False
+
+    async def _estimate_row_count(self, query: Select) -> int | None:
+        dialect = self.session.get_bind().dialect
+        if dialect.name != "postgresql":
+            return None
+
+        # Filter values are validated upstream, so inlining them is safe here
+        compiled = query.compile(
+            dialect=dialect, compile_kwargs={"literal_binds": True}
+        )
+        connection = await self.session.connection()
+        result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")
+
+        plan = result.scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    @staticmethod
+    def _raise_for_integrity_error(error: IntegrityError) -> None:
+        if "check_payment_amount" in str(error):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid payment amount. Please check the total and payment amount values.",
+            )
+
+    @staticmethod
+    def _load_options(columns: Optional[Sequence[str]], load_products: bool) -> list:
+        options = [
+            selectinload(Receipt.products)
+            if load_products
+            else raiseload(Receipt.products)
+        ]
+        if columns is not None:
+            # Owner and version are always needed for access checks and ETags
+            loaded = {*columns, "user_id", "updated_at"}
+            options.append(load_only(*(getattr(Receipt, name) for name in loaded)))
+        return options
+
+    @staticmethod
+    def _build_filters(
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        min_total: Optional[float] = None,
+        payment_type: Optional[PaymentType] = None,
+    ) -> list:
         filters = []
 
         if start_date:
@@ -96,13 +566,4 @@ class ReceiptRepository:
         if payment_type:
             filters.append(Receipt.payment_type == payment_type)
 
-        # Apply all filters at once
-        if filters:
-            query = query.where(and_(*filters))
-
-        # Apply pagination
-        query = query.offset(skip).limit(limit)
-
-        result = await self.session.execute(query)
-
-        return result.scalars().all()
+        return filters
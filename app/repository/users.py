@@ -4,7 +4,9 @@ from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.db.models.receipt import UserReceiptCounter
 from app.db.models.user import User
+from app.db.sharding import assign_shard_id
 
 
 class BaseUserRepository(ABC):
@@ -22,6 +24,14 @@ class BaseUserRepository(ABC):
     async def get_by_id(self, user_id: int) -> User | None:
         ...
 
+    @abstractmethod
+    async def get_by_email(self, email: str) -> User | None:
+        ...
+
+    @abstractmethod
+    async def delete(self, user: User) -> None:
+        ...
+
 
 class UserRepository(BaseUserRepository):
     def __init__(self, session: AsyncSession):
@@ -30,7 +40,13 @@ class UserRepository(BaseUserRepository):
     async def create(
         self, username: str, email: str, hashed_password: str
     ) -> User | None:
-        db_user = User(username=username, email=email, hashed_password=hashed_password)
+        db_user = User(
+            id=await assign_shard_id(self.session, "users"),
+            username=username,
+            email=email,
+            hashed_password=hashed_password,
+            receipt_counter=UserReceiptCounter(receipt_count=0),
+        )
         self.session.add(db_user)
 
         try:
@@ -53,3 +69,13 @@ class UserRepository(BaseUserRepository):
         result = await self.session.execute(query)
 
         return result.scalar_one_or_none()
+
+    async def get_by_email(self, email: str) -> User | None:
+        query = select(User).where(User.email == email)
+        result = await self.session.execute(query)
+
+        return result.scalar_one_or_none()
+
+    async def delete(self, user: User) -> None:
+        await self.session.delete(user)
+        await self.session.commit()
@@ -0,0 +1,43 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.base import database_now
+from app.repository.archive import ReceiptArchiveRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ReceiptArchiveService:
+    def __init__(self, session: AsyncSession):
+        self.repository = ReceiptArchiveRepository(session)
+
+    async def archive_older_than(
+        self,
+        max_age: timedelta,
+        batch_size: int = 500,
+        pause: float = 0.1,
+        max_batches: int | None = None,
+    ) -> int:
+        """Move receipts older than ``max_age`` to the archive in batches.
+
+        Every batch is its own short transaction, followed by ``pause`` seconds
+        of sleep so the archiver does not starve live traffic.
+        """
+        cutoff = await database_now(self.repository.session) - max_age
+        archived = 0
+        batches = 0
+
+        while max_batches is None or batches < max_batches:
+            count = await self.repository.archive_batch(cutoff, batch_size)
+            archived += count
+            batches += 1
+            logger.info("Archived %s receipts (%s total)", count, archived)
+
+            if count < batch_size:
+                break
+            await asyncio.sleep(pause)
+
+        return archived
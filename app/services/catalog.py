@@ -0,0 +1,72 @@
+from collections import OrderedDict
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repository.catalog import ProductCatalogRepository
+from app.settings.config import get_config
+
+config = get_config()
+
+
+class ProductCatalogCache:
+    """Bounded LRU mapping of (user_id, product name) to catalog id"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: OrderedDict[tuple[int, str], int] = OrderedDict()
+
+    def get(self, user_id: int, name: str) -> int | None:
+        key = (user_id, name)
+        catalog_id = self._items.get(key)
+        if catalog_id is not None:
+            self._items.move_to_end(key)
+        return catalog_id
+
+    def set(self, user_id: int, name: str, catalog_id: int) -> None:
+        self._items[(user_id, name)] = catalog_id
+        self._items.move_to_end((user_id, name))
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+catalog_cache = ProductCatalogCache(max_size=config.PRODUCT_CATALOG_CACHE_SIZE)
+
+
+class ProductCatalogService:
+    def __init__(self, session: AsyncSession):
+        self.repository = ProductCatalogRepository(session)
+        # Upserted in the current transaction, cached once it has committed
+        self._uncommitted: list[tuple[int, str, int]] = []
+
+    async def resolve_ids(self, user_id: int, names: list[str]) -> dict[str, int]:
+        """Map product names to catalog ids, upserting names not seen before.
+
+        Call ``cache_committed`` after committing the transaction.
+        """
+        catalog_ids = {}
+        missing = []
+
+        for name in dict.fromkeys(names):
+            catalog_id = catalog_cache.get(user_id, name)
+            if catalog_id is None:
+                missing.append(name)
+            else:
+                catalog_ids[name] = catalog_id
+
+        if missing:
+            upserted = await self.repository.upsert(user_id, missing)
+            self._uncommitted.extend(
+                (user_id, name, catalog_id) for name, catalog_id in upserted.items()
+            )
+            catalog_ids.update(upserted)
+
+        return catalog_ids
+
+    def cache_committed(self) -> None:
+        """Cache the ids upserted by the transaction that just committed"""
+        for user_id, name, catalog_id in self._uncommitted:
+            catalog_cache.set(user_id, name, catalog_id)
+        self._uncommitted.clear()
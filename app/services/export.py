@@ -0,0 +1,319 @@
+import json
+import logging
+import os
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.base import database_now
+from app.repository.archive import unpack_receipt
+from app.repository.export import ReceiptExportRepository
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is an optional dependency
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("parquet", "arrow")
+# Receipt ids of all shards interleave, so every shard keeps its own watermark
+WATERMARK_FILE = "_watermark-{shard}.json"
+# Written before exports were keyed by shard, only ever by shard 0
+LEGACY_WATERMARK_FILE = "_watermark.json"
+# Partitions written to at once; receipts arrive roughly in day order
+MAX_OPEN_WRITERS = 4
+
+RECEIPT_COLUMNS = (
+    "id",
+    "user_id",
+    "payment_type",
+    "payment_amount",
+    "total",
+    "rest",
+    "created_at",
+    "updated_at",
+)
+
+
+def export_schemas() -> tuple["pa.Schema", "pa.Schema"]:
+    amount = pa.decimal128(10, 2)
+    timestamp = pa.timestamp("us")
+    receipts = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("user_id", pa.int64()),
+            ("payment_type", pa.string()),
+            ("payment_amount", amount),
+            ("total", amount),
+            ("rest", amount),
+            ("created_at", timestamp),
+            ("updated_at", timestamp),
+        ]
+    )
+    products = pa.schema(
+        [
+            ("receipt_id", pa.int64()),
+            ("user_id", pa.int64()),
+            ("line", pa.int32()),
+            # Archived receipts do not keep product ids
+            ("product_id", pa.int64()),
+            ("name", pa.string()),
+            ("price", amount),
+            ("quantity", amount),
+            ("total", amount),
+            ("created_at", timestamp),
+        ]
+    )
+    return receipts, products
+
+
+@dataclass
+class ExportResult:
+    receipts: int = 0
+    products: int = 0
+    files: int = 0
+    last_receipt_id: int | None = None
+
+
+class _PartitionedWriter:
+    """Writes a dataset as ``<root>/date=YYYY-MM-DD/part-<run>-<n>.<format>``.
+
+    Files are written under a hidden name, which dataset readers skip, and
+    only made visible by ``publish`` once the whole run has succeeded.
+    """
+
+    def __init__(self, root: Path, schema: "pa.Schema", file_format: str, run: str):
+        self.root = root
+        self.schema = schema
+        self.file_format = file_format
+        self.run = run
+        self._writers = OrderedDict()
+        self._file_counts = defaultdict(int)
+        self._written = []
+
+    def write(self, day: str, columns: dict[str, list]) -> None:
+        writer = self._writers.get(day)
+        if writer is None:
+            writer = self._open(day)
+        self._writers.move_to_end(day)
+
+        batch = pa.record_batch(
+            [columns[name] for name in self.schema.names], schema=self.schema
+        )
+        writer.write_batch(batch)
+
+    def close(self) -> None:
+        while self._writers:
+            _, writer = self._writers.popitem(last=False)
+            writer.close()
+
+    def publish(self) -> int:
+        for hidden in self._written:
+            hidden.rename(hidden.with_name(hidden.name[1:]))
+        return len(self._written)
+
+    def discard(self) -> None:
+        self.close()
+        for hidden in self._written:
+            hidden.unlink(missing_ok=True)
+
+    def _open(self, day: str):
+        if len(self._writers) >= MAX_OPEN_WRITERS:
+            _, oldest = self._writers.popitem(last=False)
+            oldest.close()
+
+        directory = self.root / f"date={day}"
+        directory.mkdir(parents=True, exist_ok=True)
+        self._file_counts[day] += 1
+        path = directory / (
+            f".part-{self.run}-{self._file_counts[day]}.{self.file_format}"
+        )
+        self._written.append(path)
+
+        if self.file_format == "parquet":
+            writer = pq.ParquetWriter(path, self.schema)
+        else:
+            writer = ipc.new_file(path, self.schema)
+        self._writers[day] = writer
+        return writer
+
+
+class ReceiptExportService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.repository = ReceiptExportRepository(session)
+        # Product lines of one receipt may be split across stream batches
+        self._last_receipt_id = None
+        self._line = 0
+
+    async def export(
+        self,
+        output_dir: Path,
+        file_format: str = "parquet",
+        batch_size: int = 10_000,
+        settle: timedelta = timedelta(minutes=5),
+        shard: int = 0,
+    ) -> ExportResult:
+        """Export receipts and products created since the last run.
+
+        The session must belong to ``shard``. Every shard has its own
+        watermark and file names, so all shards can export into one directory.
+
+        Receipts newer than ``settle`` by the database clock are left for the
+        next run, so that ids handed out by transactions still in flight are
+        not skipped. This relies on receipt ids growing with creation time,
+        which app.db.sharding ensures, give or take the clock differences
+        between workers that ``settle`` must cover. The watermark only moves
+        after every file has been written.
+        """
+        if pa is None:
+            raise RuntimeError("Install the 'export' extra (pyarrow) to export")
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {file_format}")
+
+        watermark = self._read_watermark(output_dir, shard)
+        after_id = watermark.get("last_receipt_id") or 0
+        result = ExportResult(last_receipt_id=after_id or None)
+
+        await self._use_snapshot()
+        settled_before = await database_now(self.session) - settle
+        upto_id = await self.repository.get_upper_bound(settled_before)
+        if upto_id is None or upto_id <= after_id:
+            return result
+
+        receipts_schema, products_schema = export_schemas()
+        run = f"shard{shard}-{after_id + 1}-{upto_id}"
+        receipts = _PartitionedWriter(
+            output_dir / "receipts", receipts_schema, file_format, run
+        )
+        products = _PartitionedWriter(
+            output_dir / "products", products_schema, file_format, run
+        )
+
+        try:
+            async for rows in self.repository.stream_archived(
+                after_id, upto_id, batch_size
+            ):
+                self._write_archived(rows, receipts, products, result)
+                logger.info("Exported %s archived receipts", result.receipts)
+            async for rows in self.repository.stream_receipt_lines(
+                after_id, upto_id, batch_size
+            ):
+                self._write_lines(rows, receipts, products, result)
+                logger.info("Exported %s receipts", result.receipts)
+            receipts.close()
+            products.close()
+        except BaseException:
+            receipts.discard()
+            products.discard()
+            raise
+
+        result.files = receipts.publish() + products.publish()
+        result.last_receipt_id = upto_id
+        self._write_watermark(output_dir, shard, upto_id)
+        return result
+
+    async def _use_snapshot(self) -> None:
+        # One snapshot for the whole run: receipts moving to the archive
+        # mid-export are neither missed nor exported twice
+        if self.session.bind.dialect.name == "postgresql":
+            await self.session.connection(
+                execution_options={"isolation_level": "REPEATABLE READ"}
+            )
+
+    def _write_lines(self, rows, receipts, products, result: ExportResult) -> None:
+        receipt_columns = defaultdict(lambda: defaultdict(list))
+        product_columns = defaultdict(lambda: defaultdict(list))
+
+        for row in rows:
+            day = row.created_at.date().isoformat()
+            if row.id != self._last_receipt_id:
+                self._last_receipt_id = row.id
+                self._line = 0
+                columns = receipt_columns[day]
+                for name in RECEIPT_COLUMNS:
+                    columns[name].append(getattr(row, name))
+                columns["payment_type"][-1] = row.payment_type.value
+                result.receipts += 1
+
+            if row.product_id is None:
+                continue
+            columns = product_columns[day]
+            columns["receipt_id"].append(row.id)
+            columns["user_id"].append(row.user_id)
+            columns["line"].append(self._line)
+            columns["product_id"].append(row.product_id)
+            columns["name"].append(row.name)
+            columns["price"].append(row.price)
+            columns["quantity"].append(row.quantity)
+            columns["total"].append(row.product_total)
+            columns["created_at"].append(row.created_at)
+            self._line += 1
+            result.products += 1
+
+        self._flush(receipt_columns, receipts)
+        self._flush(product_columns, products)
+
+    def _write_archived(self, rows, receipts, products, result: ExportResult) -> None:
+        receipt_columns = defaultdict(lambda: defaultdict(list))
+        product_columns = defaultdict(lambda: defaultdict(list))
+
+        for row in rows:
+            receipt = unpack_receipt(row)
+            day = receipt.created_at.date().isoformat()
+            columns = receipt_columns[day]
+            for name in RECEIPT_COLUMNS:
+                columns[name].append(getattr(receipt, name))
+            columns["payment_type"][-1] = receipt.payment_type.value
+            result.receipts += 1
+
+            columns = product_columns[day]
+            for line, product in enumerate(receipt.products):
+                columns["receipt_id"].append(receipt.id)
+                columns["user_id"].append(receipt.user_id)
+                columns["line"].append(line)
+                columns["product_id"].append(None)
+                columns["name"].append(product.name)
+                columns["price"].append(product.price)
+                columns["quantity"].append(product.quantity)
+                columns["total"].append(product.total)
+                columns["created_at"].append(receipt.created_at)
+                result.products += 1
+
+        self._flush(receipt_columns, receipts)
+        self._flush(product_columns, products)
+
+    @staticmethod
+    def _flush(partitions: dict, writer: _PartitionedWriter) -> None:
+        for day, columns in partitions.items():
+            if columns:
+                writer.write(day, columns)
+
+    @staticmethod
+    def _read_watermark(output_dir: Path, shard: int) -> dict:
+        path = output_dir / WATERMARK_FILE.format(shard=shard)
+        if not path.exists() and shard == 0:
+            path = output_dir / LEGACY_WATERMARK_FILE
+        if not path.exists():
+            return {}
+        return json.loads(path.read_text())
+
+    @staticmethod
+    def _write_watermark(output_dir: Path, shard: int, last_receipt_id: int) -> None:
+        path = output_dir / WATERMARK_FILE.format(shard=shard)
+        hidden = path.with_name(f".{path.name}.tmp")
+        hidden.write_text(
+            json.dumps(
+                {
+                    "last_receipt_id": last_receipt_id,
+                    "exported_at": datetime.now().isoformat(),
+                }
+            )
+        )
+        os.replace(hidden, path)
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.base import database_now
+from app.db.models.purge import PurgeJob, PurgeKind, PurgeStatus
+from app.repository.purge import PurgeRepository
+from app.settings.config import get_config
+
+logger = logging.getLogger(__name__)
+config = get_config()
+
+
+class PurgeService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.repository = PurgeRepository(session)
+
+    async def start_user_purge(self, user_id: int) -> PurgeJob:
+        return await self.repository.create_job(PurgeKind.USER, user_id=user_id)
+
+    async def start_retention_purge(self, max_age: timedelta) -> PurgeJob:
+        cutoff = await database_now(self.session) - max_age
+        return await self.repository.create_job(PurgeKind.RETENTION, cutoff=cutoff)
+
+    async def get_jobs(self, unfinished_only: bool = False) -> list[PurgeJob]:
+        return await self.repository.get_jobs(unfinished_only)
+
+    async def run(
+        self,
+        job_id: int,
+        chunk_size: int = config.PURGE_CHUNK_SIZE,
+        pause: float = config.PURGE_PAUSE_SECONDS,
+    ) -> PurgeJob:
+        """Run (or resume) a purge job until nothing is left to delete.
+
+        Every chunk is its own transaction that also carries the job's
+        progress, so an interrupted job resumes from whatever is left in
+        the tables without repeating or losing work.
+        """
+        job = await self.repository.get_job(job_id)
+        if job is None:
+            raise ValueError(f"Purge job {job_id} does not exist")
+        if job.status == PurgeStatus.DONE:
+            return job
+
+        job.status = PurgeStatus.RUNNING
+        job.error = None
+        await self.session.commit()
+
+        try:
+            if job.kind == PurgeKind.USER:
+                await self._purge_user(job, chunk_size, pause)
+            else:
+                await self._purge_retention(job, chunk_size, pause)
+        except Exception as e:
+            await self.session.rollback()
+            job.status = PurgeStatus.FAILED
+            job.error = str(e)
+            await self.session.commit()
+            logger.exception("Purge job %s failed", job.id)
+            raise
+
+        job.status = PurgeStatus.DONE
+        job.finished_at = await database_now(self.session)
+        await self.session.commit()
+        return job
+
+    async def _purge_user(self, job: PurgeJob, chunk_size: int, pause: float) -> None:
+        user_id = job.user_id
+
+        async def receipts_chunk() -> int:
+            receipts, products = await self.repository.delete_user_receipts_chunk(
+                user_id, chunk_size
+            )
+            job.deleted_receipts += receipts
+            job.deleted_products += products
+            return receipts
+
+        async def archived_chunk() -> int:
+            archived = await self.repository.delete_user_archived_chunk(
+                user_id, chunk_size
+            )
+            job.deleted_archived += archived
+            return archived
+
+        async def catalog_chunk() -> int:
+            return await self.repository.delete_user_catalog_chunk(user_id, chunk_size)
+
+        for step in (receipts_chunk, archived_chunk, catalog_chunk):
+            await self._run_chunks(job, step, chunk_size, pause)
+
+        await self.repository.delete_user(user_id)
+        await self.session.commit()
+
+    async def _purge_retention(
+        self, job: PurgeJob, chunk_size: int, pause: float
+    ) -> None:
+        cutoff = job.cutoff
+
+        async def receipts_chunk() -> int:
+            receipts, products = await self.repository.delete_old_receipts_chunk(
+                cutoff, chunk_size
+            )
+            job.deleted_receipts += receipts
+            job.deleted_products += products
+            return receipts
+
+        async def archived_chunk() -> int:
+            archived = await self.repository.delete_old_archived_chunk(
+                cutoff, chunk_size
+            )
+            job.deleted_archived += archived
+            return archived
+
+        # Tombstones of earlier purges that syncing clients no longer need
+        tombstone_cutoff = await database_now(self.session) - timedelta(
+            days=config.RECEIPT_TOMBSTONE_RETENTION_DAYS
+        )
+
+        async def tombstones_chunk() -> int:
+            return await self.repository.delete_old_tombstones_chunk(
+                tombstone_cutoff, chunk_size
+            )
+
+        for step in (receipts_chunk, archived_chunk, tombstones_chunk):
+            await self._run_chunks(job, step, chunk_size, pause)
+
+    async def _run_chunks(self, job: PurgeJob, step, chunk_size: int, pause: float):
+        while True:
+            deleted = await step()
+            await self.session.commit()
+            logger.info(
+                "Purge job %s: %s receipts, %s products, %s archived deleted",
+                job.id,
+                job.deleted_receipts,
+                job.deleted_products,
+                job.deleted_archived,
+            )
+
+            if deleted < chunk_size:
+                break
+            await asyncio.sleep(pause)
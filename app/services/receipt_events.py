@@ -0,0 +1,267 @@
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable
+
+import asyncpg
+
+from app.db.config import DBConfig
+from app.settings.config import get_config
+
+logger = logging.getLogger(__name__)
+config = get_config()
+
+Deliver = Callable[[int, int, str], None]
+# Called when events may have been missed
+Gap = Callable[[], None]
+
+
+@dataclass(eq=False)
+class Subscription:
+    user_id: int
+    queue: asyncio.Queue
+    # Set when the queue overflowed; the client has to resume from the database
+    lagging: bool = False
+
+
+class ReceiptEventBackend(ABC):
+    """Carries published events to the brokers of every worker, this one included"""
+
+    @abstractmethod
+    async def start(self, deliver: Deliver, gap: Gap) -> None:
+        ...
+
+    @abstractmethod
+    async def publish(self, user_id: int, receipt_id: int, data: str) -> None:
+        ...
+
+    @abstractmethod
+    async def publish_gap(self) -> None:
+        """Make every worker call its ``gap``"""
+
+
+class LocalBackend(ReceiptEventBackend):
+    """Delivers to this worker only, for single-process deployments"""
+
+    async def start(self, deliver: Deliver, gap: Gap) -> None:
+        self._deliver = deliver
+        self._gap = gap
+
+    async def publish(self, user_id: int, receipt_id: int, data: str) -> None:
+        self._deliver(user_id, receipt_id, data)
+
+    async def publish_gap(self) -> None:
+        self._gap()
+
+
+class PostgresNotifyBackend(ReceiptEventBackend):
+    """Fans events out to all workers with LISTEN/NOTIFY on one database.
+
+    A single dedicated connection per worker both listens and notifies, so
+    open streams never hold pooled connections. Payloads are limited to
+    8000 bytes by PostgreSQL, which the receipt summaries stay well below.
+
+    A dropped connection is reopened in the background. Events sent in the
+    meantime are lost, so ``gap`` is called when it drops and again once it
+    is back. Publishing fails at once while the connection is down, and
+    after ``timeout`` seconds on a connection that does not answer, so that
+    requests never wait for the listener. When this worker could not send an
+    event, every worker is told about the gap once the connection works again.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        channel: str = "receipt_events",
+        retry_seconds: float = 1,
+        timeout: float = 5,
+    ):
+        self.dsn = dsn
+        self.channel = channel
+        self.retry_seconds = retry_seconds
+        self.timeout = timeout
+        self._connection: asyncpg.Connection | None = None
+        self._lock = asyncio.Lock()
+        self._reconnecting: asyncio.Task | None = None
+        # An event of this worker was not sent, the others have not been told
+        self._unsent = False
+
+    async def start(self, deliver: Deliver, gap: Gap) -> None:
+        self._deliver = deliver
+        self._gap = gap
+        await self._connect()
+
+    async def _connect(self) -> None:
+        def on_notification(connection, pid, channel, payload):
+            event = json.loads(payload)
+            if event is None:
+                self._gap()
+            else:
+                self._deliver(*event)
+
+        def on_termination(connection):
+            logger.warning("Receipt events listener disconnected")
+            self._gap()
+            self._reconnecting = asyncio.ensure_future(self._reconnect())
+
+        connection = await asyncpg.connect(self.dsn)
+        try:
+            await connection.add_listener(self.channel, on_notification)
+        except Exception:
+            connection.terminate()
+            raise
+        connection.add_termination_listener(on_termination)
+        # Only a listening connection replaces the closed one
+        self._connection = connection
+
+    async def _reconnect(self) -> None:
+        while True:
+            try:
+                await self._connect()
+                break
+            except Exception:
+                logger.warning(
+                    "Could not reconnect the receipt events listener", exc_info=True
+                )
+                await asyncio.sleep(self.retry_seconds)
+        logger.info("Reconnected the receipt events listener")
+        # Whatever was sent while it was down is lost
+        self._gap()
+        if self._unsent:
+            try:
+                await self.publish_gap()
+            except Exception:
+                logger.exception("Could not announce unsent receipt events")
+
+    async def publish(self, user_id: int, receipt_id: int, data: str) -> None:
+        await self._notify([user_id, receipt_id, data])
+
+    async def publish_gap(self) -> None:
+        await self._notify(None)
+
+    async def _notify(self, event: list | None) -> None:
+        if self._connection.is_closed():
+            # Not waiting for the reconnect; the others hear of it afterwards
+            self._unsent = True
+            raise ConnectionError("The receipt events connection is closed")
+
+        events = [None, event] if self._unsent and event is not None else [event]
+        try:
+            await asyncio.wait_for(self._send(events), self.timeout)
+        except Exception:
+            self._unsent = True
+            raise
+        self._unsent = False
+
+    async def _send(self, events: list) -> None:
+        # One query at a time on the connection
+        async with self._lock:
+            for payload in events:
+                await self._connection.execute(
+                    "SELECT pg_notify($1, $2)", self.channel, json.dumps(payload)
+                )
+
+
+class ReceiptEventBroker:
+    """In-process fan-out of new receipts to the streams of their owners.
+
+    Every subscription is a bounded queue; idle subscribers cost nothing but
+    the queue and the task serving them. A subscriber that falls more than
+    the queue size behind is marked lagging and dropped, and reconnects with
+    ``Last-Event-ID`` to catch up from the database.
+    """
+
+    def __init__(self, backend: ReceiptEventBackend, queue_size: int = 100):
+        self.backend = backend
+        self.queue_size = queue_size
+        self._subscriptions: dict[int, set[Subscription]] = {}
+        self._listeners: list[Deliver] = []
+        self._gap_listeners: list[Gap] = []
+        self._started: asyncio.Task | None = None
+
+    async def subscribe(self, user_id: int) -> Subscription:
+        await self.start()
+        subscription = Subscription(user_id, asyncio.Queue(self.queue_size))
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.user_id, set())
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            self._subscriptions.pop(subscription.user_id, None)
+
+    async def publish(self, user_id: int, receipt_id: int, data: str) -> None:
+        """Announce a committed receipt; failures are logged, never raised"""
+        try:
+            await self.start()
+            await self.backend.publish(user_id, receipt_id, data)
+        except Exception:
+            logger.exception("Could not publish receipt %s", receipt_id)
+
+    def add_listener(self, listener: Deliver) -> None:
+        """Call ``listener`` with every event this worker receives, for any user"""
+        self._listeners.append(listener)
+
+    def add_gap_listener(self, listener: Gap) -> None:
+        """Call ``listener`` whenever events may have been missed"""
+        self._gap_listeners.append(listener)
+
+    async def announce_gap(self) -> None:
+        """Tell every worker that receipts were created without events"""
+        await self.start()
+        await self.backend.publish_gap()
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def _deliver(self, user_id: int, receipt_id: int, data: str) -> None:
+        for listener in self._listeners:
+            listener(user_id, receipt_id, data)
+        for subscription in list(self._subscriptions.get(user_id, ())):
+            try:
+                subscription.queue.put_nowait((receipt_id, data))
+            except asyncio.QueueFull:
+                subscription.lagging = True
+                self.unsubscribe(subscription)
+
+    def _gap(self) -> None:
+        for listener in self._gap_listeners:
+            listener()
+        # Streams resume from the database, as when they lag behind
+        for subscriptions in list(self._subscriptions.values()):
+            for subscription in list(subscriptions):
+                subscription.lagging = True
+                self.unsubscribe(subscription)
+
+    async def start(self) -> None:
+        # The first caller starts the backend, concurrent callers wait for it
+        if self._started is None:
+            self._started = asyncio.ensure_future(
+                self.backend.start(self._deliver, self._gap)
+            )
+        try:
+            await asyncio.shield(self._started)
+        except Exception:
+            self._started = None
+            raise
+
+
+def create_backend(name: str) -> ReceiptEventBackend:
+    if name == "local":
+        return LocalBackend()
+    if name == "postgres":
+        url = DBConfig().shard_urls[0]
+        return PostgresNotifyBackend(
+            url.replace("postgresql+asyncpg://", "postgresql://")
+        )
+    raise ValueError(f"Unknown receipt event backend: {name}")
+
+
+receipt_events = ReceiptEventBroker(
+    create_backend(config.RECEIPT_EVENTS_BACKEND),
+    queue_size=config.RECEIPT_STREAM_QUEUE_SIZE,
+)
@@ -0,0 +1,282 @@
+"""In-process Bloom filter of existing receipt ids.
+
+The public receipt view takes guessable ids and needs no login, so scrapers
+can send it any number of ids that do not exist. The filter answers most of
+those with a 404 without a query: an id it has never seen certainly does not
+exist, while an id it has seen (or, rarely, a false positive) is looked up
+as before.
+
+Every worker builds its own filter in the background when it starts, from
+keyset batches of the receipt ids on every shard, archive included. Until
+then all ids are looked up. Receipts created by the worker are added
+directly, and those of other processes arrive as receipt events, so the
+filter needs the events backend that reaches all of them
+(``RECEIPT_EVENTS_BACKEND=postgres``). Whenever events may have been
+missed, e.g. while the listener reconnected, the filter stops answering
+until it is rebuilt. Bloom filters cannot forget, so the filter is also
+rebuilt periodically to drop purged ids and to grow with the receipts.
+"""
+import asyncio
+import logging
+import math
+import time
+
+from app.db.main import shards
+from app.db.sharding import ShardedDatabase
+from app.repository.archive import ReceiptArchiveRepository
+from app.repository.receipts import ReceiptRepository
+from app.services.receipt_events import receipt_events
+from app.settings.config import get_config
+
+logger = logging.getLogger(__name__)
+config = get_config()
+
+MASK_64 = (1 << 64) - 1
+
+
+class BloomFilter:
+    """Set of integers that may report false positives, but no false negatives.
+
+    Sized for ``capacity`` items at ``false_positive_rate``; past that the
+    rate rises. Positions come from double hashing the two halves of a
+    splitmix64 mix of the value.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.capacity = max(1, capacity)
+        self.size = max(
+            8,
+            math.ceil(
+                -self.capacity * math.log(false_positive_rate) / math.log(2) ** 2
+            ),
+        )
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: int):
+        z = (value + 0x9E3779B97F4A7C15) & MASK_64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK_64
+        z ^= z >> 31
+        first, step = z & 0xFFFFFFFF, (z >> 32) | 1
+        for i in range(self.hash_count):
+            yield (first + i * step) % self.size
+
+    def add(self, value: int) -> None:
+        added = False
+        for position in self._positions(value):
+            mask = 1 << (position & 7)
+            if not self._bits[position >> 3] & mask:
+                self._bits[position >> 3] |= mask
+                added = True
+        # Values already present (or indistinguishable from them) are not counted
+        if added:
+            self.count += 1
+
+    def __contains__(self, value: int) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+    @property
+    def expected_false_positive_rate(self) -> float:
+        return (
+            1 - math.exp(-self.hash_count * self.count / self.size)
+        ) ** self.hash_count
+
+    def fill_ratio(self) -> float:
+        return int.from_bytes(self._bits, "little").bit_count() / self.size
+
+
+class ReceiptIdFilter:
+    """Keeps a ``BloomFilter`` of receipt ids built, updated and rebuilt"""
+
+    def __init__(
+        self,
+        shards: ShardedDatabase,
+        enabled: bool,
+        capacity: int,
+        false_positive_rate: float,
+        rebuild_seconds: float,
+        include_archive: bool,
+        batch_size: int = 10_000,
+    ):
+        self.shards = shards
+        self.enabled = enabled
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.rebuild_seconds = rebuild_seconds
+        self.include_archive = include_archive
+        self.batch_size = batch_size
+        self.rejected = 0
+        self.passed = 0
+        self.false_positives = 0
+        self.builds = 0
+        self.last_build_seconds: float | None = None
+        self._filter: BloomFilter | None = None
+        # The filter being built, so receipts created meanwhile go into both
+        self._building: BloomFilter | None = None
+        self._task: asyncio.Task | None = None
+        # Events missed so far; a build that saw one start may lack receipts
+        self._gaps = 0
+        self._rebuild = asyncio.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._filter is not None
+
+    async def start(self) -> None:
+        """Build in the background and keep up with new receipts, if enabled"""
+        if not self.enabled or self._task is not None:
+            return
+        receipt_events.add_listener(self._on_event)
+        receipt_events.add_gap_listener(self._on_gap)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def add(self, receipt_id: int) -> None:
+        for bloom_filter in (self._filter, self._building):
+            if bloom_filter is not None:
+                bloom_filter.add(receipt_id)
+
+    def might_exist(self, receipt_id: int) -> bool:
+        """False only for ids that certainly do not exist"""
+        if self._filter is None:
+            return True
+        if receipt_id in self._filter:
+            self.passed += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def record_false_positive(self) -> None:
+        """Count an id that passed ``might_exist`` but was not found"""
+        if self._filter is not None:
+            self.false_positives += 1
+
+    async def build(self) -> None:
+        started = time.perf_counter()
+        gaps = self._gaps
+        # Room for twice the receipts of the last build, so it rarely fills up
+        current = self._filter.count if self._filter else 0
+        building = BloomFilter(
+            max(self.capacity, 2 * current), self.false_positive_rate
+        )
+        self._building = building
+        try:
+            for shard in range(len(self.shards.shards)):
+                await self._scan(shard, ReceiptRepository, building)
+                if self.include_archive:
+                    await self._scan(shard, ReceiptArchiveRepository, building)
+        finally:
+            self._building = None
+
+        if self._gaps != gaps:
+            logger.info("Receipt events were missed during the build, building again")
+            return
+        self._filter = building
+        self.builds += 1
+        self.last_build_seconds = time.perf_counter() - started
+        logger.info(
+            "Built the receipt id filter: %s ids, %.1f KiB, %.1f s",
+            building.count,
+            building.memory_bytes / 1024,
+            self.last_build_seconds,
+        )
+
+    async def _scan(self, shard: int, repository_class, building: BloomFilter) -> None:
+        after_id = -1
+        while True:
+            async with self.shards.get_session(shard, autocommit=True) as session:
+                ids = await repository_class(session).get_ids_after(
+                    after_id, self.batch_size
+                )
+            for receipt_id in ids:
+                building.add(receipt_id)
+            if len(ids) < self.batch_size:
+                return
+            after_id = ids[-1]
+            # Let requests run between batches
+            await asyncio.sleep(0)
+
+    async def _run(self) -> None:
+        while True:
+            self._rebuild.clear()
+            try:
+                # Listen first, so receipts created during the scan are not missed
+                await receipt_events.start()
+                await self.build()
+            except Exception:
+                logger.exception("Could not build the receipt id filter")
+                await asyncio.sleep(min(self.rebuild_seconds, 60))
+                continue
+            if not self.ready or self._filter.count > self._filter.capacity:
+                # Missed events during the build, or outgrown during it (the
+                # next one is sized from its count)
+                continue
+            try:
+                await asyncio.wait_for(self._rebuild.wait(), self.rebuild_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def _on_event(self, user_id: int, receipt_id: int, data: str) -> None:
+        self.add(receipt_id)
+
+    def _on_gap(self) -> None:
+        # Receipts created elsewhere may be missing, so look up every id again
+        self._filter = None
+        self._gaps += 1
+        self._rebuild.set()
+
+    def stats(self) -> dict:
+        stats = {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "builds": self.builds,
+            # Times receipt events were missed and the filter had to be rebuilt
+            "gaps": self._gaps,
+            "last_build_seconds": self.last_build_seconds,
+            "rejected": self.rejected,
+            "passed": self.passed,
+            "false_positives": self.false_positives,
+            # Share of ids that do not exist which still reached the database
+            "observed_false_positive_rate": (
+                round(self.false_positives / (self.false_positives + self.rejected), 6)
+                if self.false_positives + self.rejected
+                else None
+            ),
+        }
+        if self._filter is not None:
+            stats.update(
+                ids=self._filter.count,
+                capacity=self._filter.capacity,
+                memory_bytes=self._filter.memory_bytes,
+                bits=self._filter.size,
+                hash_count=self._filter.hash_count,
+                fill_ratio=round(self._filter.fill_ratio(), 6),
+                expected_false_positive_rate=round(
+                    self._filter.expected_false_positive_rate, 6
+                ),
+            )
+        return stats
+
+
+receipt_id_filter = ReceiptIdFilter(
+    shards,
+    enabled=config.RECEIPT_ID_FILTER_ENABLED,
+    capacity=config.RECEIPT_ID_FILTER_CAPACITY,
+    false_positive_rate=config.RECEIPT_ID_FILTER_FALSE_POSITIVE_RATE,
+    rebuild_seconds=config.RECEIPT_ID_FILTER_REBUILD_SECONDS,
+    include_archive=config.RECEIPT_ARCHIVE_READ_THROUGH,
+)
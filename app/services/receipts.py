@@ -1,58 +1,470 @@
+import pickle
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import Optional
+from typing import Iterable, NamedTuple, Optional
 
 from fastapi import Depends
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.schemas.receipt import ReceiptCreate, ReceiptFilter, ReceiptResponse
+from app.api.schemas.receipt import (
+    ReceiptCreate,
+    ReceiptFilter,
+    ReceiptResponse,
+    ReceiptSummaryResponse,
+)
 from app.db.main import get_db
-from app.db.models.receipt import PaymentType, Product, Receipt
+from app.db.models.base import database_now
+from app.db.models.receipt import PaymentType, Product, ProductLine, Receipt
 from app.repository.receipts import ReceiptRepository
+from app.services.catalog import ProductCatalogService
+from app.services.receipt_events import receipt_events
+from app.services.receipt_filter import receipt_id_filter
+from app.settings.config import get_config
+
+config = get_config()
+
+# Response fields and the receipt columns they are built from
+FIELD_COLUMNS = {
+    "id": ("id",),
+    "payment": ("payment_type", "payment_amount"),
+    "total": ("total",),
+    "rest": ("rest",),
+    "created_at": ("created_at",),
+}
+
+# Receipt fields sent to streams; products are left out to keep events small
+EVENT_FIELDS = frozenset({"id", "payment", "total", "rest", "created_at"})
+
+MINOR_UNITS = 100
+# Numeric(10, 2) columns hold at most 99,999,999.99
+MAX_MINOR_UNITS = 10**10
+
+
+def to_minor_units(value: Decimal, field: str) -> int:
+    minor = value * MINOR_UNITS
+    if minor != minor.to_integral_value():
+        raise ValueError(f"{field} must have at most two decimal places")
+
+    minor = int(minor)
+    if abs(minor) >= MAX_MINOR_UNITS:
+        raise ValueError(f"{field} is out of range")
+
+    return minor
+
+
+def from_minor_units(value: int) -> Decimal:
+    return Decimal(value).scaleb(-2)
+
+
+class ReceiptTotals(NamedTuple):
+    """Amounts of a new receipt in integer minor units"""
+
+    line_totals: list[int]
+    total: int
+    payment_amount: int
+
+    @property
+    def rest(self) -> int:
+        return max(0, self.payment_amount - self.total)
+
+
+def calculate_totals(receipt_data: ReceiptCreate) -> ReceiptTotals:
+    """Compute line and receipt totals in minor units.
+
+    Raises ValueError for anything the receipts and products check constraints
+    would refuse, so that every receipt is validated the same way before
+    insert, whichever path creates it.
+    """
+    payment_amount = to_minor_units(receipt_data.payment.amount, "Payment amount")
+
+    total = 0
+    line_totals = []
+    for product in receipt_data.products:
+        price = to_minor_units(product.price, "Price")
+        quantity = to_minor_units(product.quantity, "Quantity")
+        if price < 0:
+            raise ValueError(f"Price of product '{product.name}' must not be negative")
+        if quantity <= 0:
+            raise ValueError(f"Quantity of product '{product.name}' must be positive")
+
+        line_total, remainder = divmod(price * quantity, MINOR_UNITS)
+        if remainder:
+            raise ValueError(
+                f"Total of product '{product.name}' must have at most two decimal places"
+            )
+        if line_total >= MAX_MINOR_UNITS:
+            raise ValueError(f"Total of product '{product.name}' is out of range")
+        total += line_total
+        line_totals.append(line_total)
+
+    if total >= MAX_MINOR_UNITS:
+        raise ValueError("Receipt total is out of range")
+    if payment_amount < total:
+        raise ValueError(
+            "Invalid payment amount. Please check the total and payment amount values."
+        )
+
+    return ReceiptTotals(line_totals, total, payment_amount)
+
+
+class CachedReceipt(NamedTuple):
+    """Plain copy of a listed receipt; columns that were not loaded are None"""
+
+    id: int
+    user_id: int
+    payment_type: PaymentType | None
+    payment_amount: Decimal | None
+    total: Decimal | None
+    rest: Decimal | None
+    created_at: datetime | None
+    updated_at: datetime | None
+    products: tuple[ProductLine, ...] | None
+
+    @classmethod
+    def from_receipt(cls, receipt: Receipt) -> "CachedReceipt":
+        unloaded = inspect(receipt).unloaded
+        values = {
+            name: None if name in unloaded else getattr(receipt, name)
+            for name in cls._fields
+            if name != "products"
+        }
+        products = None
+        if "products" not in unloaded:
+            products = tuple(
+                ProductLine(
+                    product.name, product.price, product.quantity, product.total
+                )
+                for product in receipt.products
+            )
+        return cls(**values, products=products)
+
+
+class ReceiptListCache:
+    """Bounded LRU of receipt list pages.
+
+    Keys include the user's receipt list version, so a page cached before a
+    change to the list can never be returned after it; outdated pages are
+    simply evicted as they age out. Pages are kept pickled as plain tuples,
+    not as ORM objects, and bounded by their total size as well as by count.
+    """
+
+    def __init__(self, max_size: int, max_bytes: int):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[tuple, bytes] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple) -> list[CachedReceipt] | None:
+        page = self._items.get(key)
+        if page is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._items.move_to_end(key)
+        return pickle.loads(page)
+
+    def set(self, key: tuple, receipts: Iterable[Receipt]) -> None:
+        if self.max_size <= 0 or self.max_bytes <= 0:
+            return
+
+        page = pickle.dumps(
+            [CachedReceipt.from_receipt(receipt) for receipt in receipts],
+            pickle.HIGHEST_PROTOCOL,
+        )
+        if len(page) > self.max_bytes:
+            return
+
+        replaced = self._items.pop(key, None)
+        if replaced is not None:
+            self.bytes -= len(replaced)
+        self._items[key] = page
+        self.bytes += len(page)
+        while len(self._items) > self.max_size or self.bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+receipt_list_cache = ReceiptListCache(
+    max_size=config.RECEIPT_LIST_CACHE_SIZE,
+    max_bytes=config.RECEIPT_LIST_CACHE_MAX_BYTES,
+)
+
+
+class SyncWatermark(NamedTuple):
+    """Position in a user's changes: the time of the last change and its receipt id.
+
+    Clients get it as an opaque string and send it back unchanged.
+    """
+
+    changed_at: datetime
+    receipt_id: int
+
+    def encode(self) -> str:
+        value = f"{self.changed_at.isoformat()}/{self.receipt_id}"
+        return urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "SyncWatermark":
+        try:
+            value = urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+            changed_at, receipt_id = value.rsplit("/", 1)
+            return cls(datetime.fromisoformat(changed_at), int(receipt_id))
+        except ValueError:
+            raise ValueError("Invalid sync watermark")
+
+
+@dataclass
+class ReceiptChanges:
+    receipts: list[Receipt]
+    deleted: list[int]
+    watermark: SyncWatermark
+    has_more: bool
 
 
 class ReceiptService:
     def __init__(self, session: AsyncSession):
         self.repository = ReceiptRepository(session)
+        self.catalog_service = ProductCatalogService(session)
 
     async def create_receipt(
         self, user_id: int, receipt_data: ReceiptCreate
     ) -> ReceiptResponse:
-        total = sum(
-            product.price * product.quantity for product in receipt_data.products
+        totals = calculate_totals(receipt_data)
+        if len(receipt_data.products) >= config.LARGE_RECEIPT_THRESHOLD:
+            created_receipt = await self._create_large_receipt(
+                user_id, receipt_data, totals
+            )
+        else:
+            created_receipt = await self._create_receipt(user_id, receipt_data, totals)
+
+        # Both paths have committed, so streams never announce a rolled back receipt
+        self.catalog_service.cache_committed()
+        receipt_id_filter.add(created_receipt.id)
+        await receipt_events.publish(
+            user_id, created_receipt.id, self.receipt_event_data(created_receipt)
         )
-        rest = max(Decimal("0"), receipt_data.payment.amount - total)
+        return created_receipt
 
+    async def _create_receipt(
+        self, user_id: int, receipt_data: ReceiptCreate, totals: ReceiptTotals
+    ) -> Receipt:
         receipt = Receipt(
+            id=await self.repository.next_id(),
             user_id=user_id,
-            total=total,
+            total=from_minor_units(totals.total),
             payment_type=PaymentType(receipt_data.payment.type),
             payment_amount=receipt_data.payment.amount,
-            rest=rest,
+            rest=from_minor_units(totals.rest),
         )
 
+        catalog_ids = await self._resolve_catalog_ids(user_id, receipt_data)
+
         receipt.products = [
             Product(
-                name=product.name,
+                name=None if product.name in catalog_ids else product.name,
+                catalog_id=catalog_ids.get(product.name),
                 price=product.price,
                 quantity=product.quantity,
-                total=product.price * product.quantity,
+                total=from_minor_units(line_total),
             )
-            for product in receipt_data.products
+            for product, line_total in zip(receipt_data.products, totals.line_totals)
         ]
 
+        await self.repository.increment_user_receipt_count(user_id)
         created_receipt = await self.repository.create(receipt)
         return created_receipt
 
-    async def get_receipt(self, receipt_id: int, user_id: int) -> Optional[Receipt]:
-        receipt = await self.repository.get_by_id(receipt_id)
+    async def _create_large_receipt(
+        self, user_id: int, receipt_data: ReceiptCreate, totals: ReceiptTotals
+    ) -> Receipt:
+        """Create a receipt with many lines without building ORM products.
+
+        Products are bulk inserted instead of being built, flushed and
+        reloaded as ORM objects.
+        """
+        receipt = Receipt(
+            id=await self.repository.next_id(),
+            user_id=user_id,
+            total=from_minor_units(totals.total),
+            payment_type=PaymentType(receipt_data.payment.type),
+            payment_amount=receipt_data.payment.amount,
+            rest=from_minor_units(totals.rest),
+        )
+
+        catalog_ids = await self._resolve_catalog_ids(user_id, receipt_data)
+
+        products = [
+            {
+                "name": product.name,
+                "catalog_id": catalog_ids.get(product.name),
+                "price": product.price,
+                "quantity": product.quantity,
+                "total": from_minor_units(line_total),
+            }
+            for product, line_total in zip(receipt_data.products, totals.line_totals)
+        ]
+
+        await self.repository.increment_user_receipt_count(user_id)
+        return await self.repository.create_bulk(receipt, products)
+
+    async def _resolve_catalog_ids(
+        self, user_id: int, receipt_data: ReceiptCreate
+    ) -> dict[str, int]:
+        if not config.PRODUCT_CATALOG_ENABLED:
+            return {}
+
+        return await self.catalog_service.resolve_ids(
+            user_id, [product.name for product in receipt_data.products]
+        )
+
+    async def get_receipt(
+        self, receipt_id: int, user_id: int, fields: frozenset[str] | None = None
+    ) -> Optional[Receipt]:
+        receipt = await self.repository.get_by_id(
+            receipt_id, **self._field_kwargs(fields)
+        )
 
         if not receipt or receipt.user_id != user_id:
             return None
 
         return receipt
 
-    async def get_receipt_public(self, receipt_id: int) -> Receipt:
-        return await self.repository.get_by_id(receipt_id=receipt_id)
+    async def get_receipts(
+        self,
+        receipt_ids: list[int],
+        user_id: int,
+        fields: frozenset[str] | None = None,
+    ) -> tuple[list[Receipt], list[int]]:
+        """Return the user's receipts in the order of ``receipt_ids``, without
+        duplicates, and the ids that do not exist or belong to someone else"""
+        receipt_ids = list(dict.fromkeys(receipt_ids))
+        receipts = await self.repository.get_by_ids(
+            receipt_ids, user_id, **self._field_kwargs(fields)
+        )
+
+        by_id = {receipt.id: receipt for receipt in receipts}
+        found = [by_id[receipt_id] for receipt_id in receipt_ids if receipt_id in by_id]
+        missing = [receipt_id for receipt_id in receipt_ids if receipt_id not in by_id]
+        return found, missing
+
+    async def get_receipt_version(
+        self, receipt_id: int, user_id: int
+    ) -> Optional[datetime]:
+        version = await self.repository.get_version(receipt_id)
+
+        if not version or version[0] != user_id:
+            return None
+
+        return version[1]
+
+    async def get_receipts_after(self, user_id: int, after_id: int) -> list[Receipt]:
+        """Receipts created after ``after_id``, for streams resuming from it"""
+        return await self.repository.get_user_receipts_after(
+            user_id,
+            after_id,
+            limit=config.RECEIPT_STREAM_BACKLOG_LIMIT,
+            columns=self._field_kwargs(EVENT_FIELDS)["columns"],
+        )
+
+    async def get_changes(
+        self, user_id: int, since: SyncWatermark | None, limit: int
+    ) -> ReceiptChanges | None:
+        """Receipts changed and purged after ``since``, oldest change first.
+
+        Returns None when ``since`` is older than the tombstones and hot
+        receipts reach back, and the client has to sync from scratch. A full
+        sync (no ``since``) leaves out deletions, which it cannot need.
+        """
+        # The clock updated_at and deleted_at come from
+        now = await database_now(self.repository.session)
+        horizon = timedelta(
+            days=min(
+                config.RECEIPT_TOMBSTONE_RETENTION_DAYS,
+                config.RECEIPT_ARCHIVE_AFTER_DAYS,
+            )
+        )
+        if since is not None and since.changed_at < now - horizon:
+            return None
+
+        until = now - timedelta(seconds=config.RECEIPT_SYNC_SETTLE_SECONDS)
+        receipts = await self.repository.get_user_changes(
+            user_id, since, until, limit + 1
+        )
+        tombstones = []
+        if since is not None:
+            tombstones = await self.repository.get_user_tombstones(
+                user_id, since, until, limit + 1
+            )
+
+        changes = sorted(
+            [(receipt.updated_at, receipt.id, receipt) for receipt in receipts]
+            + [
+                (tombstone.deleted_at, tombstone.receipt_id, None)
+                for tombstone in tombstones
+            ],
+            key=lambda change: change[:2],
+        )
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        if has_more:
+            watermark = SyncWatermark(*changes[-1][:2])
+        else:
+            # Everything before ``until`` has been seen; moving up to it keeps
+            # the watermark of a quiet user from ageing past the horizon
+            watermark = SyncWatermark(until, 0)
+            if since is not None:
+                watermark = max(watermark, since)
+
+        return ReceiptChanges(
+            receipts=[receipt for _, _, receipt in changes if receipt is not None],
+            deleted=[
+                receipt_id for _, receipt_id, receipt in changes if receipt is None
+            ],
+            watermark=watermark,
+            has_more=has_more,
+        )
+
+    @staticmethod
+    def receipt_event_data(receipt: Receipt) -> str:
+        return ReceiptSummaryResponse.from_orm(receipt, EVENT_FIELDS).model_dump_json(
+            exclude_unset=True
+        )
+
+    async def get_receipt_public(self, receipt_id: int) -> Receipt | None:
+        # Ids the filter has never seen are answered without a query
+        if not receipt_id_filter.might_exist(receipt_id):
+            return None
+
+        receipt = await self.repository.get_by_id(receipt_id=receipt_id)
+        if receipt is None:
+            receipt_id_filter.record_false_positive()
+        return receipt
 
     async def get_user_receipts(
         self,
@@ -60,27 +472,86 @@ class ReceiptService:
         skip: int = 0,
         limit: int = 10,
         filters: ReceiptFilter = None,
+        fields: frozenset[str] | None = None,
     ):
-        payment_type = None
-        if filters and filters.payment_type:
-            try:
-                payment_type = PaymentType(filters.payment_type)
-            except ValueError:
-                # Handle invalid payment type
-                raise ValueError(f"Invalid payment type: {filters.payment_type}")
+        filter_kwargs = self._filter_kwargs(filters)
+
+        # Read the version before the receipts, so a page is never cached under
+        # a version older than the data it holds
+        version = await self.repository.get_user_receipts_version(user_id)
+        key = (
+            user_id,
+            version,
+            skip,
+            limit,
+            tuple(filter_kwargs.values()),
+            fields,
+        )
+        receipts = receipt_list_cache.get(key)
+        if receipts is not None:
+            return receipts
 
         receipts = await self.repository.get_user_receipts(
             user_id=user_id,
             skip=skip,
             limit=limit,
-            start_date=filters.start_date if filters else None,
-            end_date=filters.end_date if filters else None,
-            min_total=filters.min_total if filters else None,
-            payment_type=payment_type,
+            **filter_kwargs,
+            **self._field_kwargs(fields),
         )
+        receipt_list_cache.set(key, receipts)
 
         return receipts
 
+    async def count_user_receipts(
+        self, user_id: int, filters: ReceiptFilter = None
+    ) -> tuple[int, str]:
+        """Return the number of matching receipts and how it was obtained.
+
+        Unfiltered counts come straight from the per-user counter. Filtered
+        counts are exact below ``RECEIPT_COUNT_EXACT_THRESHOLD`` and a planner
+        estimate above it. The mode is either ``"exact"`` or ``"estimate"``.
+        """
+        filter_kwargs = self._filter_kwargs(filters)
+
+        if not any(value is not None for value in filter_kwargs.values()):
+            count = await self.repository.get_user_receipt_count(user_id)
+            return count, "exact"
+
+        count, exact = await self.repository.count_user_receipts(
+            user_id=user_id,
+            threshold=config.RECEIPT_COUNT_EXACT_THRESHOLD,
+            **filter_kwargs,
+        )
+        return count, "exact" if exact else "estimate"
+
+    @staticmethod
+    def _field_kwargs(fields: frozenset[str] | None) -> dict:
+        """Translate response fields into the receipt columns that back them"""
+        if fields is None:
+            return {}
+
+        columns = [
+            column for field in fields for column in FIELD_COLUMNS.get(field, ())
+        ]
+        return {"columns": columns, "load_products": "products" in fields}
+
+    @staticmethod
+    def _filter_kwargs(filters: ReceiptFilter = None) -> dict:
+        payment_type = None
+        if filters and filters.payment_type:
+            try:
+                payment_type = PaymentType(filters.payment_type)
+            except ValueError:
+                # Handle invalid payment type
+                raise ValueError(f"Invalid payment type: {filters.payment_type}")
+
+        return {
+            "start_date": filters.start_date if filters else None,
+            "end_date": filters.end_date if filters else None,
+            "min_total": filters.min_total if filters else None,
+            "payment_type": payment_type,
+        }
+
     def render_receipt_text(self, receipt: Receipt, line_length: int = 32) -> str:
         # Header
         output = []
@@ -0,0 +1,240 @@
+import logging
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.receipt import Product, Receipt, UserReceiptCounter
+from app.db.models.user import User
+from app.db.sharding import ShardMap
+from app.repository.bulk_load import BulkLoadRepository
+from app.services.auth_utils import get_hashed_password
+
+logger = logging.getLogger(__name__)
+
+USER_COLUMNS = [
+    "id",
+    "username",
+    "email",
+    "hashed_password",
+    "created_at",
+    "updated_at",
+]
+RECEIPT_COLUMNS = [
+    "id",
+    "user_id",
+    "total",
+    "payment_type",
+    "payment_amount",
+    "rest",
+    "created_at",
+    "updated_at",
+]
+PRODUCT_COLUMNS = [
+    "receipt_id",
+    "name",
+    "price",
+    "quantity",
+    "total",
+    "created_at",
+    "updated_at",
+]
+COUNTER_COLUMNS = ["user_id", "receipt_count"]
+
+CENTS = Decimal("0.01")
+
+
+@dataclass
+class SyntheticDataSpec:
+    users: int
+    # Mean receipts per user; ``skew`` > 1 draws counts from a Pareto
+    # distribution with that shape, anything else draws them uniformly
+    receipts_per_user: float
+    skew: float
+    min_items: int
+    max_items: int
+    cash_share: float
+    days: int
+    until: datetime
+    product_names: int
+    seed: int
+    password: str
+    username_prefix: str = "synthetic"
+
+
+@dataclass
+class SyntheticDataResult:
+    users: int = 0
+    receipts: int = 0
+    products: int = 0
+
+
+class SyntheticDataService:
+    """Bulk loads deterministic fake users, receipts and products.
+
+    The same spec and seed produce the same rows, and the password is
+    hashed once for all users instead of once per registration.
+    """
+
+    def __init__(
+        self, session: AsyncSession, shard: int = 0, shard_map: ShardMap | None = None
+    ):
+        self.session = session
+        self.repository = BulkLoadRepository(session)
+        self.shard = shard
+        self.shard_map = shard_map or ShardMap(1)
+
+    async def generate(
+        self, spec: SyntheticDataSpec, batch_size: int = 10_000
+    ) -> SyntheticDataResult:
+        rng = random.Random(spec.seed)
+        hashed_password = get_hashed_password(spec.password)
+        names = [f"Product {index:05d}" for index in range(spec.product_names)]
+        # Zipf-like popularity, so a few names repeat across many receipts
+        name_weights = list(
+            accumulate(1 / (rank + 1) for rank in range(spec.product_names))
+        )
+
+        max_ids = await self.repository.get_max_ids()
+        next_user = self._next_local_id(max_ids["users"], max_ids["reserved_users"])
+        next_receipt = self._next_local_id(
+            max_ids["receipts"], max_ids["reserved_receipts"]
+        )
+
+        result = SyntheticDataResult()
+        users, counters, receipts, products = [], [], [], []
+
+        for _ in range(spec.users):
+            user_id = self._encode(next_user)
+            next_user += 1
+            joined_at = spec.until - timedelta(days=spec.days)
+            username = self._username(spec.username_prefix, user_id)
+            users.append(
+                (
+                    user_id,
+                    username,
+                    f"{username}@example.com",
+                    hashed_password,
+                    joined_at,
+                    joined_at,
+                )
+            )
+
+            receipt_count = self._receipt_count(rng, spec)
+            counters.append((user_id, receipt_count))
+            # Sorted so that receipt ids grow with their dates, as in production
+            offsets = sorted(
+                rng.random() * spec.days * 86400 for _ in range(receipt_count)
+            )
+            for offset in offsets:
+                receipt_id = self._encode(next_receipt)
+                next_receipt += 1
+                created_at = joined_at + timedelta(seconds=int(offset))
+
+                total = Decimal(0)
+                for _ in range(rng.randint(spec.min_items, spec.max_items)):
+                    price, quantity = self._product_line(rng)
+                    line_total = price * quantity
+                    total += line_total
+                    products.append(
+                        (
+                            receipt_id,
+                            rng.choices(names, cum_weights=name_weights)[0],
+                            price,
+                            quantity,
+                            line_total,
+                            created_at,
+                            created_at,
+                        )
+                    )
+
+                if rng.random() < spec.cash_share:
+                    payment_type = "CASH"
+                    # Paid with the next round banknote amount
+                    payment_amount = (total / 10).to_integral_value(
+                        rounding="ROUND_CEILING"
+                    ) * 10
+                else:
+                    payment_type = "CASHLESS"
+                    payment_amount = total
+                receipts.append(
+                    (
+                        receipt_id,
+                        user_id,
+                        total,
+                        payment_type,
+                        payment_amount,
+                        payment_amount - total,
+                        created_at,
+                        created_at,
+                    )
+                )
+
+            if len(products) + len(receipts) >= batch_size:
+                await self._flush(users, counters, receipts, products, result)
+                users, counters, receipts, products = [], [], [], []
+
+        await self._flush(users, counters, receipts, products, result)
+        await self.repository.reserve_ids(
+            {"users": next_user, "receipts": next_receipt}
+        )
+        await self.session.commit()
+        return result
+
+    async def _flush(self, users, counters, receipts, products, result) -> None:
+        await self.repository.write_rows(User.__table__, USER_COLUMNS, users)
+        await self.repository.write_rows(
+            UserReceiptCounter.__table__, COUNTER_COLUMNS, counters
+        )
+        await self.repository.write_rows(Receipt.__table__, RECEIPT_COLUMNS, receipts)
+        await self.repository.write_rows(Product.__table__, PRODUCT_COLUMNS, products)
+        await self.session.commit()
+
+        result.users += len(users)
+        result.receipts += len(receipts)
+        result.products += len(products)
+        logger.info(
+            "Loaded %s users, %s receipts, %s products",
+            result.users,
+            result.receipts,
+            result.products,
+        )
+
+    def _next_local_id(self, max_id: int, reserved: int) -> int:
+        return max(max_id // self.shard_map.shard_count, reserved) + 1
+
+    def _encode(self, local_id: int) -> int:
+        return self.shard_map.encode_id(local_id, self.shard)
+
+    def _username(self, prefix: str, user_id: int) -> str:
+        """A unique username that hashes to this shard, so that login finds it"""
+        username = f"{prefix}{user_id}"
+        suffix = 0
+        while self.shard_map.shard_for_username(username) != self.shard:
+            suffix += 1
+            username = f"{prefix}{user_id}-{suffix}"
+        return username
+
+    @staticmethod
+    def _product_line(rng: random.Random) -> tuple[Decimal, Decimal]:
+        while True:
+            price = Decimal(rng.randint(50, 50_000)) * CENTS
+            quantity = Decimal(rng.randint(1, 5))
+            # SQLite checks ``total = price * quantity`` in floating point, so
+            # skip the lines that would fail it there because of rounding
+            if float(price) * float(quantity) == float(price * quantity):
+                return price, quantity
+
+    @staticmethod
+    def _receipt_count(rng: random.Random, spec: SyntheticDataSpec) -> int:
+        if spec.skew > 1:
+            scale = spec.receipts_per_user * (spec.skew - 1) / spec.skew
+            # Cap the tail so one user cannot dominate the whole load
+            return min(
+                int(scale * rng.paretovariate(spec.skew)),
+                round(100 * spec.receipts_per_user),
+            )
+        return rng.randint(0, round(2 * spec.receipts_per_user))
@@ -2,7 +2,7 @@ from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.schemas.user import TokenPair, UserCreate
-from app.db.main import get_db
+from app.db.main import get_db, shards
 from app.db.models.user import User
 from app.repository.users import UserRepository
 from app.services.auth_utils import (
@@ -19,8 +19,36 @@ class UserService:
         self.repository = UserRepository(session)
 
     async def create_user(self, user: UserCreate) -> User | None:
+        """None if the username or the email is taken, on any shard"""
+        # Each shard's unique constraint only covers the emails of its users
+        shard = self.repository.session.info.get("shard")
+        if await self._email_on_other_shards(user.email, shard):
+            return None
+
         hashed_password = get_hashed_password(user.password)
-        return await self.repository.create(user.username, user.email, hashed_password)
+        db_user = await self.repository.create(
+            user.username, user.email, hashed_password
+        )
+        if db_user is None:
+            return None
+
+        # Another shard may have registered the email meanwhile. Of two such
+        # users, at least the later one sees the other here and backs out
+        if await self._email_on_other_shards(user.email, shard):
+            await self.repository.delete(db_user)
+            return None
+        return db_user
+
+    async def _email_on_other_shards(self, email: str, shard: int | None) -> bool:
+        if not shards.is_sharded:
+            return False
+        for other in range(shards.shard_map.shard_count):
+            if other == shard:
+                continue
+            async with shards.get_session(other, autocommit=True) as session:
+                if await UserRepository(session).get_by_email(email) is not None:
+                    return True
+        return False
 
     async def authenticate_user(self, username: str, password: str):
         user = await self.repository.get_by_username(username=username)
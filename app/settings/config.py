@@ -1,4 +1,4 @@
-from pydantic import Field
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings
 
 
@@ -8,6 +8,117 @@ class Config(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(None, env="ACCESS_TOKEN_EXPIRE_MINUTES")
     REFRESH_TOKEN_EXPIRE_DAYS: int = Field(None, env="REFRESH_TOKEN_EXPIRE_DAYS")
 
+    # Filtered receipt counts are exact up to this many rows and estimated above it
+    RECEIPT_COUNT_EXACT_THRESHOLD: int = Field(
+        1000, env="RECEIPT_COUNT_EXACT_THRESHOLD"
+    )
+
+    # Store product names once per user in product_catalog and reference them by id
+    PRODUCT_CATALOG_ENABLED: bool = Field(False, env="PRODUCT_CATALOG_ENABLED")
+    PRODUCT_CATALOG_CACHE_SIZE: int = Field(100_000, env="PRODUCT_CATALOG_CACHE_SIZE")
+
+    # Receipt list pages kept in memory per worker, and their total pickled size;
+    # 0 turns the cache off
+    RECEIPT_LIST_CACHE_SIZE: int = Field(1000, env="RECEIPT_LIST_CACHE_SIZE")
+    RECEIPT_LIST_CACHE_MAX_BYTES: int = Field(
+        32 * 1024 * 1024, env="RECEIPT_LIST_CACHE_MAX_BYTES"
+    )
+
+    # "local" streams new receipts within one worker, "postgres" across all of
+    # them with LISTEN/NOTIFY
+    RECEIPT_EVENTS_BACKEND: str = Field("local", env="RECEIPT_EVENTS_BACKEND")
+    # Events buffered per open receipt stream before it is dropped as too slow
+    RECEIPT_STREAM_QUEUE_SIZE: int = Field(100, env="RECEIPT_STREAM_QUEUE_SIZE")
+    RECEIPT_STREAM_HEARTBEAT_SECONDS: float = Field(
+        15, env="RECEIPT_STREAM_HEARTBEAT_SECONDS"
+    )
+    # Receipts replayed at most when a stream resumes with Last-Event-ID
+    RECEIPT_STREAM_BACKLOG_LIMIT: int = Field(500, env="RECEIPT_STREAM_BACKLOG_LIMIT")
+
+    # Changes newer than this are left to the next sync, so that receipts from
+    # transactions still being committed are never skipped
+    RECEIPT_SYNC_SETTLE_SECONDS: float = Field(5, env="RECEIPT_SYNC_SETTLE_SECONDS")
+    # Purged receipts are reported to syncing clients for this long; clients
+    # that last synced earlier have to download their receipts again
+    RECEIPT_TOMBSTONE_RETENTION_DAYS: int = Field(
+        30, env="RECEIPT_TOMBSTONE_RETENTION_DAYS"
+    )
+
+    # Per-worker Bloom filter of receipt ids that answers the public view for ids
+    # that do not exist without a query; needs the postgres events backend, so
+    # that every worker learns the receipts created elsewhere
+    RECEIPT_ID_FILTER_ENABLED: bool = Field(False, env="RECEIPT_ID_FILTER_ENABLED")
+    # Receipts the filter is sized for; rebuilds size it for twice the current ones
+    RECEIPT_ID_FILTER_CAPACITY: int = Field(1_000_000, env="RECEIPT_ID_FILTER_CAPACITY")
+    RECEIPT_ID_FILTER_FALSE_POSITIVE_RATE: float = Field(
+        0.01, env="RECEIPT_ID_FILTER_FALSE_POSITIVE_RATE"
+    )
+    # Rebuilt this often to drop purged receipts and resize
+    RECEIPT_ID_FILTER_REBUILD_SECONDS: float = Field(
+        3600, env="RECEIPT_ID_FILTER_REBUILD_SECONDS"
+    )
+
+    # Receipts with at least this many products take the bulk insert path
+    LARGE_RECEIPT_THRESHOLD: int = Field(200, env="LARGE_RECEIPT_THRESHOLD")
+
+    # Responses smaller than this are sent uncompressed
+    COMPRESSION_MINIMUM_SIZE: int = Field(1024, env="COMPRESSION_MINIMUM_SIZE")
+
+    # Receipts older than this are moved to receipt_archive by app.cli.archive_receipts
+    RECEIPT_ARCHIVE_AFTER_DAYS: int = Field(90, env="RECEIPT_ARCHIVE_AFTER_DAYS")
+    # Look up receipts missing from the hot tables in the archive
+    RECEIPT_ARCHIVE_READ_THROUGH: bool = Field(True, env="RECEIPT_ARCHIVE_READ_THROUGH")
+    # Rows deleted per purge transaction and the sleep between transactions
+    PURGE_CHUNK_SIZE: int = Field(1000, env="PURGE_CHUNK_SIZE")
+    PURGE_PAUSE_SECONDS: float = Field(0.2, env="PURGE_PAUSE_SECONDS")
+    # Receipts (hot and archived) older than this are purged; None keeps them forever
+    PURGE_RETENTION_DAYS: int | None = Field(None, env="PURGE_RETENTION_DAYS")
+
+    # Concurrent requests per worker; match it to the database pool size
+    ADMISSION_CAPACITY: int = Field(15, env="ADMISSION_CAPACITY")
+    # Slots ordinary and expensive routes may use, the rest are kept for cheap reads
+    ADMISSION_DEFAULT_LIMIT: int = Field(12, env="ADMISSION_DEFAULT_LIMIT")
+    ADMISSION_EXPENSIVE_LIMIT: int = Field(5, env="ADMISSION_EXPENSIVE_LIMIT")
+    # Waiting requests per route class and how long they may wait for a slot
+    ADMISSION_QUEUE_SIZE: int = Field(50, env="ADMISSION_QUEUE_SIZE")
+    ADMISSION_MAX_WAIT_SECONDS: float = Field(2.0, env="ADMISSION_MAX_WAIT_SECONDS")
+
+    # Request profiling into PROFILER_DIR; without PROFILER_ENABLED it is not even
+    # installed. Requests signed with PROFILER_SECRET (see app.api.profiling) are
+    # profiled, and a PROFILER_SAMPLE_RATE share of all others
+    PROFILER_ENABLED: bool = Field(False, env="PROFILER_ENABLED")
+    PROFILER_SECRET: str | None = Field(None, env="PROFILER_SECRET")
+    PROFILER_SAMPLE_RATE: float = Field(0, env="PROFILER_SAMPLE_RATE")
+    PROFILER_DIR: str = Field("profiles", env="PROFILER_DIR")
+    PROFILER_INTERVAL_MS: float = Field(5, env="PROFILER_INTERVAL_MS")
+    # Newest profiles kept in PROFILER_DIR
+    PROFILER_KEEP: int = Field(50, env="PROFILER_KEEP")
+
+    # Log records are JSON lines on stdout written by a background thread; past
+    # LOG_QUEUE_SIZE records waiting for it, new ones are dropped
+    LOG_LEVEL: str = Field("INFO", env="LOG_LEVEL")
+    LOG_QUEUE_SIZE: int = Field(10_000, env="LOG_QUEUE_SIZE")
+    # How long queued records wait for the thread's next write
+    LOG_FLUSH_INTERVAL_MS: float = Field(50, env="LOG_FLUSH_INTERVAL_MS")
+    # Comma-separated logger=level and logger=share pairs, e.g.
+    # "sqlalchemy.engine=INFO" to log SQL statements and "sqlalchemy.engine=0.05"
+    # to keep those of one request in twenty (see app.settings.logs)
+    LOG_LEVELS: str | None = Field(None, env="LOG_LEVELS")
+    LOG_SAMPLE_RATES: str | None = Field(None, env="LOG_SAMPLE_RATES")
+
+    # Token expected in the X-Admin-Token header; admin endpoints are off without it
+    ADMIN_TOKEN: str | None = Field(None, env="ADMIN_TOKEN")
+
+    @model_validator(mode="after")
+    def check_receipt_id_filter(self) -> "Config":
+        # With the local backend, receipts created by other processes never
+        # reach the filter and would get a 404 until the next rebuild
+        if self.RECEIPT_ID_FILTER_ENABLED and self.RECEIPT_EVENTS_BACKEND != "postgres":
+            raise ValueError(
+                "RECEIPT_ID_FILTER_ENABLED needs RECEIPT_EVENTS_BACKEND=postgres"
+            )
+        return self
+
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -0,0 +1,253 @@
+"""Structured logging that never blocks the event loop.
+
+``configure_logging`` puts a handler on the root logger that only copies
+records onto a bounded queue; a ``BatchWriter`` thread formats them as JSON
+lines and writes them to stdout. When the queue is full a record is dropped
+and counted rather than waited for. Records carry the id of the
+request they were logged in (see ``app.api.request_ids``), so route,
+service and SQL records of one request can be joined.
+
+Levels and sampling are set per logger, as comma-separated pairs:
+
+    LOG_LEVELS=sqlalchemy.engine=INFO,app.requests=WARNING
+    LOG_SAMPLE_RATES=sqlalchemy.engine=0.05
+
+A sample rate keeps that share of a logger's records below WARNING, picked
+by request id, so a sampled request keeps all of its records.
+"""
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler
+from typing import Callable, TextIO
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# Attributes of every LogRecord; anything else was passed in ``extra``
+RECORD_ATTRIBUTES = frozenset(
+    [*vars(logging.LogRecord("", 0, "", 0, "", None, None)), "message", "request_id"]
+)
+
+
+def parse_logger_settings(value: str | None, convert: Callable) -> dict:
+    """``{"a.b": convert("x")}`` from ``"a.b=x,..."``"""
+    settings = {}
+    for item in (value or "").split(","):
+        name, separator, setting = item.strip().partition("=")
+        if not separator:
+            continue
+        try:
+            settings[name.strip()] = convert(setting.strip())
+        except ValueError:
+            raise ValueError(f"Invalid logging setting for {name}: {setting}")
+    return settings
+
+
+def parse_level(value: str) -> int:
+    level = logging.getLevelName(value.upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level {value}")
+    return level
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a share of each logger's records below WARNING"""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+        self._logger_rates: dict[str, float] = {}
+
+    def rate_for(self, name: str) -> float:
+        rate = self._logger_rates.get(name)
+        if rate is None:
+            # The closest configured ancestor, as for logger levels
+            rate, prefix = 1.0, name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._logger_rates[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1:
+            return True
+
+        current_request = request_id.get()
+        if current_request is None:
+            sample = random.random()
+        else:
+            sample = zlib.crc32(current_request.encode()) / 2**32
+        if sample < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Puts records on a bounded queue and drops them when it is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only what must happen on the caller's thread: resolve the message,
+        # which may refer to mutable objects, and take the request id
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        record.request_id = request_id.get()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchWriter:
+    """Formats and writes queued records from a background thread.
+
+    A thread woken for every record would take the GIL from the event loop
+    on every log call. This one sleeps ``interval`` seconds at a time and
+    then writes everything queued meanwhile with a single write.
+    """
+
+    def __init__(
+        self,
+        log_queue: queue.Queue,
+        stream: TextIO,
+        formatter: logging.Formatter,
+        interval: float = 0.05,
+    ):
+        self.queue = log_queue
+        self.stream = stream
+        self.formatter = formatter
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Write what is still queued and end the thread"""
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            stopping = self._stop.wait(self.interval)
+            self._write_queued()
+            if stopping:
+                return
+
+    def _write_queued(self) -> None:
+        lines = []
+        while True:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception:
+                lines.append(json.dumps({"message": f"Unformattable {record!r}"}))
+        if lines:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+
+
+class LogPipeline:
+    def __init__(
+        self,
+        handler: DroppingQueueHandler,
+        writer: BatchWriter,
+        sampling: SamplingFilter,
+    ):
+        self.handler = handler
+        self.writer = writer
+        self.sampling = sampling
+
+    def stop(self) -> None:
+        """Write out the queued records and detach from the root logger"""
+        logging.getLogger().removeHandler(self.handler)
+        self.writer.stop()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.handler.queue.qsize(),
+            "queue_size": self.handler.queue.maxsize,
+            "dropped": self.handler.dropped,
+            "sampled_out": self.sampling.sampled_out,
+        }
+
+
+def configure_logging(
+    level: str = "INFO",
+    levels: str | None = None,
+    sample_rates: str | None = None,
+    queue_size: int = 10_000,
+    flush_interval: float = 0.05,
+    stream: TextIO | None = None,
+) -> LogPipeline:
+    """Send all logging through a new pipeline; stop it on shutdown"""
+    root = logging.getLogger()
+    root.setLevel(parse_level(level))
+    # SQL statements are logged at INFO; they stay off unless asked for
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    for name, logger_level in parse_logger_settings(levels, parse_level).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    handler = DroppingQueueHandler(queue.Queue(queue_size))
+    sampling = SamplingFilter(parse_logger_settings(sample_rates, float))
+    handler.addFilter(sampling)
+
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    writer = BatchWriter(
+        handler.queue, stream or sys.stdout, JsonFormatter(), flush_interval
+    )
+    writer.start()
+    return LogPipeline(handler, writer, sampling)
@@ -0,0 +1,78 @@
+"""Run the app against a throwaway SQLite database.
+
+The settings are read when app modules are imported, so the environment is
+set here before any test module imports them.
+"""
+import os
+import random
+import tempfile
+
+import httpx
+import pytest
+import pytest_asyncio
+
+DATABASE_DIR = tempfile.mkdtemp(prefix="receipts-tests-")
+
+os.environ.update(
+    SQLITE_PATH=os.path.join(DATABASE_DIR, "app.sqlite"),
+    SECRET_KEY="test-secret",
+    ALGORITHM="HS256",
+    ACCESS_TOKEN_EXPIRE_MINUTES="30",
+    REFRESH_TOKEN_EXPIRE_DAYS="7",
+    # Every list request reaches the database
+    RECEIPT_LIST_CACHE_SIZE="0",
+)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated_database() -> str:
+    from alembic import command
+    from alembic.config import Config
+
+    command.upgrade(Config("alembic.ini"), "head")
+    return os.environ["SQLITE_PATH"]
+
+
+@pytest_asyncio.fixture
+async def client():
+    from app.main import create_app
+
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest_asyncio.fixture
+async def user(client: httpx.AsyncClient):
+    """A logged in user with a few receipts"""
+    from app.cli.soak_test import SoakClient
+
+    user = SoakClient(client, random.Random(0), {})
+    await user.login()
+    for _ in range(3):
+        await user.create_receipt()
+    return user
+
+
+@pytest.fixture
+def backdate():
+    """Make receipts ``days`` old, so archiving and purging pick them up"""
+    from datetime import timedelta
+
+    from sqlalchemy import update
+
+    from app.db.main import shards
+    from app.db.models.base import database_now
+    from app.db.models.receipt import Receipt
+
+    async def backdate(receipt_ids: list[int], days: int) -> None:
+        async with shards.get_session(0) as session:
+            created_at = await database_now(session) - timedelta(days=days)
+            await session.execute(
+                update(Receipt)
+                .where(Receipt.id.in_(receipt_ids))
+                .values(created_at=created_at)
+            )
+            await session.commit()
+
+    return backdate
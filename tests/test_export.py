@@ -0,0 +1,44 @@
+import json
+from datetime import timedelta
+
+import pytest
+
+from app.db.main import shards
+from app.services.export import ReceiptExportService
+
+
+async def export(output_dir, shard: int):
+    # The test database stands in for every shard
+    async with shards.get_session(0) as session:
+        return await ReceiptExportService(session).export(
+            output_dir, settle=timedelta(0), shard=shard
+        )
+
+
+@pytest.mark.asyncio
+async def test_shards_export_into_one_directory(user, tmp_path):
+    first = await export(tmp_path, shard=0)
+    second = await export(tmp_path, shard=1)
+
+    # Shard 1 does not start after the watermark of shard 0
+    assert first.receipts > 0
+    assert second.receipts == first.receipts
+    for shard in (0, 1):
+        watermark = json.loads((tmp_path / f"_watermark-{shard}.json").read_text())
+        assert watermark["last_receipt_id"] == first.last_receipt_id
+
+    # Neither run overwrote the files of the other
+    files = list(tmp_path.glob("*/date=*/part-*.parquet"))
+    assert len(files) == first.files + second.files
+    assert {file.name.split("-")[1] for file in files} == {"shard0", "shard1"}
+
+    assert (await export(tmp_path, shard=1)).receipts == 0
+
+
+@pytest.mark.asyncio
+async def test_shard_0_continues_from_the_legacy_watermark(user, tmp_path):
+    (tmp_path / "_watermark.json").write_text(
+        json.dumps({"last_receipt_id": user.receipt_ids[-1]})
+    )
+    assert (await export(tmp_path, shard=0)).receipts == 0
+    assert (await export(tmp_path, shard=1)).receipts > 0
@@ -0,0 +1,134 @@
+from datetime import timedelta
+
+import pytest
+import sqlalchemy as sa
+
+from app.db.main import shards
+from app.db.models.archive import ArchivedReceipt
+from app.db.models.purge import PurgeStatus
+from app.db.models.receipt import Product, Receipt, UserReceiptCounter
+from app.db.models.tombstone import ReceiptTombstone
+from app.db.models.user import User
+from app.repository.purge import PurgeRepository
+from app.services.archive import ReceiptArchiveService
+from app.services.purge import PurgeService
+
+API = "/api/v1"
+
+# Older than anything the other tests backdate, so only these receipts go
+AGE = timedelta(days=6000)
+MAX_AGE = timedelta(days=5000)
+
+
+async def scalars(query) -> list:
+    async with shards.get_session(0, autocommit=True) as session:
+        return (await session.scalars(query)).all()
+
+
+async def counter(user_id: int) -> tuple[int, int]:
+    async with shards.get_session(0, autocommit=True) as session:
+        row = (
+            await session.execute(
+                sa.select(
+                    UserReceiptCounter.receipt_count, UserReceiptCounter.version
+                ).where(UserReceiptCounter.user_id == user_id)
+            )
+        ).one()
+    return tuple(row)
+
+
+async def user_with_old_receipts(user, backdate) -> tuple[int, list[int], list[int]]:
+    """Give ``user`` two archived and three hot receipts older than ``MAX_AGE``"""
+    for _ in range(3):
+        await user.create_receipt()
+    (user_id,) = await scalars(
+        sa.select(Receipt.user_id).where(Receipt.id == user.receipt_ids[0])
+    )
+
+    archived = user.receipt_ids[:2]
+    await backdate(archived, days=AGE.days)
+    async with shards.get_session(0) as session:
+        await ReceiptArchiveService(session).archive_older_than(MAX_AGE, pause=0)
+    hot = user.receipt_ids[2:5]
+    await backdate(hot, days=AGE.days)
+    return user_id, archived, hot
+
+
+@pytest.mark.asyncio
+async def test_retention_purge_resumes_chunk_by_chunk(
+    client, user, backdate, monkeypatch
+):
+    user_id, archived, hot = await user_with_old_receipts(user, backdate)
+    products = len(
+        await scalars(sa.select(Product.id).where(Product.receipt_id.in_(hot)))
+    )
+    receipt_count, version = await counter(user_id)
+    assert receipt_count == 6
+
+    # Interrupt the job after its first committed chunk
+    chunk = PurgeRepository.delete_old_receipts_chunk
+    calls = 0
+
+    async def interrupted_chunk(self, cutoff, chunk_size):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise RuntimeError("interrupted")
+        return await chunk(self, cutoff, chunk_size)
+
+    monkeypatch.setattr(PurgeRepository, "delete_old_receipts_chunk", interrupted_chunk)
+    async with shards.get_session(0) as session:
+        service = PurgeService(session)
+        job = await service.start_retention_purge(MAX_AGE)
+        with pytest.raises(RuntimeError, match="interrupted"):
+            await service.run(job.id, chunk_size=2, pause=0)
+        assert job.status == PurgeStatus.FAILED
+        assert job.deleted_receipts == 2
+    assert await counter(user_id) == (receipt_count - 2, version + 1)
+
+    # A rerun picks up from what the first chunk left
+    async with shards.get_session(0) as session:
+        job = await PurgeService(session).run(job.id, chunk_size=2, pause=0)
+        assert job.status == PurgeStatus.DONE
+        assert (job.deleted_receipts, job.deleted_archived) == (3, 2)
+        assert job.deleted_products == products
+
+    # One decrement and version bump per chunk that touched the user
+    assert await counter(user_id) == (1, version + 3)
+    assert (
+        await scalars(sa.select(Receipt.id).where(Receipt.user_id == user_id))
+        == user.receipt_ids[5:]
+    )
+    assert not await scalars(
+        sa.select(ArchivedReceipt.id).where(ArchivedReceipt.user_id == user_id)
+    )
+    assert not await scalars(sa.select(Product.id).where(Product.receipt_id.in_(hot)))
+
+    tombstones = await scalars(
+        sa.select(ReceiptTombstone).where(ReceiptTombstone.user_id == user_id)
+    )
+    assert sorted(tombstone.receipt_id for tombstone in tombstones) == sorted(
+        archived + hot
+    )
+
+    response = await client.get(f"{API}/receipts", headers=user.headers)
+    assert [receipt["id"] for receipt in response.json()] == user.receipt_ids[5:]
+
+
+@pytest.mark.asyncio
+async def test_user_purge_deletes_everything_in_chunks(user, backdate):
+    user_id, archived, hot = await user_with_old_receipts(user, backdate)
+
+    async with shards.get_session(0) as session:
+        service = PurgeService(session)
+        job = await service.start_user_purge(user_id)
+        job = await service.run(job.id, chunk_size=2, pause=0)
+        assert job.status == PurgeStatus.DONE
+        assert (job.deleted_receipts, job.deleted_archived) == (4, 2)
+
+    assert not await scalars(sa.select(Receipt.id).where(Receipt.user_id == user_id))
+    assert not await scalars(sa.select(User.id).where(User.id == user_id))
+    # Only the retention purge reports deletions to syncing clients
+    assert not await scalars(
+        sa.select(ReceiptTombstone).where(ReceiptTombstone.user_id == user_id)
+    )
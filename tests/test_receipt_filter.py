@@ -0,0 +1,171 @@
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+import app.services.receipt_events as receipt_events_module
+from app.db.main import shards
+from app.services.receipt_events import receipt_events
+from app.services.receipt_filter import ReceiptIdFilter
+from app.settings.config import Config
+
+# Far above the ids of the test database; not a false positive of the filter
+MISSING_ID = 2**52 + 1
+
+
+@pytest.fixture
+def receipt_filter(monkeypatch):
+    monkeypatch.setattr(receipt_events, "_listeners", [])
+    monkeypatch.setattr(receipt_events, "_gap_listeners", [])
+    return ReceiptIdFilter(
+        shards,
+        enabled=True,
+        capacity=1000,
+        false_positive_rate=0.001,
+        rebuild_seconds=3600,
+        include_archive=True,
+    )
+
+
+async def wait_until_ready(receipt_filter: ReceiptIdFilter) -> None:
+    async def ready():
+        while not receipt_filter.ready:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(ready(), 5)
+
+
+def test_filter_needs_the_postgres_events_backend():
+    with pytest.raises(ValidationError, match="RECEIPT_EVENTS_BACKEND=postgres"):
+        Config(RECEIPT_ID_FILTER_ENABLED=True, RECEIPT_EVENTS_BACKEND="local")
+    Config(RECEIPT_ID_FILTER_ENABLED=True, RECEIPT_EVENTS_BACKEND="postgres")
+
+
+@pytest.mark.asyncio
+async def test_gap_rebuilds_the_filter(user, receipt_filter):
+    await receipt_filter.start()
+    try:
+        await wait_until_ready(receipt_filter)
+        assert all(receipt_filter.might_exist(id) for id in user.receipt_ids)
+        assert not receipt_filter.might_exist(MISSING_ID)
+
+        await receipt_events.announce_gap()
+        # Every id is looked up until the rebuild
+        assert not receipt_filter.ready
+        assert receipt_filter.might_exist(MISSING_ID)
+
+        await wait_until_ready(receipt_filter)
+        assert receipt_filter.builds == 2
+        assert receipt_filter.stats()["gaps"] == 1
+        assert not receipt_filter.might_exist(MISSING_ID)
+    finally:
+        await receipt_filter.stop()
+
+
+@pytest.mark.asyncio
+async def test_gap_during_build_discards_it(user, receipt_filter, monkeypatch):
+    scan = receipt_filter._scan
+
+    async def scan_with_gap(*args):
+        await scan(*args)
+        if receipt_filter.stats()["gaps"] == 0:
+            await receipt_events.announce_gap()
+
+    monkeypatch.setattr(receipt_filter, "_scan", scan_with_gap)
+    receipt_events.add_gap_listener(receipt_filter._on_gap)
+    await receipt_filter.build()
+    assert not receipt_filter.ready
+    await receipt_filter.build()
+    assert receipt_filter.ready
+
+
+class FakeConnection:
+    """Stands in for the asyncpg listener connection of PostgresNotifyBackend"""
+
+    def __init__(self, sent: list):
+        self.sent = sent
+        self.closed = False
+        self.on_termination = None
+
+    async def add_listener(self, channel, callback):
+        self.on_notification = callback
+
+    def add_termination_listener(self, callback):
+        self.on_termination = callback
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    async def execute(self, query, channel, payload):
+        if self.closed:
+            raise ConnectionError("connection is closed")
+        self.sent.append(payload)
+
+    def terminate(self):
+        self.closed = True
+
+    def drop(self):
+        self.closed = True
+        self.on_termination(self)
+
+
+@pytest.mark.asyncio
+async def test_postgres_backend_reports_gaps_and_reconnects(monkeypatch):
+    sent, connections, gaps = [], [], []
+
+    async def connect(dsn):
+        connections.append(FakeConnection(sent))
+        return connections[-1]
+
+    monkeypatch.setattr(receipt_events_module.asyncpg, "connect", connect)
+    backend = receipt_events_module.PostgresNotifyBackend("postgresql://test")
+    await backend.start(lambda *event: None, lambda: gaps.append(len(connections)))
+
+    connections[0].drop()
+    # An event sent before the reconnect is lost for every worker
+    with pytest.raises(ConnectionError):
+        await backend.publish(1, 2, "{}")
+    await backend._reconnecting
+
+    assert len(connections) == 2
+    # When the connection dropped and once it was back
+    assert gaps == [1, 2]
+    # The other workers are told about the unsent event
+    assert sent == ["null"]
+    await backend.publish(1, 3, "{}")
+    assert sent == ["null", '[1, 3, "{}"]']
+
+
+@pytest.mark.asyncio
+async def test_postgres_backend_publishes_without_waiting_for_reconnects(
+    monkeypatch,
+):
+    sent, connections = [], []
+    database_up = asyncio.Event()
+    attempts = 0
+
+    async def connect(dsn):
+        nonlocal attempts
+        attempts += 1
+        if connections and not database_up.is_set():
+            raise OSError("connection refused")
+        connections.append(FakeConnection(sent))
+        return connections[-1]
+
+    monkeypatch.setattr(receipt_events_module.asyncpg, "connect", connect)
+    backend = receipt_events_module.PostgresNotifyBackend(
+        "postgresql://test", retry_seconds=0.01
+    )
+    await backend.start(lambda *event: None, lambda: None)
+
+    connections[0].drop()
+    while attempts < 3:
+        await asyncio.sleep(0.01)
+    # Still refused: publishing fails at once instead of waiting for the retries
+    for receipt_id in range(5):
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(backend.publish(1, receipt_id, "{}"), 0.1)
+
+    database_up.set()
+    await asyncio.wait_for(backend._reconnecting, 1)
+    assert sent == ["null"]
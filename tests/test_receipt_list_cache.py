@@ -0,0 +1,113 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+
+import app.services.receipts
+from app.db.main import shards
+from app.db.models.receipt import Product, Receipt
+from app.services.archive import ReceiptArchiveService
+from app.services.purge import PurgeService
+from app.services.receipts import ReceiptListCache
+
+API = "/api/v1"
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    # The tests run with the worker's cache turned off
+    cache = ReceiptListCache(max_size=100, max_bytes=1024 * 1024)
+    monkeypatch.setattr(app.services.receipts, "receipt_list_cache", cache)
+    return cache
+
+
+async def list_ids(client, user) -> list[int]:
+    response = await client.get(f"{API}/receipts", headers=user.headers)
+    assert response.status_code == 200
+    return sorted(receipt["id"] for receipt in response.json())
+
+
+@pytest.mark.asyncio
+async def test_page_is_served_from_the_cache(client, user, cache):
+    first = await list_ids(client, user)
+    assert await list_ids(client, user) == first == sorted(user.receipt_ids)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_new_receipt_invalidates_the_page(client, user, cache):
+    await list_ids(client, user)
+    await user.create_receipt()
+
+    assert await list_ids(client, user) == sorted(user.receipt_ids)
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+@pytest.mark.asyncio
+async def test_archiving_invalidates_the_page(client, user, cache, backdate):
+    await backdate(user.receipt_ids[:2], days=200)
+    await list_ids(client, user)
+
+    async with shards.get_session(0) as session:
+        assert (
+            await ReceiptArchiveService(session).archive_older_than(
+                timedelta(days=100), pause=0
+            )
+            >= 2
+        )
+
+    # Archived receipts are still listed, read through from the archive
+    assert await list_ids(client, user) == sorted(user.receipt_ids)
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+@pytest.mark.asyncio
+async def test_purging_invalidates_the_page(client, user, cache, backdate):
+    await backdate(user.receipt_ids[:1], days=3000)
+    await list_ids(client, user)
+
+    async with shards.get_session(0) as session:
+        service = PurgeService(session)
+        job = await service.start_retention_purge(timedelta(days=2000))
+        await service.run(job.id, pause=0)
+
+    assert await list_ids(client, user) == sorted(user.receipt_ids[1:])
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def page(receipts: int) -> list[Receipt]:
+    return [
+        Receipt(
+            id=receipt_id,
+            user_id=1,
+            total=Decimal("1.00"),
+            rest=Decimal("0.00"),
+            payment_amount=Decimal("1.00"),
+            products=[
+                Product(
+                    name="Product", price=Decimal("1"), quantity=1, total=Decimal("1")
+                )
+            ],
+        )
+        for receipt_id in range(receipts)
+    ]
+
+
+def test_cache_stays_within_max_bytes():
+    measure = ReceiptListCache(max_size=1, max_bytes=1 << 20)
+    measure.set(("page",), page(10))
+    size = measure.bytes
+    cache = ReceiptListCache(max_size=100, max_bytes=size * 3)
+
+    for key in range(5):
+        cache.set((key,), page(10))
+        assert cache.bytes <= cache.max_bytes
+    # The least recently used pages went first
+    assert len(cache) == 3
+    assert cache.get((0,)) is None and cache.get((4,)) is not None
+    assert cache.evictions == 2
+
+    # A page over the whole budget is not cached, and evicts nothing
+    cache.set(("large",), page(100))
+    assert cache.get(("large",)) is None
+    assert len(cache) == 3
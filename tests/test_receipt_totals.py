@@ -0,0 +1,125 @@
+import random
+from decimal import Decimal
+
+import pytest
+import sqlalchemy as sa
+
+import app.services.receipts
+from app.api.schemas.receipt import ReceiptCreate
+from app.db.main import shards
+from app.db.models.receipt import Product, Receipt
+from app.services.receipts import calculate_totals, from_minor_units
+
+API = "/api/v1"
+
+# Mostly amounts that binary floating point cannot represent exactly
+PRICES = ["0.10", "0.20", "0.70", "1.15", "19.99", "33.33", "0.01"]
+QUANTITIES = ["1", "3", "0.5", "1.5", "2.25", "7", "0.1"]
+
+
+def receipt_data(products: list[tuple[str, str]], payment: str) -> ReceiptCreate:
+    return ReceiptCreate(
+        products=[
+            {"name": f"Product {n}", "price": price, "quantity": quantity}
+            for n, (price, quantity) in enumerate(products)
+        ],
+        payment={"type": "cash", "amount": payment},
+    )
+
+
+def exact_lines(rng: random.Random, count: int) -> list[tuple[str, str]]:
+    """Random lines whose totals have at most two decimal places"""
+    lines = []
+    while len(lines) < count:
+        price, quantity = rng.choice(PRICES), rng.choice(QUANTITIES)
+        total = Decimal(price) * Decimal(quantity)
+        if total == round(total, 2):
+            lines.append((price, quantity))
+    return lines
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_totals_match_decimal_arithmetic(seed):
+    rng = random.Random(seed)
+    lines = exact_lines(rng, rng.randint(1, 30))
+    expected_lines = [Decimal(price) * Decimal(quantity) for price, quantity in lines]
+    expected_total = sum(expected_lines, Decimal(0))
+    payment = expected_total + Decimal(rng.randint(0, 5000)) / 100
+
+    totals = calculate_totals(receipt_data(lines, str(payment)))
+
+    assert [from_minor_units(line) for line in totals.line_totals] == expected_lines
+    assert from_minor_units(totals.total) == expected_total
+    assert from_minor_units(totals.rest) == payment - expected_total
+
+
+def test_cents_add_up_exactly():
+    totals = calculate_totals(receipt_data([("0.10", "1"), ("0.20", "1")], "0.30"))
+    assert 0.1 + 0.2 != 0.3
+    assert from_minor_units(totals.total) == Decimal("0.30")
+    assert totals.rest == 0
+
+
+@pytest.mark.parametrize(
+    "products, payment, message",
+    [
+        ([("2.675", "1")], "10", "Price must have at most two decimal places"),
+        ([("1", "0.125")], "10", "Quantity must have at most two decimal places"),
+        ([("0.07", "0.25")], "10", "must have at most two decimal places"),
+        ([("19.99", "3")], "59.96", "Invalid payment amount"),
+        ([("99999999.99", "2")], "1", "is out of range"),
+    ],
+)
+def test_totals_refuse_what_the_columns_cannot_hold(products, payment, message):
+    with pytest.raises(ValueError, match=message):
+        calculate_totals(receipt_data(products, payment))
+
+
+async def stored_receipt(receipt_id: int) -> tuple:
+    async with shards.get_session(0, autocommit=True) as session:
+        receipt = (
+            await session.execute(
+                sa.select(Receipt.total, Receipt.rest, Receipt.payment_amount).where(
+                    Receipt.id == receipt_id
+                )
+            )
+        ).one()
+        products = (
+            await session.execute(
+                sa.select(
+                    Product._name,
+                    Product.catalog_id,
+                    Product.price,
+                    Product.quantity,
+                    Product.total,
+                )
+                .where(Product.receipt_id == receipt_id)
+                .order_by(Product.id)
+            )
+        ).all()
+    return tuple(receipt), [tuple(product) for product in products]
+
+
+@pytest.mark.asyncio
+async def test_orm_and_bulk_paths_store_identical_rows(client, user, monkeypatch):
+    lines = exact_lines(random.Random(0), 40)
+    total = sum((Decimal(p) * Decimal(q) for p, q in lines), Decimal(0))
+    body = receipt_data(lines, str(total + Decimal("12.34"))).model_dump(mode="json")
+
+    service_config = app.services.receipts.config
+    stored = []
+    # The path is picked by size; move the threshold to force it
+    for threshold in (len(lines) + 1, 1):
+        monkeypatch.setattr(service_config, "LARGE_RECEIPT_THRESHOLD", threshold)
+        response = await client.post(f"{API}/receipts", json=body, headers=user.headers)
+        assert response.status_code == 200, response.text
+        stored.append(await stored_receipt(response.json()["id"]))
+
+    (orm_receipt, orm_products), (bulk_receipt, bulk_products) = stored
+    assert (
+        orm_receipt
+        == bulk_receipt
+        == (total, Decimal("12.34"), total + Decimal("12.34"))
+    )
+    assert len(orm_products) == len(lines)
+    assert orm_products == bulk_products
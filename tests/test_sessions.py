@@ -0,0 +1,99 @@
+"""Database round trips and connection use per request."""
+import fastapi.routing
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+API = "/api/v1"
+
+
+class RoundTrips:
+    """Statements sent, plus COMMIT and ROLLBACK outside autocommit mode,
+    where the driver ignores them, and connections checked out of pools"""
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.transactions = 0
+        self.checked_out = 0
+        self.listeners = [
+            (Engine, "before_cursor_execute", self.on_statement),
+            (Engine, "commit", self.on_transaction_end),
+            (Engine, "rollback", self.on_transaction_end),
+            (Pool, "checkout", self.on_checkout),
+            (Pool, "checkin", self.on_checkin),
+        ]
+
+    def on_statement(self, *args) -> None:
+        self.statements += 1
+
+    def on_transaction_end(self, connection) -> None:
+        options = connection.get_execution_options()
+        if options.get("isolation_level") != "AUTOCOMMIT":
+            self.transactions += 1
+
+    def on_checkout(self, *args) -> None:
+        self.checked_out += 1
+
+    def on_checkin(self, *args) -> None:
+        self.checked_out -= 1
+
+    def __enter__(self) -> "RoundTrips":
+        for target, name, listener in self.listeners:
+            event.listen(target, name, listener)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for target, name, listener in self.listeners:
+            event.remove(target, name, listener)
+
+    @property
+    def total(self) -> int:
+        return self.statements + self.transactions
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "path, statements",
+    [
+        # user, receipt, products
+        ("/receipts/{id}", 3),
+        # user, list version, receipts, products, archived receipts
+        ("/receipts", 5),
+        # receipt, products
+        ("/receipts/{id}/view", 2),
+    ],
+)
+async def test_reads_take_no_transaction(client, user, path, statements):
+    path = path.format(id=user.receipt_ids[0])
+
+    with RoundTrips() as round_trips:
+        response = await client.get(f"{API}{path}", headers=user.headers)
+
+    assert response.status_code == 200
+    assert round_trips.statements == statements
+    assert round_trips.total == statements
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/receipts/{id}", "/receipts"])
+async def test_connection_released_before_serialization(
+    client, user, monkeypatch, path
+):
+    serialize_response = fastapi.routing.serialize_response
+    checked_out = []
+
+    async def recording_serialize_response(**kwargs):
+        checked_out.append(round_trips.checked_out)
+        return await serialize_response(**kwargs)
+
+    monkeypatch.setattr(
+        fastapi.routing, "serialize_response", recording_serialize_response
+    )
+    with RoundTrips() as round_trips:
+        response = await client.get(
+            f"{API}{path.format(id=user.receipt_ids[0])}", headers=user.headers
+        )
+
+    assert response.status_code == 200
+    assert checked_out == [0]
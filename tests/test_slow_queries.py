@@ -0,0 +1,34 @@
+import copy
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+
+from app.db.slow_queries import SlowQueryRecorder
+
+
+@pytest.fixture
+def engine():
+    engine = sa.create_engine("sqlite://")
+    yield engine
+    engine.dispose()
+
+
+def test_failed_statements_leave_nothing_on_the_connection(engine):
+    recorder = SlowQueryRecorder(threshold_ms=0)
+    recorder.attach(engine)
+
+    with engine.connect() as connection:
+        connection.execute(sa.text("CREATE TABLE users (name TEXT UNIQUE)"))
+        connection.execute(sa.text("INSERT INTO users VALUES ('taken')"))
+        info = copy.deepcopy(connection.connection.info)
+        for _ in range(5):
+            with pytest.raises(IntegrityError):
+                connection.execute(sa.text("INSERT INTO users VALUES ('taken')"))
+        assert connection.connection.info == info
+
+        connection.execute(sa.text("SELECT name FROM users"))
+
+    # The statements after the failures are still timed as their own
+    assert recorder.statements == 3
+    assert recorder.entries[-1].statement == "SELECT name FROM users"
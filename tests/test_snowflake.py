@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta, timezone
+
+from app.db import snowflake
+from app.db.snowflake import MAX_WORKER_ID, SnowflakeGenerator, created_at
+
+# The largest integer JavaScript and other float64 JSON clients read exactly
+MAX_SAFE_INTEGER = 2**53 - 1
+
+
+def test_ids_grow_and_stay_json_safe():
+    generator = SnowflakeGenerator(MAX_WORKER_ID, shard=15, shard_count=16)
+    ids = [generator.next_id() for _ in range(10_000)]
+
+    assert ids == sorted(set(ids))
+    assert all(id % 16 == 15 for id in ids)
+    assert max(ids) <= MAX_SAFE_INTEGER
+
+
+def test_ids_keep_growing_when_the_clock_steps_back(monkeypatch):
+    generator = SnowflakeGenerator(1)
+    now = datetime.now(timezone.utc).timestamp()
+    monkeypatch.setattr(snowflake.time, "time_ns", lambda: int(now * 1e9))
+    first = generator.next_id()
+    monkeypatch.setattr(snowflake.time, "time_ns", lambda: int((now - 5) * 1e9))
+
+    assert generator.next_id() > first
+
+
+def test_created_at():
+    generator = SnowflakeGenerator(7, shard=2, shard_count=3)
+    before = datetime.now(timezone.utc)
+
+    made = created_at(generator.next_id(), shard_count=3)
+
+    assert before - timedelta(milliseconds=snowflake.TICK_MS) <= made
+    assert made <= datetime.now(timezone.utc)
+
+
+def test_json_safe_for_the_first_decades_with_16_shards():
+    value = ((MAX_SAFE_INTEGER + 1) // 16) >> (
+        snowflake.WORKER_BITS + snowflake.SEQUENCE_BITS
+    )
+    last = snowflake.EPOCH + timedelta(milliseconds=value * snowflake.TICK_MS)
+
+    assert last.year >= 2069
@@ -0,0 +1,40 @@
+import time
+
+import pytest
+
+import app.services.receipts
+
+API = "/api/v1"
+
+
+@pytest.fixture
+def kyiv_time(monkeypatch):
+    """Run the app in a time zone ahead of the database's UTC timestamps"""
+    monkeypatch.setenv("TZ", "Europe/Kyiv")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.mark.asyncio
+async def test_sync_finds_receipts_created_after_the_watermark(
+    client, user, kyiv_time, monkeypatch
+):
+    monkeypatch.setattr(app.services.receipts.config, "RECEIPT_SYNC_SETTLE_SECONDS", 0)
+    response = await client.get(f"{API}/receipts/changes", headers=user.headers)
+    first = response.json()
+    assert sorted(receipt["id"] for receipt in first["receipts"]) == sorted(
+        user.receipt_ids
+    )
+
+    await user.create_receipt()
+    response = await client.get(
+        f"{API}/receipts/changes",
+        params={"since": first["watermark"]},
+        headers=user.headers,
+    )
+
+    assert [receipt["id"] for receipt in response.json()["receipts"]] == [
+        user.receipt_ids[-1]
+    ]
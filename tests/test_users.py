@@ -0,0 +1,80 @@
+import itertools
+import shutil
+
+import pytest
+import pytest_asyncio
+
+import app.services.users
+from app.api.schemas.user import UserCreate
+from app.db.sharding import ShardedDatabase
+from app.repository.users import UserRepository
+from app.services.users import UserService
+
+PASSWORD = "password-123"
+
+
+@pytest_asyncio.fixture
+async def two_shards(migrated_database, tmp_path, monkeypatch):
+    urls = []
+    for shard in range(2):
+        path = tmp_path / f"shard{shard}.sqlite"
+        shutil.copy(migrated_database, path)
+        urls.append(f"sqlite+aiosqlite:///{path}")
+    shards = ShardedDatabase(urls, receipt_worker_id=1)
+    monkeypatch.setattr(app.services.users, "shards", shards)
+    yield shards
+    for database in shards.shards:
+        await database._async_engine.dispose()
+
+
+def username_on(shards: ShardedDatabase, shard: int, prefix: str) -> str:
+    return next(
+        username
+        for username in (f"{prefix}{n}" for n in itertools.count())
+        if shards.shard_map.shard_for_username(username) == shard
+    )
+
+
+async def register(shards: ShardedDatabase, username: str, email: str):
+    shard = shards.shard_map.shard_for_username(username)
+    async with shards.get_session(shard) as session:
+        return await UserService(session).create_user(
+            UserCreate(username=username, email=email, password=PASSWORD)
+        )
+
+
+async def users_with_email(shards: ShardedDatabase, email: str) -> int:
+    found = 0
+    for shard in range(2):
+        async with shards.get_session(shard, autocommit=True) as session:
+            found += await UserRepository(session).get_by_email(email) is not None
+    return found
+
+
+@pytest.mark.asyncio
+async def test_email_is_unique_across_shards(two_shards):
+    first = username_on(two_shards, 0, "first")
+    second = username_on(two_shards, 1, "second")
+
+    assert await register(two_shards, first, "shared@example.com") is not None
+    assert await register(two_shards, second, "shared@example.com") is None
+    assert await register(two_shards, second, "other@example.com") is not None
+    assert await users_with_email(two_shards, "shared@example.com") == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_registration_backs_out(two_shards, monkeypatch):
+    first = username_on(two_shards, 0, "early")
+    second = username_on(two_shards, 1, "late")
+    create = UserRepository.create
+
+    async def create_after_rival(self, username, email, hashed_password):
+        # The rival commits on the other shard after this one's first check
+        if username == second:
+            async with two_shards.get_session(0) as session:
+                await create(UserRepository(session), first, email, hashed_password)
+        return await create(self, username, email, hashed_password)
+
+    monkeypatch.setattr(UserRepository, "create", create_after_rival)
+    assert await register(two_shards, second, "race@example.com") is None
+    assert await users_with_email(two_shards, "race@example.com") == 1